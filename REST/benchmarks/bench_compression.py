@@ -0,0 +1,85 @@
+"""
+Measures what response compression costs and saves on ``GET /api/contacts/``.
+
+Run from the REST folder:
+
+    python benchmarks/bench_compression.py --rows 1000 --repeat 30
+
+Each encoding and level is timed end to end through the app, in-process on an in-memory SQLite database with
+authentication and the rate limiter bypassed, next to the uncompressed response. Brotli is measured only when the
+brotli package is installed. The transfer time column estimates the time to send the body over a link of
+``--mbit`` Mbit/s, to weigh the CPU spent against the bytes saved.
+
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+
+from main import app
+from src.database.connect import get_db
+from src.services import compression
+from src.services.auth import auth_service
+
+from bench_contacts_serialization import seed
+
+
+def measure(client: TestClient, rows: int, repeat: int, accept_encoding: str) -> tuple[list[float], int]:
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get("/api/contacts/", params={"limit": rows}, headers={"Accept-Encoding": accept_encoding})
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.text
+        size = int(response.headers["content-length"])
+    return timings, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--mbit", type=float, default=10.0, help="link speed for the transfer time estimate")
+    args = parser.parse_args()
+
+    session, user = seed(args.rows)
+    app.dependency_overrides[get_db] = lambda: session
+    app.dependency_overrides[auth_service.get_current_user] = lambda: user
+
+    middleware = next(m for m in app.user_middleware if m.cls is compression.CompressionMiddleware)
+    cases = [("identity", "identity", {})]
+    cases += [(f"gzip -{level}", "gzip", {"gzip_level": level, "encodings": ("gzip",)}) for level in (1, 6, 9)]
+    if compression.brotli is not None:
+        cases += [(f"br q{quality}", "br", {"brotli_quality": quality, "encodings": ("br",)}) for quality in (1, 4, 11)]
+
+    async def no_limit(self):
+        return None
+
+    results = {}
+    with patch("src.routes.contacts.RateLimiter.__call__", no_limit):
+        for label, accept_encoding, options in cases:
+            with patch.dict(middleware.options, options):
+                app.middleware_stack = app.build_middleware_stack()
+                client = TestClient(app)
+                measure(client, args.rows, 3, accept_encoding)
+                results[label] = measure(client, args.rows, args.repeat, accept_encoding)
+
+    print(f"GET /api/contacts/?limit={args.rows}, {args.repeat} requests each, transfer at {args.mbit:g} Mbit/s")
+    identity_size = results["identity"][1]
+    for label, (timings, size) in results.items():
+        transfer = size * 8 / (args.mbit * 1000)
+        print(f"{label:<10} p50 {statistics.median(timings):8.2f} ms   {size:>9} bytes   "
+              f"ratio {identity_size / size:5.1f}x   transfer {transfer:8.2f} ms   "
+              f"total {statistics.median(timings) + transfer:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
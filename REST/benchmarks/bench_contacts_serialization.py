@@ -0,0 +1,102 @@
+"""
+Compares the default and the fast JSON path of ``GET /api/contacts/`` on a 1,000-row payload.
+
+Run from the REST folder:
+
+    python benchmarks/bench_contacts_serialization.py --rows 1000 --repeat 50
+
+The app is driven in-process through TestClient on an in-memory SQLite database, with authentication and the
+rate limiter bypassed, so the numbers isolate query + serialization cost.
+
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from main import app
+from src.conf.config import settings
+from src.database.connect import get_db
+from src.database.model import Base, Contact, User
+from src.services.auth import auth_service
+
+
+def seed(rows: int):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+    user = User(username="benchmark", email="bench@example.com", password="x", confirmed=True)
+    session.add(user)
+    session.commit()
+
+    born = date(1990, 1, 1)
+    session.add_all(
+        Contact(name=f"Name{i}", surname=f"Surname{i}", email=f"contact{i}@example.com", mobile=500000000 + i,
+                date_of_birth=born + timedelta(days=i % 365), user_id=user.id)
+        for i in range(rows)
+    )
+    session.commit()
+    return session, user
+
+
+def measure(client: TestClient, rows: int, repeat: int) -> tuple[list[float], int]:
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get("/api/contacts/", params={"limit": rows})
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.text
+        size = len(response.content)
+    return timings, size
+
+
+def report(label: str, timings: list[float], size: int):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<10} mean {statistics.mean(timings):8.2f} ms   p50 {statistics.median(timings):8.2f} ms   "
+          f"p95 {p95:8.2f} ms   {size} bytes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    session, user = seed(args.rows)
+    app.dependency_overrides[get_db] = lambda: session
+    app.dependency_overrides[auth_service.get_current_user] = lambda: user
+
+    async def no_limit(self):
+        return None
+
+    with patch("src.routes.contacts.RateLimiter.__call__", no_limit):
+        client = TestClient(app)
+        results = {}
+        for label, enabled in (("default", False), ("fast", True)):
+            with patch.object(settings, "fast_json_responses", enabled):
+                measure(client, args.rows, 3)
+                results[label] = measure(client, args.rows, args.repeat)
+
+    print(f"GET /api/contacts/?limit={args.rows}, {args.repeat} requests each")
+    for label, (timings, size) in results.items():
+        report(label, timings, size)
+    speedup = statistics.median(results["default"][0]) / statistics.median(results["fast"][0])
+    print(f"speedup (p50): {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Times duplicate detection on a synthetic address book.
+
+Run from the REST folder:
+
+    python benchmarks/bench_dedupe.py --contacts 100000 --duplicates 0.05
+
+Rows are generated in memory with the shape returned by ``get_dedupe_rows``; a share of them are copies of other
+contacts with the email case, the phone format or one letter of the name changed.
+
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.services.dedupe import find_duplicates
+
+FIRST_NAMES = ["James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+               "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Olena", "Taras"]
+
+
+def random_surname(rng: random.Random) -> str:
+    return rng.choice(string.ascii_uppercase) + "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9)))
+
+
+def generate(contacts: int, duplicates: float, seed: int) -> list[tuple]:
+    rng = random.Random(seed)
+    rows = []
+    originals = int(contacts * (1 - duplicates))
+    for contact_id in range(1, originals + 1):
+        name, surname = rng.choice(FIRST_NAMES), random_surname(rng)
+        rows.append((contact_id, name, surname, f"{name}.{surname}{contact_id}@example.com".lower(),
+                     500000000 + contact_id, date(1960, 1, 1) + timedelta(days=rng.randint(0, 20000))))
+
+    for contact_id in range(originals + 1, contacts + 1):
+        _, name, surname, email, mobile, born = rng.choice(rows[:originals])
+        variant = rng.randrange(3)
+        if variant == 0:
+            email = email.upper()
+        elif variant == 1:
+            mobile = f"+380 {str(mobile)[:2]} {str(mobile)[2:]}"
+        else:
+            position = rng.randrange(1, len(surname))
+            surname = surname[:position] + rng.choice(string.ascii_lowercase) + surname[position + 1:]
+            email = f"other{contact_id}@example.com"
+            mobile = None
+        rows.append((contact_id, name, surname, email, mobile, born))
+    rng.shuffle(rows)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contacts", type=int, default=100_000)
+    parser.add_argument("--duplicates", type=float, default=0.05, help="share of rows that are near-copies")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rows = generate(args.contacts, args.duplicates, args.seed)
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        candidates = find_duplicates(rows)
+        timings.append(time.perf_counter() - started)
+
+    expected = args.contacts - int(args.contacts * (1 - args.duplicates))
+    print(f"{args.contacts} contacts, {expected} planted duplicates")
+    print(f"candidates found    {len(candidates)}")
+    print(f"best of {args.repeat}          {min(timings):.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Cold-start benchmark: import time of ``main`` and time to the first response.
+
+Every sample runs in a fresh interpreter. The import cost is read from ``python -X importtime`` and broken down by
+top-level package; the time to first response is measured from process launch until a liveness request answers,
+either in-process through TestClient (default, no services needed) or against a spawned uvicorn (``--server``, needs
+Redis for the rate limiter).
+
+Run from the REST folder:
+
+    python benchmarks/bench_startup.py --repeat 5 --max-import-ms 1000 --max-first-response-ms 2500
+
+    python benchmarks/bench_startup.py --output bench_results/startup.json
+    python benchmarks/bench_startup.py --compare bench_results/startup.json --tolerance 0.2
+
+The script exits with status 1 when a median exceeds its threshold or regresses past the tolerance of the baseline.
+
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+FIRST_RESPONSE = (
+    "from fastapi.testclient import TestClient\n"
+    "import main\n"
+    "TestClient(main.app).get('/api/health/live').raise_for_status()\n"
+    "print('ready', flush=True)\n"
+)
+
+
+def parse_importtime(stderr: str) -> tuple[float, Counter]:
+    """
+    Returns the cumulative import time of ``main`` in milliseconds and the self time of every top-level package.
+
+    """
+
+    total_us = 0
+    packages = Counter()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        packages[name.split(".")[0]] += int(self_us) / 1000
+        if name == "main":
+            total_us = int(cumulative_us)
+    return total_us / 1000, packages
+
+
+def measure_import() -> tuple[float, Counter]:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    return parse_importtime(result.stderr)
+
+
+def measure_first_response() -> float:
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", FIRST_RESPONSE], cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    elapsed = (time.perf_counter() - started) * 1000
+    process.wait()
+    if line.strip() != "ready":
+        raise RuntimeError("the application did not answer")
+    return elapsed
+
+
+def measure_server_first_response(port: int) -> float:
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+                               "--log-level", "warning"], cwd=ROOT)
+    try:
+        while time.perf_counter() - started < 30:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/api/health/live").status_code == 200:
+                    return (time.perf_counter() - started) * 1000
+            except httpx.HTTPError:
+                time.sleep(0.01)
+        raise RuntimeError("server did not start")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def check(label: str, value: float, limit: float | None, baseline: float | None, tolerance: float) -> bool:
+    ok = True
+    if limit is not None and value > limit:
+        print(f"FAIL {label}: {value:.1f} ms is over the {limit:.1f} ms budget")
+        ok = False
+    if baseline is not None and value > baseline * (1 + tolerance):
+        print(f"FAIL {label}: {value:.1f} ms regressed from {baseline:.1f} ms by more than {tolerance:.0%}")
+        ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="heaviest packages to list")
+    parser.add_argument("--server", action="store_true", help="measure a spawned uvicorn instead of TestClient")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-import-ms", type=float)
+    parser.add_argument("--max-first-response-ms", type=float)
+    parser.add_argument("--compare", help="previous results JSON to check against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression against --compare")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    imports, packages = [], Counter()
+    for _ in range(args.repeat):
+        total, run_packages = measure_import()
+        imports.append(total)
+        packages += run_packages
+    first_responses = [
+        measure_server_first_response(args.port) if args.server else measure_first_response()
+        for _ in range(args.repeat)
+    ]
+
+    result = {
+        "import_ms": round(statistics.median(imports), 1),
+        "first_response_ms": round(statistics.median(first_responses), 1),
+        "mode": "server" if args.server else "in-process",
+        "packages_ms": {name: round(ms / args.repeat, 1) for name, ms in packages.most_common(args.top)},
+    }
+
+    print(f"import main         median {result['import_ms']:>8.1f} ms  (min {min(imports):.1f})")
+    print(f"first response      median {result['first_response_ms']:>8.1f} ms  "
+          f"(min {min(first_responses):.1f}, {result['mode']})")
+    print("heaviest packages (self time):")
+    for name, ms in result["packages_ms"].items():
+        print(f"  {name:<30}{ms:>8.1f} ms")
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+    ok = check("import", result["import_ms"], args.max_import_ms, baseline.get("import_ms"), args.tolerance)
+    ok &= check("first response", result["first_response_ms"], args.max_first_response_ms,
+                baseline.get("first_response_ms"), args.tolerance)
+
+    if args.output:
+        output_dir = os.path.dirname(args.output)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with open(args.output, "w") as fh:
+            json.dump(result, fh, indent=2)
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
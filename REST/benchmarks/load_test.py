@@ -0,0 +1,291 @@
+"""
+Load test for the auth + contacts flow.
+
+Seeds N confirmed users with M contacts each straight into the configured database, then drives virtual users
+concurrently against a running server: signup, login, refresh, contact create/read/update/delete, search, phone
+lookup and birthdays. Reports requests per second and p50/p95/p99 latency per endpoint and writes the results to JSON, so runs
+can be compared across commits.
+
+Run from the REST folder against a server started separately:
+
+    python benchmarks/load_test.py --users 20 --contacts 200 --concurrency 20 --duration 30 \
+        --output bench_results/$(git rev-parse --short HEAD).json
+
+or let the script start uvicorn itself and compare with a previous run:
+
+    python benchmarks/load_test.py --spawn-server --workers 2 --compare bench_results/baseline.json
+
+``GET /api/contacts/`` is rate limited to 10 requests per minute per client, so 429 responses are expected there;
+they are reported per status code and not counted as errors.
+
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+
+PASSWORD = "benchmark-password"
+
+
+def seed_mobile(index: int) -> str:
+    return f"050{index:07d}"
+
+
+def seed(users: int, contacts: int, run_id: str) -> list[str]:
+    """
+    Inserts confirmed users and their contacts with bulk Core inserts. The password is hashed once and shared. Each
+    user is written to its shard in its own transaction, and phones are normalized as the repository does.
+
+    """
+
+    from sqlalchemy import insert
+
+    from src.database.connect import SessionLocal
+    from src.database.model import Contact, User
+    from src.database.sharding import select_shard
+    from src.services.auth import auth_service
+    from src.services.phones import to_e164
+
+    password = auth_service.get_password_hash(PASSWORD)
+    emails = [f"load-{run_id}-{i}@example.com" for i in range(users)]
+    today = date.today()
+
+    db = SessionLocal()
+    try:
+        for i, email in enumerate(emails):
+            select_shard(db, email)
+            user_id = db.execute(insert(User).returning(User.id), {
+                "username": f"load_{run_id}_{i}", "email": email, "password": password, "confirmed": True,
+                "contacts_count": contacts,
+            }).scalar_one()
+            for start in range(0, contacts, 5000):
+                db.execute(insert(Contact), [
+                    {"name": f"Name{j}", "surname": f"Surname{j}", "email": f"{j}.{user_id}.{run_id}@contact.test",
+                     "mobile": seed_mobile(j), "phone": to_e164(seed_mobile(j)),
+                     "date_of_birth": today - timedelta(days=365 * 30 - j % 30), "user_id": user_id}
+                    for j in range(start, min(start + 5000, contacts))
+                ])
+            db.commit()
+    finally:
+        db.close()
+    return emails
+
+
+class Recorder:
+    def __init__(self):
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def call(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[label] += 1
+            return None
+        self.samples[label].append((time.perf_counter() - start) * 1000)
+        self.statuses[label][response.status_code] += 1
+        if response.status_code >= 500:
+            self.errors[label] += 1
+        return response
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+async def virtual_user(client: httpx.AsyncClient, recorder: Recorder, email: str, deadline: float, run_id: str):
+    response = await recorder.call(client, "POST /api/auth/login", "POST", "/api/auth/login",
+                                   data={"username": email, "password": PASSWORD})
+    if response is None or response.status_code != 200:
+        return
+    tokens = response.json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    iteration = 0
+
+    while time.perf_counter() < deadline:
+        iteration += 1
+        await recorder.call(client, "GET /api/contacts/", "GET", "/api/contacts/", headers=headers)
+        await recorder.call(client, "GET /api/contacts/by_choice/", "GET", "/api/contacts/by_choice/",
+                            params={"name": f"Name{random.randrange(50)}"}, headers=headers)
+        await recorder.call(client, "GET /api/contacts/by_phone/{number}", "GET",
+                            f"/api/contacts/by_phone/{seed_mobile(random.randrange(50))}", headers=headers)
+        await recorder.call(client, "GET /api/contacts/birthdays/", "GET", "/api/contacts/birthdays/",
+                            headers=headers)
+
+        body = {
+            "name": "Loadtest", "surname": "Contact", "email": f"{uuid.uuid4().hex}@{run_id}.test",
+            "mobile": "501234567", "date_of_birth": "1990-05-17",
+        }
+        created = await recorder.call(client, "POST /api/contacts/new/", "POST", "/api/contacts/new/",
+                                      json=body, headers=headers)
+        if created is not None and created.status_code == 201:
+            contact_id = created.json()["id"]
+            await recorder.call(client, "GET /api/contacts/{contact_id}", "GET", f"/api/contacts/{contact_id}",
+                                headers=headers)
+            await recorder.call(client, "PUT /api/contacts/{contact_id}", "PUT", f"/api/contacts/{contact_id}",
+                                json={**body, "name": "Updated", "done": True}, headers=headers)
+            await recorder.call(client, "DELETE /api/contacts/{contact_id}", "DELETE",
+                                f"/api/contacts/{contact_id}", headers=headers)
+
+        if iteration % 5 == 0:
+            refreshed = await recorder.call(client, "GET /api/auth/refresh_token", "GET", "/api/auth/refresh_token",
+                                            headers={"Authorization": f"Bearer {tokens['refresh_token']}"})
+            if refreshed is not None and refreshed.status_code == 200:
+                tokens = refreshed.json()
+                headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+        if iteration % 10 == 0:
+            await recorder.call(client, "POST /api/auth/signup", "POST", "/api/auth/signup", json={
+                "username": f"s{uuid.uuid4().hex[:12]}", "email": f"signup-{uuid.uuid4().hex}@{run_id}.test",
+                "password": PASSWORD[:20],
+            })
+
+
+async def drive(base_url: str, emails: list[str], concurrency: int, duration: float, run_id: str) -> tuple:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limits) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            virtual_user(client, recorder, emails[i % len(emails)], deadline, run_id) for i in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+    return recorder, elapsed
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    endpoints = {}
+    every = []
+    for label, samples in sorted(recorder.samples.items()):
+        ordered = sorted(samples)
+        every.extend(ordered)
+        endpoints[label] = {
+            "requests": len(ordered),
+            "rps": round(len(ordered) / elapsed, 2),
+            "p50_ms": round(percentile(ordered, 50), 2),
+            "p95_ms": round(percentile(ordered, 95), 2),
+            "p99_ms": round(percentile(ordered, 99), 2),
+            "errors": recorder.errors.get(label, 0),
+            "statuses": {str(code): count for code, count in sorted(recorder.statuses[label].items())},
+        }
+    every.sort()
+    return {
+        "total": {
+            "requests": len(every),
+            "rps": round(len(every) / elapsed, 2),
+            "p50_ms": round(percentile(every, 50), 2),
+            "p95_ms": round(percentile(every, 95), 2),
+            "p99_ms": round(percentile(every, 99), 2),
+            "errors": sum(recorder.errors.values()),
+        },
+        "endpoints": endpoints,
+    }
+
+
+def print_report(summary: dict, baseline: dict | None = None):
+    header = f"{'endpoint':<36}{'reqs':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>8}"
+    print(header)
+    print("-" * len(header))
+    rows = [*summary["endpoints"].items(), ("TOTAL", summary["total"])]
+    for label, stats in rows:
+        print(f"{label:<36}{stats['requests']:>8}{stats['rps']:>9.1f}{stats['p50_ms']:>9.1f}"
+              f"{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}{stats['errors']:>8}")
+        if baseline is not None:
+            before = baseline["total"] if label == "TOTAL" else baseline["endpoints"].get(label)
+            if before:
+                print(f"{'  vs baseline':<36}{'':>8}{stats['rps'] - before['rps']:>+9.1f}"
+                      f"{stats['p50_ms'] - before['p50_ms']:>+9.1f}{stats['p95_ms'] - before['p95_ms']:>+9.1f}"
+                      f"{stats['p99_ms'] - before['p99_ms']:>+9.1f}")
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def spawn_server(port: int, workers: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=os.path.abspath(os.path.join(os.path.dirname(__file__), '..')),
+    )
+    for _ in range(100):
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/").status_code == 200:
+                return server
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=10, help="users to seed")
+    parser.add_argument("--contacts", type=int, default=100, help="contacts to seed per user")
+    parser.add_argument("--concurrency", type=int, default=10, help="virtual users running at once")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to drive load")
+    parser.add_argument("--output", default="load_test_results.json")
+    parser.add_argument("--compare", help="previous results JSON to diff against")
+    parser.add_argument("--spawn-server", action="store_true", help="start uvicorn on the port of --base-url")
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    run_id = uuid.uuid4().hex[:8]
+    print(f"seeding {args.users} users x {args.contacts} contacts (run {run_id})")
+    emails = seed(args.users, args.contacts, run_id)
+
+    server = spawn_server(httpx.URL(args.base_url).port or 80, args.workers) if args.spawn_server else None
+    try:
+        recorder, elapsed = asyncio.run(drive(args.base_url, emails, args.concurrency, args.duration, run_id))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    summary = summarize(recorder, elapsed)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+    print_report(summary, baseline)
+
+    result = {
+        "commit": git_revision(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "params": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "duration_s": round(elapsed, 2),
+        **summary,
+    }
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, "w") as fh:
+        json.dump(result, fh, indent=2)
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,90 @@
-import time
-from pathlib import Path
-import uvicorn
-import redis.asyncio as redis
-from ipaddress import ip_address
-from typing import Callable
-from pydantic import EmailStr
+from contextlib import asynccontextmanager
 
+import redis.asyncio as redis
 from fastapi import FastAPI, Depends, HTTPException, status, Request, BackgroundTasks
-from sqlalchemy import text
-from sqlalchemy.orm import Session
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
 from fastapi_limiter import FastAPILimiter
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
-from src.routes import contacts, auth, users
-from src.database.connect import get_db
+from src.routes import contacts, auth, users, health, admin
+from src.database import profiler
+from src.database.replicas import ReadYourWritesMiddleware, database_engines, replica_router
 from src.database.model import EmailSchema
 from src.conf.config import settings
+from src.services import metrics
+from src.services.change_feed import change_feed
+from src.services.compression import CompressionMiddleware
+from src.services.email import get_mail_config
+from src.services.health import health_monitor
+from src.services.idempotency import IdempotencyMiddleware
+from src.services.logs import RequestIdMiddleware, log_pipeline
+from src.services.revocation import revocation_list
+from src.services.tracing import TracingMiddleware, instrument_engine, tracer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log_pipeline.start()
+    r = await redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0, encoding="utf-8",
+                          decode_responses=True)
+    await FastAPILimiter.init(r)
+    health_monitor.start()
+    revocation_list.start()
+    yield
+    await health_monitor.stop()
+    await revocation_list.stop()
+    await change_feed.stop()
+    await r.close()
+    tracer.flush()
+    log_pipeline.stop()
 
 
+app = FastAPI(lifespan=lifespan)
 
-app = FastAPI()
+engines = tuple(database_engines().values())
 
 
 origins = [
     "http://localhost:3000"
     ]
 
+app.add_middleware(IdempotencyMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "Idempotent-Replayed", "X-Request-ID"],
 )
 
-conf = ConnectionConfig(
-    MAIL_USERNAME = settings.mail_username,
-    MAIL_PASSWORD = settings.mail_password,
-    MAIL_FROM = EmailStr(settings.mail_from),
-    MAIL_PORT = settings.mail_port,
-    MAIL_SERVER = settings.mail_server,
-    MAIL_FROM_NAME = "Dear Receiver",
-    MAIL_STARTTLS = False,
-    MAIL_SSL_TLS = True,
-    USE_CREDENTIALS = True,
-    VALIDATE_CERTS = True,
-    TEMPLATE_FOLDER = Path(__file__).resolve().parent/ 'templates',
-)
+if settings.metrics_enabled:
+    for metered_engine in engines:
+        metrics.instrument_engine(metered_engine)
+    app.add_middleware(metrics.MetricsMiddleware)
 
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["Process-Time"] = str(process_time)
-    return response
+    @app.get("/metrics", include_in_schema=False)
+    def read_metrics():
+        return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE_LATEST)
 
+if settings.sql_profiler_enabled:
+    for profiled_engine in engines:
+        profiler.instrument_engine(profiled_engine)
+    app.add_middleware(profiler.QueryProfilerMiddleware)
 
-@app.on_event("startup")
-async def startup():
-    r = await redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0, encoding="utf-8",
-                          decode_responses=True)
-    await FastAPILimiter.init(r)
+if replica_router.replicas:
+    app.add_middleware(ReadYourWritesMiddleware, router=replica_router)
+
+if settings.compression_enabled:
+    app.add_middleware(CompressionMiddleware)
+
+if tracer.enabled:
+    for traced_engine in engines:
+        instrument_engine(traced_engine)
+    app.add_middleware(TracingMiddleware)
+
+app.add_middleware(RequestIdMiddleware)
 
 
 @app.get('/', name='Main')
@@ -72,22 +93,18 @@ def read_root():
 
 
 @app.get("/api/healthchecker")
-def healthchecker(db: Session = Depends(get_db)):
-    try:
-        result = db.execute(text("SELECT 1")).fetchone()
-        print(result)
-        if result is None:
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                                detail="Database is not configured correctly")
-        return {"message": "Welcome to FastAPI!"}
-    except Exception as e:
-        print(e)
+async def healthchecker():
+    state = await health_monitor.readiness()
+    if not state["checks"]["database"]["ok"]:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail="Error connecting to the database")
+    return {"message": "Welcome to FastAPI!"}
 
 
 @app.post("/send-email")
 async def send_in_background(background_tasks: BackgroundTasks, body: EmailSchema):
+    from fastapi_mail import FastMail, MessageSchema, MessageType
+
     message = MessageSchema(
         subject="Fastapi mail module",
         recipients=[body.email],
@@ -95,7 +112,7 @@ async def send_in_background(background_tasks: BackgroundTasks, body: EmailSchem
         subtype=MessageType.html
     )
 
-    fm = FastMail(conf)
+    fm = FastMail(get_mail_config())
 
     background_tasks.add_task(fm.send_message, message, template_name="example_email.html")
 
@@ -105,7 +122,11 @@ async def send_in_background(background_tasks: BackgroundTasks, body: EmailSchem
 app.include_router(auth.router, prefix='/api')
 app.include_router(contacts.router, prefix='/api')
 app.include_router(users.router, prefix='/api')
+app.include_router(health.router, prefix='/api')
+app.include_router(admin.router, prefix='/api')
 
 
 if __name__ == '__main__':
+    import uvicorn
+
     uvicorn.run(app='main:app', port=8000, reload=True)
@@ -4,6 +4,7 @@ from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 
 from alembic import context
+from src.conf.config import settings
 from src.database.connect import SQLALCHEMY_DATABASE_URL
 from src.database.model import Base
 
@@ -23,6 +24,11 @@ if config.config_file_name is not None:
 target_metadata = Base.metadata
 config.get_main_option("sqlalchemy.url", SQLALCHEMY_DATABASE_URL)
 
+# with sharding every shard is migrated on its own: alembic -x shard=<name> upgrade head
+shard = context.get_x_argument(as_dictionary=True).get("shard")
+if shard is not None:
+    config.set_main_option("sqlalchemy.url", settings.sqlalchemy_shard_urls[shard].replace("%", "%%"))
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
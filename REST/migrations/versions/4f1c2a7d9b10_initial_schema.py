@@ -0,0 +1,54 @@
+"""initial schema
+
+Revision ID: 4f1c2a7d9b10
+Revises: 
+Create Date: 2026-10-19 10:02:11.418275
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f1c2a7d9b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=50), nullable=True),
+        sa.Column('email', sa.String(length=150), nullable=True),
+        sa.Column('password', sa.String(length=255), nullable=False),
+        sa.Column('avatar', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('refresh_token', sa.String(length=255), nullable=True),
+        sa.Column('confirmed', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'contacts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('surname', sa.String(length=50), nullable=False),
+        sa.Column('email', sa.String(length=100), nullable=True),
+        sa.Column('mobile', sa.Integer(), nullable=True),
+        sa.Column('date_of_birth', sa.Date(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_contacts_email'), 'contacts', ['email'], unique=True)
+    op.create_index(op.f('ix_contacts_name'), 'contacts', ['name'], unique=False)
+    op.create_index(op.f('ix_contacts_surname'), 'contacts', ['surname'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_contacts_surname'), table_name='contacts')
+    op.drop_index(op.f('ix_contacts_name'), table_name='contacts')
+    op.drop_index(op.f('ix_contacts_email'), table_name='contacts')
+    op.drop_table('contacts')
+    op.drop_table('user')
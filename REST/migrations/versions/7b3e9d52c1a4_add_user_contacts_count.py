@@ -0,0 +1,28 @@
+"""add user contacts_count
+
+Revision ID: 7b3e9d52c1a4
+Revises: 4f1c2a7d9b10
+Create Date: 2026-10-19 10:14:52.903116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b3e9d52c1a4'
+down_revision = '4f1c2a7d9b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('user', sa.Column('contacts_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        'UPDATE "user" SET contacts_count = '
+        '(SELECT count(*) FROM contacts WHERE contacts.user_id = "user".id)'
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('user', 'contacts_count')
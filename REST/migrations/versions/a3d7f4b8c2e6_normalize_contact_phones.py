@@ -0,0 +1,63 @@
+"""store contact phones as text and in E.164
+
+Keeps the mobile number as it was typed instead of an integer, and adds the E.164 form with a (user_id, phone)
+index for lookups by number. Leading zeros already lost by the integer column cannot be restored; national numbers
+are read in the country of PHONE_COUNTRY_CODE. While contacts are being moved to the partitioned table, the copy
+gets the same changes so the mirror trigger keeps working.
+
+Revision ID: a3d7f4b8c2e6
+Revises: e81b3c6f2a95
+Create Date: 2026-10-19 18:47:12.604381
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from src.database.partitioning import PHONE_INDEXES, SHADOW, shadow_indexes_ddl
+from src.services.phones import to_e164
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d7f4b8c2e6'
+down_revision = 'e81b3c6f2a95'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 10_000
+
+
+def _tables() -> list[str]:
+    return ['contacts', *([SHADOW] if sa.inspect(op.get_bind()).has_table(SHADOW) else [])]
+
+
+def upgrade() -> None:
+    tables = _tables()
+    for table in tables:
+        op.alter_column(table, 'mobile', existing_type=sa.Integer(), type_=sa.String(25),
+                        postgresql_using='mobile::text')
+        op.add_column(table, sa.Column('phone', sa.String(16), nullable=True))
+
+    connection = op.get_bind()
+    last_id = 0
+    while rows := connection.execute(sa.text("SELECT id, mobile FROM contacts WHERE id > :last_id "
+                                             "AND mobile IS NOT NULL ORDER BY id LIMIT :limit"),
+                                     {"last_id": last_id, "limit": BATCH_SIZE}).all():
+        connection.execute(sa.text("UPDATE contacts SET phone = :phone WHERE id = :id"),
+                           [{"id": row.id, "phone": to_e164(row.mobile)} for row in rows])
+        last_id = rows[-1].id
+
+    op.create_index('ix_contacts_user_id_phone', 'contacts', ['user_id', 'phone'])
+    if SHADOW in tables:
+        for statement in shadow_indexes_ddl(PHONE_INDEXES):
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    tables = _tables()
+    op.drop_index('ix_contacts_user_id_phone', table_name='contacts')
+    for table in tables:
+        op.drop_column(table, 'phone')
+        # numbers too long for an integer are dropped
+        op.alter_column(table, 'mobile', existing_type=sa.String(25), type_=sa.Integer(),
+                        postgresql_using="CASE WHEN regexp_replace(mobile, '[^0-9]', '', 'g') ~ '^[0-9]{1,9}$' "
+                                         "THEN regexp_replace(mobile, '[^0-9]', '', 'g')::integer END")
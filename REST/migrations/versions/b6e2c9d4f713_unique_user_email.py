@@ -0,0 +1,33 @@
+"""unique user email
+
+Signup inserts with ON CONFLICT on the email, which needs a unique constraint; it also serves the lookups by email
+of login and authentication. Duplicate emails left by the old check-then-insert signup have to be merged by hand
+first, the migration stops and lists them.
+
+Revision ID: b6e2c9d4f713
+Revises: a3d7f4b8c2e6
+Create Date: 2026-10-19 20:11:36.152947
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e2c9d4f713'
+down_revision = 'a3d7f4b8c2e6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    duplicates = op.get_bind().execute(sa.text(
+        'SELECT email FROM "user" GROUP BY email HAVING count(*) > 1 ORDER BY email LIMIT 10'
+    )).scalars().all()
+    if duplicates:
+        raise RuntimeError(f"Users share an email, merge them before upgrading: {', '.join(duplicates)}")
+    op.create_unique_constraint('user_email_key', 'user', ['email'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('user_email_key', 'user', type_='unique')
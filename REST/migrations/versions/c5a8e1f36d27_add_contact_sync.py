@@ -0,0 +1,40 @@
+"""add contacts updated_at and contact_tombstones
+
+Revision ID: c5a8e1f36d27
+Revises: 7b3e9d52c1a4
+Create Date: 2026-10-19 14:32:07.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5a8e1f36d27'
+down_revision = '7b3e9d52c1a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # existing rows get the migration time, in UTC like the timestamps written by the application
+    op.add_column('contacts', sa.Column('updated_at', sa.DateTime(),
+                                        server_default=sa.text("timezone('utc', now())"), nullable=False))
+    op.create_index('ix_contacts_user_id_updated_at', 'contacts', ['user_id', 'updated_at'])
+    op.create_table(
+        'contact_tombstones',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('contact_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_contact_tombstones_user_id_deleted_at', 'contact_tombstones', ['user_id', 'deleted_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contact_tombstones_user_id_deleted_at', table_name='contact_tombstones')
+    op.drop_table('contact_tombstones')
+    op.drop_index('ix_contacts_user_id_updated_at', table_name='contacts')
+    op.drop_column('contacts', 'updated_at')
@@ -0,0 +1,34 @@
+"""partition contacts
+
+Creates the hash-partitioned copy of contacts and the trigger keeping it in sync, when CONTACTS_PARTITIONS is set.
+The rows are then moved with ``python -m src.database.partitioning copy`` and ``swap``; see that module.
+
+Revision ID: e81b3c6f2a95
+Revises: c5a8e1f36d27
+Create Date: 2026-10-19 16:05:43.270914
+
+"""
+from alembic import op
+
+from src.conf.config import settings
+from src.database.partitioning import drop_shadow_ddl, shadow_table_ddl
+
+
+# revision identifiers, used by Alembic.
+revision = 'e81b3c6f2a95'
+down_revision = 'c5a8e1f36d27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if not settings.contacts_partitions:
+        return
+    for statement in shadow_table_ddl(settings.contacts_partitions):
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    # after the swap contacts itself is partitioned and is kept; before it the copy is dropped
+    for statement in drop_shadow_ddl():
+        op.execute(statement)
@@ -7,8 +7,18 @@ INVALID_REFRESH_TOKEN = "Invalid refresh token"
 INVALID_TOKEN = "Invalid token for email verification"
 NOT_FOUND = "Verification error"
 UNAUTHORIZED = "Could not validate credentials"
+ADMIN_REQUIRED = "Admin rights required"
 CREATE_CONTACT_FAILED = "Creation of contact failed"
 NOT_FOUND_CONTACT = "Not Found"
+NOTHING_TO_MERGE = "No duplicates to merge"
+INVALID_SYNC_TOKEN = "Invalid sync token"
+INVALID_PHONE = "Invalid phone number"
+IDEMPOTENCY_KEY_INVALID = "Idempotency-Key must be 1 to 255 characters"
+IDEMPOTENCY_KEY_REUSED = "Idempotency-Key was already used with a different request body"
+IDEMPOTENCY_IN_PROGRESS = "A request with this Idempotency-Key is still in progress, retry later"
+PROFILER_BUSY = "A profile is already running on this worker, retry later"
 ALREADY_CONFIRMED_EMAIL = "The email already confirmed"
+LOGGED_OUT = "Successfully logged out"
+LOGGED_OUT_ALL = "Logged out from all devices"
 
 USER_CONFIRMATION = "User successfully created. Check your email for confirmation."
\ No newline at end of file
@@ -2,9 +2,11 @@ import configparser
 import pathlib
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
 
 from src.conf.config import settings
+from src.database.sharding import ShardRouter, ShardSession
 
 
 SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_database_url
@@ -12,6 +14,23 @@ SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_database_url
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autoflush=False, autocommit=False, bind=engine)
 
+shard_router = ShardRouter(settings.sqlalchemy_shard_urls, vnodes=settings.shard_vnodes)
+if shard_router.engines:
+    SessionLocal = sessionmaker(class_=ShardSession, router=shard_router, autoflush=False, autocommit=False)
+
+
+def write_engines() -> dict[str, Engine]:
+    """
+    The write_engines function returns the databases the requests write to by name: the shards when sharding is
+    configured, the primary otherwise.
+
+    :return: The engines by name.
+    :rtype: dict[str, Engine]
+
+    """
+
+    return dict(shard_router.engines) or {"primary": engine}
+
 def get_db():
     db = SessionLocal()
     try:
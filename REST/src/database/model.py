@@ -1,35 +1,62 @@
-from sqlalchemy import Column, Integer, String, func, Boolean
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, func, Boolean, Index
 from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy.sql.sqltypes import Date, DateTime
 from sqlalchemy.sql.schema import ForeignKey
 from pydantic import EmailStr, BaseModel
 
+from src.conf.config import settings
+from src.database.partitioning import contacts_table_args, create_partitions_on_create
+
 
 Base = declarative_base()
 
 
 class Contact(Base):
     __tablename__ = "contacts"
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(50), nullable=False, index=True)
     surname = Column(String(50), nullable=False, index=True)
-    email = Column(String(100), unique=True, index=True)
-    mobile = Column(Integer, nullable=True)
+    email = Column(String(100), unique=not settings.contacts_partitions, index=True)
+    mobile = Column(String(25), nullable=True)
+    phone = Column(String(16), nullable=True)
     date_of_birth = Column(Date)
-    user_id = Column('user_id', ForeignKey('user.id',ondelete='CASCADE'), default=None)
+    user_id = Column('user_id', ForeignKey('user.id',ondelete='CASCADE'), default=None,
+                     nullable=not settings.contacts_partitions, primary_key=bool(settings.contacts_partitions),
+                     autoincrement=False)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     user = relationship('User', backref='contacts')
 
+    __table_args__ = contacts_table_args(settings.contacts_partitions)
+    __mapper_args__ = {"primary_key": [id]}
+
+
+if settings.contacts_partitions:
+    create_partitions_on_create(Contact.__table__, settings.contacts_partitions)
+
+
+class ContactTombstone(Base):
+    __tablename__ = "contact_tombstones"
+    id = Column(Integer, primary_key=True)
+    contact_id = Column(Integer, nullable=False)
+    user_id = Column('user_id', ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    deleted_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (Index('ix_contact_tombstones_user_id_deleted_at', 'user_id', 'deleted_at'),)
+
 
 class User(Base):
     __tablename__ = "user"
     id = Column(Integer, primary_key=True)
     username = Column(String(50))
-    email = Column(String(150))
+    email = Column(String(150), unique=True)
     password = Column(String(255), nullable=False)
     avatar = Column(String(255), nullable = True)
     created_at = Column('created_at', DateTime, default=func.now())
     refresh_token = Column(String(255), nullable=True)
     confirmed = Column(Boolean, default = False)
+    contacts_count = Column(Integer, nullable=False, default=0, server_default='0')
 
 
 class EmailSchema(BaseModel):
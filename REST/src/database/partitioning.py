@@ -0,0 +1,327 @@
+"""
+Partitioning module
+___________________
+Hash partitioning of the contacts table on ``user_id``. Every contact query filters by user, so the planner prunes
+all partitions but one: each user's rows and index entries live in a small partition that vacuums and caches well.
+
+A partitioned table needs its partition key in every unique constraint, so when ``contacts_partitions`` is set the
+primary key becomes (id, user_id), contact emails are unique per user rather than globally, and ``user_id`` is
+required. The ORM still identifies contacts by id alone.
+
+An existing table is converted online, without blocking writes until the final rename:
+
+1. the ``partition contacts`` migration creates ``contacts_partitioned`` with the same columns, and a trigger that
+   mirrors every write to ``contacts`` into it;
+2. ``python -m src.database.partitioning copy`` copies the existing rows in id batches, resumable with
+   ``--start-id`` and throttled with ``--pause``;
+3. ``python -m src.database.partitioning swap`` renames the tables in one short transaction;
+4. ``python -m src.database.partitioning drop-old`` drops the old table once the new one is trusted.
+
+Contacts without a user cannot be placed in a partition and are not copied. The trigger copies whole rows, so
+other schema changes to contacts must wait until the swap.
+
+"""
+
+import argparse
+import logging
+import time
+
+from sqlalchemy import DDL, Index, Table, UniqueConstraint, event, text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+SHADOW = "contacts_partitioned"
+OLD = "contacts_unpartitioned"
+CONTACT_INDEXES = {
+    "ix_contacts_name": "(name)",
+    "ix_contacts_surname": "(surname)",
+    "ix_contacts_email": "(email)",
+    "ix_contacts_user_id_updated_at": "(user_id, updated_at)",
+}
+# created after the partition migration, by the migration adding the phone column, on the copy too if it exists
+PHONE_INDEXES = {
+    "ix_contacts_user_id_phone": "(user_id, phone)",
+}
+
+
+def contacts_table_args(partitions: int) -> tuple:
+    """
+    The contacts_table_args function returns the __table_args__ of the Contact model.
+
+    :param partitions: The number of hash partitions, 0 for a plain table.
+    :type partitions: int
+
+    :return: The indexes, constraints and table options.
+    :rtype: tuple
+
+    """
+
+    updated_at = Index('ix_contacts_user_id_updated_at', 'user_id', 'updated_at')
+    phone = Index('ix_contacts_user_id_phone', 'user_id', 'phone')
+    if not partitions:
+        return updated_at, phone
+    return (
+        updated_at,
+        phone,
+        UniqueConstraint('user_id', 'email', name='uq_contacts_user_id_email'),
+        {"postgresql_partition_by": "HASH (user_id)"},
+    )
+
+
+def hash_partitions_ddl(table: str, partitions: int) -> list[str]:
+    """
+    The hash_partitions_ddl function returns the statements creating the partitions of a table partitioned by hash.
+
+    :param table: The partitioned table.
+    :type table: str
+
+    :param partitions: The number of partitions.
+    :type partitions: int
+
+    :return: One CREATE TABLE statement per partition.
+    :rtype: list[str]
+
+    """
+
+    return [
+        f"CREATE TABLE {table}_p{remainder} PARTITION OF {table} "
+        f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        for remainder in range(partitions)
+    ]
+
+
+def create_partitions_on_create(table: Table, partitions: int):
+    """
+    The create_partitions_on_create function makes create_all create the partitions right after the table, on
+    PostgreSQL only.
+
+    :param table: The partitioned table.
+    :type table: Table
+
+    :param partitions: The number of partitions.
+    :type partitions: int
+
+    """
+
+    for statement in hash_partitions_ddl(table.name, partitions):
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+
+def shadow_indexes_ddl(indexes: dict[str, str]) -> list[str]:
+    return [f"CREATE INDEX {name}_partitioned ON {SHADOW} {columns}" for name, columns in indexes.items()]
+
+
+def shadow_table_ddl(partitions: int) -> list[str]:
+    """
+    The shadow_table_ddl function returns the statements creating the partitioned copy of contacts and the trigger
+    keeping it up to date. The copy shares the columns, defaults and id sequence of contacts.
+
+    :param partitions: The number of partitions.
+    :type partitions: int
+
+    :return: The statements, in order.
+    :rtype: list[str]
+
+    """
+
+    return [
+        f"CREATE TABLE {SHADOW} (LIKE contacts INCLUDING DEFAULTS) PARTITION BY HASH (user_id)",
+        f"ALTER TABLE {SHADOW} ALTER COLUMN user_id SET NOT NULL",
+        f"ALTER TABLE {SHADOW} ADD CONSTRAINT {SHADOW}_pkey PRIMARY KEY (id, user_id)",
+        f"ALTER TABLE {SHADOW} ADD CONSTRAINT uq_contacts_user_id_email UNIQUE (user_id, email)",
+        f'ALTER TABLE {SHADOW} ADD FOREIGN KEY (user_id) REFERENCES "user" (id) ON DELETE CASCADE',
+        *hash_partitions_ddl(SHADOW, partitions),
+        *shadow_indexes_ddl(CONTACT_INDEXES),
+        f"""
+        CREATE FUNCTION contacts_mirror() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM {SHADOW} WHERE id = OLD.id AND user_id = OLD.user_id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.user_id IS NOT NULL THEN
+                INSERT INTO {SHADOW} SELECT (NEW).* ON CONFLICT DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END
+        $$
+        """,
+        "CREATE TRIGGER contacts_mirror AFTER INSERT OR UPDATE OR DELETE ON contacts "
+        "FOR EACH ROW EXECUTE FUNCTION contacts_mirror()",
+    ]
+
+
+def drop_shadow_ddl() -> list[str]:
+    return [
+        "DROP TRIGGER IF EXISTS contacts_mirror ON contacts",
+        "DROP FUNCTION IF EXISTS contacts_mirror()",
+        f"DROP TABLE IF EXISTS {SHADOW}",
+    ]
+
+
+def copy_batch(connection: Connection, start_id: int, end_id: int) -> int:
+    """
+    The copy_batch function copies the contacts with start_id < id <= end_id. The source rows are locked FOR SHARE,
+    so a concurrent update or delete either finishes before the copy and is read by it, or waits for it and is
+    mirrored by the trigger. Rows the trigger already copied are kept.
+
+    :param connection: A connection to run the batch in its own transaction.
+    :type connection: Connection
+
+    :param start_id: The last id of the previous batch.
+    :type start_id: int
+
+    :param end_id: The last id of this batch.
+    :type end_id: int
+
+    :return: The number of rows copied.
+    :rtype: int
+
+    """
+
+    with connection.begin():
+        result = connection.execute(text(
+            f"INSERT INTO {SHADOW} SELECT * FROM ("
+            "SELECT * FROM contacts WHERE id > :start_id AND id <= :end_id AND user_id IS NOT NULL FOR SHARE"
+            ") AS batch ON CONFLICT DO NOTHING"
+        ), {"start_id": start_id, "end_id": end_id})
+    return result.rowcount
+
+
+def copy(engine: Engine, start_id: int = 0, batch_size: int = 10_000, pause: float = 0.0) -> int:
+    """
+    The copy function copies the existing contacts in batches of ids, up to the highest id when it starts. Later
+    rows were written after the trigger was created and are already mirrored.
+
+    :param engine: The database engine.
+    :type engine: Engine
+
+    :param start_id: Resume after this id.
+    :type start_id: int
+
+    :param batch_size: The number of ids per transaction.
+    :type batch_size: int
+
+    :param pause: Seconds to sleep between batches, to leave I/O to the application.
+    :type pause: float
+
+    :return: The number of rows copied.
+    :rtype: int
+
+    """
+
+    with engine.connect() as connection:
+        max_id = connection.execute(text("SELECT coalesce(max(id), 0) FROM contacts")).scalar()
+        connection.commit()
+        copied, started = 0, time.perf_counter()
+        while start_id < max_id:
+            end_id = min(start_id + batch_size, max_id)
+            copied += copy_batch(connection, start_id, end_id)
+            start_id = end_id
+            logger.info("copied up to id %d of %d: %d rows, %.0f rows/s",
+                        start_id, max_id, copied, copied / (time.perf_counter() - started))
+            if pause:
+                time.sleep(pause)
+    return copied
+
+
+def swap_ddl(partitions: int) -> list[str]:
+    """
+    The swap_ddl function returns the statements replacing contacts by its partitioned copy. They run in one
+    transaction that holds the table lock only for the renames.
+
+    :param partitions: The number of partitions of the copy.
+    :type partitions: int
+
+    :return: The statements, in order.
+    :rtype: list[str]
+
+    """
+
+    return [
+        "LOCK TABLE contacts IN ACCESS EXCLUSIVE MODE",
+        *drop_shadow_ddl()[:2],
+        f"ALTER TABLE contacts RENAME TO {OLD}",
+        f"ALTER TABLE {OLD} RENAME CONSTRAINT contacts_pkey TO {OLD}_pkey",
+        f"ALTER TABLE {OLD} RENAME CONSTRAINT contacts_user_id_fkey TO {OLD}_user_id_fkey",
+        *(f"ALTER INDEX {name} RENAME TO {name}_unpartitioned" for name in {**CONTACT_INDEXES, **PHONE_INDEXES}),
+        f"ALTER TABLE {SHADOW} RENAME TO contacts",
+        f"ALTER TABLE contacts RENAME CONSTRAINT {SHADOW}_pkey TO contacts_pkey",
+        f"ALTER TABLE contacts RENAME CONSTRAINT {SHADOW}_user_id_fkey TO contacts_user_id_fkey",
+        *(f"ALTER INDEX {name}_partitioned RENAME TO {name}" for name in {**CONTACT_INDEXES, **PHONE_INDEXES}),
+        *(f"ALTER TABLE {SHADOW}_p{remainder} RENAME TO contacts_p{remainder}" for remainder in range(partitions)),
+        "ALTER SEQUENCE contacts_id_seq OWNED BY contacts.id",
+    ]
+
+
+def partition_count(connection: Connection) -> int:
+    return connection.execute(text(
+        "SELECT count(*) FROM pg_inherits WHERE inhparent = CAST(:table AS regclass)"
+    ), {"table": SHADOW}).scalar()
+
+
+def swap(engine: Engine):
+    with engine.begin() as connection:
+        for statement in swap_ddl(partition_count(connection)):
+            connection.execute(text(statement))
+
+
+def drop_old(engine: Engine):
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE {OLD}"))
+
+
+def scanned_tables(connection: Connection, statement: str, params: dict | None = None) -> set[str]:
+    """
+    The scanned_tables function runs EXPLAIN on a query and returns the tables its plan reads, to check that
+    partition pruning happens.
+
+    :param connection: A PostgreSQL connection.
+    :type connection: Connection
+
+    :param statement: The SQL query.
+    :type statement: str
+
+    :param params: The bound parameters of the query.
+    :type params: dict | None
+
+    :return: The names of the scanned tables and partitions.
+    :rtype: set[str]
+
+    """
+
+    plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {statement}"), params or {}).scalar()
+
+    tables, nodes = set(), [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if "Relation Name" in node:
+            tables.add(node["Relation Name"])
+        nodes.extend(node.get("Plans", ()))
+    return tables
+
+
+def main():
+    from src.database.connect import engine
+
+    parser = argparse.ArgumentParser(description="Move contacts to the hash-partitioned table online.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    copy_parser = commands.add_parser("copy", help="copy the existing rows in batches")
+    copy_parser.add_argument("--start-id", type=int, default=0, help="resume after this id")
+    copy_parser.add_argument("--batch-size", type=int, default=10_000)
+    copy_parser.add_argument("--pause", type=float, default=0.0, help="seconds between batches")
+    commands.add_parser("swap", help="replace contacts by the partitioned table")
+    commands.add_parser("drop-old", help="drop the table left by swap")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.command == "copy":
+        copy(engine, args.start_id, args.batch_size, args.pause)
+    elif args.command == "swap":
+        swap(engine)
+    else:
+        drop_old(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Query profiler module
+_____________________
+Debug helper that counts the SQL statements issued while serving a request, sums their time and reports
+statements that ran more than once, the usual sign of an N+1 pattern.
+
+"""
+
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter_ns
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+class QueryProfile:
+    """
+    Statements recorded for one unit of work, usually one request.
+
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.statements: Counter[str] = Counter()
+
+    def record(self, statement: str, elapsed_ns: int):
+        self.count += 1
+        self.total_ns += elapsed_ns
+        self.statements[statement] += 1
+
+    @property
+    def total_ms(self) -> float:
+        return self.total_ns / 1_000_000
+
+    @property
+    def duplicates(self) -> dict[str, int]:
+        """
+        Statements, with their bound parameters left out, that were executed more than once.
+
+        """
+
+        return {statement: times for statement, times in self.statements.items() if times > 1}
+
+    @property
+    def duplicate_count(self) -> int:
+        return sum(times - 1 for times in self.duplicates.values())
+
+
+_current_profile: ContextVar[QueryProfile | None] = ContextVar("query_profile", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        context._profiler_start_ns = perf_counter_ns()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.record(statement, perf_counter_ns() - context._profiler_start_ns)
+
+
+def instrument_engine(engine: Engine):
+    """
+    The instrument_engine function attaches the profiler hooks to an engine. Statements are only recorded while
+    a profile is active in the current context, see profile_queries.
+
+    :param engine: The engine to instrument.
+    :type engine: Engine
+
+    """
+
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def profile_queries() -> Iterator[QueryProfile]:
+    """
+    The profile_queries function activates a new profile for the current context, including the worker threads
+    that copy it, and yields it.
+
+    :return: The active profile.
+    :rtype: Iterator[QueryProfile]
+
+    """
+
+    profile = QueryProfile()
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+
+
+@contextmanager
+def count_queries(engine: Engine) -> Iterator[QueryProfile]:
+    """
+    The count_queries function records every statement run on the engine while the block is open, whichever thread
+    or event loop runs it. It is meant for tests driving the app through TestClient.
+
+    :param engine: The engine to watch.
+    :type engine: Engine
+
+    :return: The profile filled while the block runs.
+    :rtype: Iterator[QueryProfile]
+
+    """
+
+    profile = QueryProfile()
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        context._budget_start_ns = perf_counter_ns()
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        profile.record(statement, perf_counter_ns() - context._budget_start_ns)
+
+    event.listen(engine, "before_cursor_execute", before)
+    event.listen(engine, "after_cursor_execute", after)
+    try:
+        yield profile
+    finally:
+        event.remove(engine, "before_cursor_execute", before)
+        event.remove(engine, "after_cursor_execute", after)
+
+
+class QueryProfilerMiddleware:
+    """
+    ASGI middleware that profiles each request and returns the figures as response headers:
+    X-DB-Query-Count, X-DB-Time-Ms and X-DB-Duplicate-Queries. Requests with repeated statements are logged.
+
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with profile_queries() as profile:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    message.setdefault("headers", [])
+                    message["headers"] = [
+                        *message["headers"],
+                        (b"x-db-query-count", str(profile.count).encode()),
+                        (b"x-db-time-ms", f"{profile.total_ms:.3f}".encode()),
+                        (b"x-db-duplicate-queries", str(profile.duplicate_count).encode()),
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+        if profile.duplicates:
+            logger.warning("%s %s issued %d statements in %.3f ms, repeated: %s", scope["method"], scope["path"],
+                           profile.count, profile.total_ms, profile.duplicates)
@@ -0,0 +1,314 @@
+"""
+Read replicas module
+____________________
+Routing of read-only requests to a pool of replica databases. Replicas are picked round-robin or by the fewest
+sessions in use; a replica whose connection fails is skipped for ``retry_interval`` seconds and reads fall back to
+the primary when no replica is left. The read that found the replica down is retried once on the primary, so the
+request does not fail.
+
+Read-your-writes: when a request commits on the primary, its user reads from the primary for ``sticky_seconds``
+afterwards, so replication lag never hides the user's own changes. The marker is kept in Redis to hold across workers.
+
+"""
+
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+from functools import cached_property
+from typing import Iterator
+
+import redis as redis_db
+from fastapi import Depends, Request
+from jose import JWTError, jwt
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from src.conf.config import settings
+from src.database.connect import get_db, write_engines
+
+ROUND_ROBIN = "round_robin"
+LEAST_CONNECTIONS = "least_connections"
+
+
+class WriteTracker:
+    """
+    Set for one request; flagged when a session commits while the request is served.
+
+    """
+
+    def __init__(self):
+        self.wrote = False
+
+
+_current_writes: ContextVar[WriteTracker | None] = ContextVar("read_your_writes", default=None)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    tracker = _current_writes.get()
+    if tracker is not None:
+        tracker.wrote = True
+
+
+def read_your_writes_key(headers) -> str | None:
+    """
+    The read_your_writes_key function identifies the user of a request by the subject of its bearer token. The
+    signature is not checked here; the token is validated by the route as usual.
+
+    :param headers: The request headers.
+    :type headers: Mapping[str, str]
+
+    :return: The email of the user or None for anonymous requests.
+    :rtype: str | None
+
+    """
+
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.get_unverified_claims(token).get("sub")
+    except JWTError:
+        return None
+
+
+def check_topology(replica_urls: list[str], shard_urls: dict[str, str]):
+    """
+    The check_topology function rejects configurations with both read replicas and shards: replica sessions read from
+    replicas of the primary and would ignore the shard of the user.
+
+    :param replica_urls: The replica database urls.
+    :type replica_urls: list[str]
+
+    :param shard_urls: The shard database urls by name.
+    :type shard_urls: dict[str, str]
+
+    :raises ValueError: If both are configured.
+
+    """
+
+    if replica_urls and shard_urls:
+        raise ValueError("Read replicas cannot be combined with sharding, configure either "
+                         "SQLALCHEMY_REPLICA_URLS or SQLALCHEMY_SHARD_URLS")
+
+
+class ReplicaSession(Session):
+    """
+    Session reading from a replica. A statement failing because the replica is unreachable is retried once on the
+    primary, and the session stays on the primary from then on.
+
+    """
+
+    def __init__(self, router: "ReplicaRouter", replica: Engine, primary: Engine | None, **kwargs):
+        super().__init__(bind=replica, **kwargs)
+        self.router = router
+        self.replica = replica
+        self.primary = primary
+
+    def execute(self, statement, *args, **kwargs):
+        try:
+            return super().execute(statement, *args, **kwargs)
+        except DBAPIError:
+            if self.primary is None or self.bind is not self.replica or not self.router.is_down(self.replica):
+                raise
+        self.rollback()
+        self.bind = self.primary
+        return super().execute(statement, *args, **kwargs)
+
+
+class ReplicaRouter:
+    def __init__(self, urls: list[str], strategy: str = ROUND_ROBIN, sticky_seconds: float = 5.0,
+                 retry_interval: float = 30.0, **engine_options):
+        if strategy not in (ROUND_ROBIN, LEAST_CONNECTIONS):
+            raise ValueError(f"Unknown replica strategy: {strategy}")
+        self.strategy = strategy
+        self.sticky_seconds = sticky_seconds
+        self.retry_interval = retry_interval
+        self.replicas = [create_engine(url, pool_pre_ping=True, **engine_options) for url in urls]
+        self.down_until = {replica: 0.0 for replica in self.replicas}
+        self.in_use = {replica: 0 for replica in self.replicas}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        for replica in self.replicas:
+            event.listen(replica, "handle_error", self._on_error)
+
+    @cached_property
+    def redis(self):
+        from src.services.redis_client import get_redis
+
+        return get_redis(decode_responses=True)
+
+    def _on_error(self, context):
+        if context.connection is None or context.is_disconnect:
+            self.mark_down(context.engine)
+
+    def mark_down(self, replica: Engine):
+        """
+        The mark_down function takes a replica out of rotation for retry_interval seconds.
+
+        :param replica: The failing replica.
+        :type replica: Engine
+
+        """
+
+        self.down_until[replica] = time.monotonic() + self.retry_interval
+
+    def is_down(self, replica: Engine) -> bool:
+        return self.down_until[replica] > time.monotonic()
+
+    def healthy(self) -> list[Engine]:
+        now = time.monotonic()
+        return [replica for replica in self.replicas if self.down_until[replica] <= now]
+
+    def choose(self) -> Engine | None:
+        """
+        The choose function picks the replica for the next read session.
+
+        :return: A healthy replica, or None if every replica is down.
+        :rtype: Engine | None
+
+        """
+
+        candidates = self.healthy()
+        if not candidates:
+            return None
+        if self.strategy == LEAST_CONNECTIONS:
+            return min(candidates, key=self.in_use.__getitem__)
+        return candidates[next(self._counter) % len(candidates)]
+
+    def record_write(self, key: str):
+        try:
+            self.redis.set(f"read_your_writes:{key}", 1, px=int(self.sticky_seconds * 1000))
+        except redis_db.RedisError:
+            pass
+
+    def is_sticky(self, key: str) -> bool:
+        """
+        The is_sticky function tells whether the user committed a change recently. When Redis cannot answer, the read
+        goes to the primary.
+
+        :param key: The email of the user.
+        :type key: str
+
+        :return: True if the user must read from the primary.
+        :rtype: bool
+
+        """
+
+        try:
+            return bool(self.redis.exists(f"read_your_writes:{key}"))
+        except redis_db.RedisError:
+            return True
+
+    def session(self, key: str | None = None, primary: Engine | None = None) -> ReplicaSession | None:
+        """
+        The session function opens a session on a replica, or returns None when the read must go to the primary.
+        Connections are opened lazily by the first query.
+
+        :param key: The email of the user, for read-your-writes.
+        :type key: str | None
+
+        :param primary: The primary database, where a read is retried if the replica turns out to be down.
+        :type primary: Engine | None
+
+        :return: A session bound to a replica, or None.
+        :rtype: ReplicaSession | None
+
+        """
+
+        if not self.replicas or (key is not None and self.is_sticky(key)):
+            return None
+        with self._lock:
+            replica = self.choose()
+            if replica is None:
+                return None
+            self.in_use[replica] += 1
+        return ReplicaSession(self, replica, primary, autoflush=False)
+
+    def release(self, session: ReplicaSession):
+        session.close()
+        with self._lock:
+            self.in_use[session.replica] -= 1
+
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI middleware that marks the user of a request as sticky to the primary once the request commits.
+
+    """
+
+    def __init__(self, app, router: "ReplicaRouter"):
+        self.app = app
+        self.router = router
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tracker = WriteTracker()
+        token = _current_writes.set(tracker)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and tracker.wrote:
+                key = read_your_writes_key(Request(scope).headers)
+                if key is not None:
+                    self.router.record_write(key)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_writes.reset(token)
+
+
+check_topology(settings.sqlalchemy_replica_urls, settings.sqlalchemy_shard_urls)
+replica_router = ReplicaRouter(
+    settings.sqlalchemy_replica_urls,
+    strategy=settings.replica_strategy,
+    sticky_seconds=settings.replica_sticky_seconds,
+    retry_interval=settings.replica_retry_interval,
+)
+
+
+def database_engines() -> dict[str, Engine]:
+    """
+    The database_engines function returns every database the requests use by name: the primary or the shards, then
+    the replicas.
+
+    :return: The engines by name.
+    :rtype: dict[str, Engine]
+
+    """
+
+    return {**write_engines(),
+            **{f"replica{index}": replica for index, replica in enumerate(replica_router.replicas)}}
+
+
+def get_read_db(request: Request, db: Session = Depends(get_db)) -> Iterator[Session]:
+    """
+    The get_read_db function is the dependency for read-only routes. It yields a replica session, or the primary
+    session of get_db when no replica is configured or healthy or the user wrote recently.
+
+    :param request: The current request.
+    :type request: Request
+
+    :param db: The primary session.
+    :type db: Session
+
+    :return: A session to read from.
+    :rtype: Iterator[Session]
+
+    """
+
+    session = replica_router.session(read_your_writes_key(request.headers), db.bind)
+    if session is None:
+        yield db
+        return
+    try:
+        yield session
+    finally:
+        replica_router.release(session)
@@ -0,0 +1,106 @@
+"""
+Sharding module
+_______________
+Spreading users over several databases. Each user, with the user row, contacts, tombstones and counter, lives on the
+shard that a consistent hash of the email picks. The email is the key because it is known at every entry point,
+login included, before the user row is read.
+
+Shards are named, ``{"a": url, "b": url}``, and every name owns ``vnodes`` points of a hash ring. Adding a shard only
+moves the users whose points it takes over, about 1/N of them, instead of reshuffling everyone as a modulo would.
+Those users have to be copied to the new shard before it is put in the configuration.
+
+Sessions bind to the shard of the user they serve: the repository selects it with ``select_shard`` before the first
+query, and a session refuses to switch shard inside a transaction. Ids are allocated per shard and are only unique
+together with the user. Read replicas are not combined with sharding.
+
+"""
+
+import bisect
+import hashlib
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    def __init__(self, names: list[str], vnodes: int = 100):
+        if not names:
+            raise ValueError("A hash ring needs at least one node")
+        points = sorted((_hash(f"{name}#{index}"), name) for name in names for index in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._names = [name for _, name in points]
+
+    def node_for(self, key: str) -> str:
+        """
+        The node_for function returns the node owning a key: the first point of the ring after the hash of the key.
+
+        :param key: The key to place.
+        :type key: str
+
+        :return: The name of the node.
+        :rtype: str
+
+        """
+
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._names[index]
+
+
+def shard_key(email: str) -> str:
+    return email.strip().lower()
+
+
+class ShardRouter:
+    def __init__(self, urls: dict[str, str], vnodes: int = 100, **engine_options):
+        self.engines: dict[str, Engine] = {name: create_engine(url, **engine_options) for name, url in urls.items()}
+        self.ring = HashRing(list(self.engines), vnodes) if self.engines else None
+
+    def shard_for(self, email: str) -> str:
+        return self.ring.node_for(shard_key(email))
+
+    def engine_for(self, email: str) -> Engine:
+        return self.engines[self.shard_for(email)]
+
+
+class ShardSession(Session):
+    """
+    Session executing every statement on the shard selected by ``select_shard``.
+
+    """
+
+    def __init__(self, router: ShardRouter, **kwargs):
+        super().__init__(**kwargs)
+        self.router = router
+        self.shard: str | None = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs) -> Engine:
+        if self.shard is None:
+            raise RuntimeError("No shard selected for this session, call select_shard first")
+        return self.router.engines[self.shard]
+
+
+def select_shard(db: Session, email: str):
+    """
+    The select_shard function binds a session to the shard of a user. It does nothing for unsharded sessions.
+
+    :param db: The database session.
+    :type db: Session
+
+    :param email: The email of the user the session works for.
+    :type email: str
+
+    :raises RuntimeError: If the session is inside a transaction on another shard.
+
+    """
+
+    if not isinstance(db, ShardSession):
+        return
+    shard = db.router.shard_for(email)
+    if db.shard not in (None, shard) and db.in_transaction():
+        raise RuntimeError(f"Session is in a transaction on shard {db.shard}, not {shard}")
+    db.shard = shard
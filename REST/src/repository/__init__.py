@@ -1,17 +1,28 @@
 from .contacts import (
     create_contact,
     get_contact,
+    get_contact_row,
     get_contacts,
+    get_contacts_rows,
     update_contact,
     get_contacts_choice,
+    get_contacts_choice_rows,
+    get_contacts_by_phone_rows,
     get_contacts_birthdays,
     update_contact_status,
     remove_contact,
-    update_avatar
+    update_avatar,
+    adjust_contacts_count,
+    get_contacts_count,
+    get_dedupe_rows,
+    merge_contacts,
+    get_contact_changes,
+    purge_tombstones
 )
 from .users import (
     get_user_by_email,
     create_user,
+    insert_user,
     update_token,
     confirmed_email,
     update_avatar
@@ -21,15 +32,26 @@ from .users import (
 __all__ = (
     "create_contact",
     "get_contact",
+    "get_contact_row",
     "get_contacts",
+    "get_contacts_rows",
     "update_contact",
     "get_contacts_choice",
+    "get_contacts_choice_rows",
+    "get_contacts_by_phone_rows",
     "get_contacts_birthdays",
     "update_contact_status",
     "remove_contact",
     "update_avatar",
+    "adjust_contacts_count",
+    "get_contacts_count",
+    "get_dedupe_rows",
+    "merge_contacts",
+    "get_contact_changes",
+    "purge_tombstones",
     "get_user_by_email",
     "create_user",
+    "insert_user",
     "update_token",
     "confirmed_email",
     "update_avatar"
@@ -1,15 +1,69 @@
+import sys
 from datetime import datetime, timedelta
 from typing import List, Sequence
 
-from sqlalchemy import func, Row, select
+from sqlalchemy import delete, false, func, Row, select, true, update
 from sqlalchemy.sql import text
 
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_
 
-from src.database.model import Contact, User
+from src.database.model import Contact, ContactTombstone, User
+from src.database.sharding import select_shard
 from src.schemas import ContactModel, ContactStatusUpdate
 from src.repository.users import get_user_by_email
+from src.services.change_feed import change_feed
+from src.services.phones import to_e164
+from src.services.sync import CHANGED, DELETED, SyncKey
+from src.services.tracing import trace_module
+
+
+CONTACT_RESPONSE_COLUMNS = (
+    Contact.id,
+    Contact.name,
+    Contact.surname,
+    Contact.email,
+    Contact.mobile,
+    Contact.date_of_birth,
+)
+
+async def adjust_contacts_count(user_id: int, delta: int, db: Session) -> None:
+    """
+    Changes the stored number of contacts of a user. The update runs in the current transaction and is committed
+    together with the insert or delete it accounts for; every path adding or removing contacts must call it.
+
+    :param user_id: The ID of the user.
+    :type user_id: int
+
+    :param delta: The number of contacts added, negative for removed contacts.
+    :type delta: int
+
+    :param db: The database session.
+    :type db: Session
+
+    """
+
+    db.execute(update(User).where(User.id == user_id).values(contacts_count=User.contacts_count + delta))
+
+
+async def get_contacts_count(user: User, db: Session) -> int:
+    """
+    Retrieves the number of contacts of a user from the counter on the user row, without scanning the contacts.
+
+    :param user: The user to count the contacts of.
+    :type user: User
+
+    :param db: The database session.
+    :type db: Session
+
+    :return: The number of contacts.
+    :rtype: int
+
+    """
+
+    select_shard(db, user.email)
+
+    return db.execute(select(User.contacts_count).where(User.id == user.id)).scalar() or 0
 
 
 async def create_contact(body: ContactModel, user: User, db: Session) -> Contact:
@@ -30,15 +84,19 @@ async def create_contact(body: ContactModel, user: User, db: Session) -> Contact
 
     """
 
+    select_shard(db, user.email)
+
     contact = Contact(
         name=body.name,
         surname=body.surname,
         email=body.email,
         mobile=body.mobile,
+        phone=to_e164(body.mobile),
         date_of_birth=body.date_of_birth,
         user_id=user.id
     )
     db.add(contact)
+    await adjust_contacts_count(user.id, 1, db)
 
     try:
         db.commit()
@@ -46,6 +104,7 @@ async def create_contact(body: ContactModel, user: User, db: Session) -> Contact
         db.rollback()
         raise ValueError("Failed to create user", str(e))
     db.refresh(contact)
+    await change_feed.publish(user.email, [("changed", contact.id)])
 
     return contact
 
@@ -71,10 +130,39 @@ async def get_contacts(skip: int, limit: int, user: User, db: Session) -> List[C
 
     """
 
+    select_shard(db, user.email)
+
     contact = db.query(Contact).filter(Contact.user_id == user.id).offset(skip).limit(limit).all()
     return contact
 
 
+async def get_contacts_rows(skip: int, limit: int, user: User, db: Session) -> Sequence[Row]:
+    """
+    Retrieves a page of contacts as plain Core rows, selecting only the columns of the contact response.
+
+    :param skip: The number of contacts to skip.
+    :type skip: int
+
+    :param limit: The maximum number of contacts to return.
+    :type limit: int
+
+    :param user: The user to retrieve contacts for.
+    :type user: User
+
+    :param db: The database session.
+    :type db: Session
+
+    :return: A list of rows ordered as CONTACT_RESPONSE_COLUMNS.
+    :rtype: Sequence[Row]
+
+    """
+
+    select_shard(db, user.email)
+
+    stmt = select(*CONTACT_RESPONSE_COLUMNS).where(Contact.user_id == user.id).offset(skip).limit(limit)
+    return db.execute(stmt).all()
+
+
 async def get_contact(contact_id: int, user: User, db: Session) -> Contact:
     """
     Retrieves a contact with the specified ID for a specific user.
@@ -102,9 +190,37 @@ async def get_contact(contact_id: int, user: User, db: Session) -> Contact:
 ]
 
     """
+
+    select_shard(db, user.email)
+
     return db.query(Contact).filter(and_(Contact.id == contact_id, Contact.user_id == user.id)).first()
 
 
+async def get_contact_row(contact_id: int, user: User, db: Session) -> Row | None:
+    """
+    Retrieves a contact with the specified ID for a specific user as a plain Core row with the response columns only.
+    Nothing is added to the session identity map and the row has no lazy-loadable relationships.
+
+    :param contact_id: The ID of the contact to retrieve
+    :type contact_id: int
+
+    :param user: The user to retrieve the contact for.
+    :type user: User
+
+    :param db: The database session.
+    :type db: Session
+
+    :return: The row of the contact, or None if it does not exist.
+    :rtype: Row | None
+
+    """
+
+    select_shard(db, user.email)
+
+    stmt = select(*CONTACT_RESPONSE_COLUMNS).where(and_(Contact.id == contact_id, Contact.user_id == user.id))
+    return db.execute(stmt).first()
+
+
 async def update_contact(body: ContactModel, contact_id: int, user: User, db: Session) -> Contact | None:
     """
     Updates a single contact with the specified ID for a specific user.
@@ -126,6 +242,8 @@ async def update_contact(body: ContactModel, contact_id: int, user: User, db: Se
 
     """
 
+    select_shard(db, user.email)
+
     contact = db.query(Contact).filter(and_(Contact.id == contact_id, Contact.user_id == user.id)).first()
 
     if contact:
@@ -133,8 +251,10 @@ async def update_contact(body: ContactModel, contact_id: int, user: User, db: Se
         contact.surname = body.surname
         contact.email = body.email
         contact.mobile = body.mobile
+        contact.phone = to_e164(body.mobile)
         contact.date_of_birth = body.date_of_birth
         db.commit()
+        await change_feed.publish(user.email, [("changed", contact.id)])
     return contact
 
 
@@ -163,6 +283,8 @@ async def get_contacts_choice(name: str | None, surname: str | None,
 
     """
 
+    select_shard(db, user.email)
+
     contacts = db.query(Contact).filter(and_(or_(
         Contact.name.like(f"%{name}%"), Contact.surname.like(f"%{surname}%"), Contact.email.like(f"%{email}%")),
         Contact.user_id == user.id)
@@ -171,6 +293,64 @@ async def get_contacts_choice(name: str | None, surname: str | None,
     return contacts
 
 
+async def get_contacts_choice_rows(name: str | None, surname: str | None,
+                                   email: str | None, user: User, db: Session) -> Sequence[Row]:
+    """
+    Searches for contacts by name, surname, or email and returns plain Core rows with the response columns only.
+
+    :param name: The name of the contact to search for.
+    :type name: str | None
+
+    :param surname: The surname of the contact to search for.
+    :type surname: str | None
+
+    :param email: The email of the contact to search for.
+    :type email: str | None
+
+    :param user: The user to get the contact.
+    :type user: User
+
+    :param db: The database session.
+    :type db: Session
+
+    :return: A list of rows ordered as CONTACT_RESPONSE_COLUMNS.
+    :rtype: Sequence[Row]
+
+    """
+
+    select_shard(db, user.email)
+
+    stmt = select(*CONTACT_RESPONSE_COLUMNS).where(and_(or_(
+        Contact.name.like(f"%{name}%"), Contact.surname.like(f"%{surname}%"), Contact.email.like(f"%{email}%")),
+        Contact.user_id == user.id)
+    )
+    return db.execute(stmt).all()
+
+
+async def get_contacts_by_phone_rows(phone: str, user: User, db: Session) -> Sequence[Row]:
+    """
+    Retrieves the contacts of a user with a phone number as plain Core rows with the response columns only. The
+    lookup is a single probe of the (user_id, phone) index.
+
+    :param phone: The phone number in E.164 form.
+    :type phone: str
+
+    :param user: The user to get the contacts for.
+    :type user: User
+
+    :param db: The database session.
+    :type db: Session
+
+    :return: A list of rows ordered as CONTACT_RESPONSE_COLUMNS.
+    :rtype: Sequence[Row]
+
+    """
+
+    select_shard(db, user.email)
+
+    return db.execute(select(*CONTACT_RESPONSE_COLUMNS).where(Contact.user_id == user.id, Contact.phone == phone)).all()
+
+
 async def get_contacts_birthdays(user: User, db: Session) -> List[Contact]:
     """
     Allows to search for a list of contacts, who have birthdays in 7 days from today.
@@ -186,6 +366,8 @@ async def get_contacts_birthdays(user: User, db: Session) -> List[Contact]:
 
     """
 
+    select_shard(db, user.email)
+
     start_date = datetime.now().date()
     end_date = start_date + timedelta(days=7)
 
@@ -221,11 +403,14 @@ async def update_contact_status(body: ContactStatusUpdate, contact_id: int, user
 
     """
 
+    select_shard(db, user.email)
+
     contact = db.query(Contact).filter(and_(Contact.id == contact_id, Contact.user_id == user.id)).first()
 
     if contact:
         contact.done = body.done
         db.commit()
+        await change_feed.publish(user.email, [("changed", contact.id)])
     return contact
 
 
@@ -247,14 +432,196 @@ async def remove_contact(contact_id: int, user: User, db: Session) -> Contact |
 
     """
 
+    select_shard(db, user.email)
+
     contact = db.query(Contact).filter(and_(Contact.id == contact_id, Contact.user_id == user.id)).first()
 
     if contact:
         db.delete(contact)
+        db.add(ContactTombstone(contact_id=contact.id, user_id=user.id))
+        await adjust_contacts_count(user.id, -1, db)
         db.commit()
+        await change_feed.publish(user.email, [("deleted", contact_id)])
     return contact
 
 
+async def get_dedupe_rows(user: User, db: Session) -> Sequence[Row]:
+    """
+    Retrieves every contact of a user as plain Core rows for duplicate detection, with the E.164 phone.
+
+    :param user: The user to retrieve the contacts for.
+    :type user: User
+
+    :param db: The database session.
+    :type db: Session
+
+    :return: A list of rows ordered as CONTACT_RESPONSE_COLUMNS followed by the phone.
+    :rtype: Sequence[Row]
+
+    """
+
+    select_shard(db, user.email)
+
+    return db.execute(select(*CONTACT_RESPONSE_COLUMNS, Contact.phone).where(Contact.user_id == user.id)).all()
+
+
+async def merge_contacts(keep_id: int, duplicate_ids: list[int], user: User, db: Session) -> Contact | None:
+    """
+    Merges duplicates into the contact to keep in one transaction. Empty fields of the kept contact are filled from
+    the duplicates in the given order, then the duplicates are deleted, leaving tombstones for delta sync, and the
+    contact counter is adjusted.
+
+    :param keep_id: The ID of the contact to keep.
+    :type keep_id: int
+
+    :param duplicate_ids: The IDs of the contacts to merge into it.
+    :type duplicate_ids: list[int]
+
+    :param user: The owner of the contacts.
+    :type user: User
+
+    :param db: The database session.
+    :type db: Session
+
+    :return: The merged contact, or None if any of the contacts does not exist.
+    :rtype: Contact | None
+
+    """
+
+    select_shard(db, user.email)
+
+    duplicate_ids = list(dict.fromkeys(contact_id for contact_id in duplicate_ids if contact_id != keep_id))
+    contacts = {
+        contact.id: contact for contact in
+        db.query(Contact).filter(and_(Contact.id.in_([keep_id, *duplicate_ids]), Contact.user_id == user.id))
+        .with_for_update().all()
+    }
+    if len(contacts) != len(duplicate_ids) + 1:
+        return None
+
+    keep = contacts[keep_id]
+    fields = ("email", "mobile", "date_of_birth")
+    merged = {name: getattr(keep, name) for name in fields}
+    for contact_id in duplicate_ids:
+        duplicate = contacts[contact_id]
+        for name in fields:
+            if merged[name] is None:
+                merged[name] = getattr(duplicate, name)
+        db.delete(duplicate)
+        db.add(ContactTombstone(contact_id=contact_id, user_id=user.id))
+    merged["phone"] = to_e164(merged["mobile"])
+
+    try:
+        db.flush()
+        for name, value in merged.items():
+            setattr(keep, name, value)
+        await adjust_contacts_count(user.id, -len(duplicate_ids), db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    db.refresh(keep)
+    await change_feed.publish(user.email, [("changed", keep_id), *(("deleted", contact_id) for contact_id in duplicate_ids)])
+    return keep
+
+
+def _after(timestamp, row_id, kind: int, after: SyncKey | None):
+    if after is None:
+        return true()
+    after_timestamp, after_kind, after_id = after
+    if after_kind < kind:
+        tie = timestamp == after_timestamp
+    elif after_kind == kind:
+        tie = and_(timestamp == after_timestamp, row_id > after_id)
+    else:
+        tie = false()
+    return or_(timestamp > after_timestamp, tie)
+
+
+async def get_contact_changes(after: SyncKey | None, limit: int, user: User,
+                              db: Session) -> tuple[list[Row], list[int], SyncKey | None, bool]:
+    """
+    Retrieves the contacts changed and deleted after a position of the change stream, oldest first. Both queries are
+    range scans of the (user_id, updated_at) and (user_id, deleted_at) indexes, so the cost follows the number of
+    changes rather than the size of the address book. Deletions are skipped on a full sync.
+
+    :param after: The position of the last change the client has seen, None for a full sync.
+    :type after: SyncKey | None
+
+    :param limit: The maximum number of changes and deletions returned.
+    :type limit: int
+
+    :param user: The user to retrieve the changes for.
+    :type user: User
+
+    :param db: The database session.
+    :type db: Session
+
+    :return: The changed rows ordered as CONTACT_RESPONSE_COLUMNS, the deleted contact IDs, the position of the last
+        change returned and whether more changes are waiting.
+    :rtype: tuple[list[Row], list[int], SyncKey | None, bool]
+
+    """
+
+    select_shard(db, user.email)
+
+    changed = db.execute(
+        select(*CONTACT_RESPONSE_COLUMNS, Contact.updated_at)
+        .where(Contact.user_id == user.id, _after(Contact.updated_at, Contact.id, CHANGED, after))
+        .order_by(Contact.updated_at, Contact.id)
+        .limit(limit + 1)
+    ).all()
+    entries = [((row.updated_at, CHANGED, row.id), row) for row in changed]
+
+    if after is not None:
+        deleted = db.execute(
+            select(ContactTombstone.id, ContactTombstone.contact_id, ContactTombstone.deleted_at)
+            .where(ContactTombstone.user_id == user.id,
+                   _after(ContactTombstone.deleted_at, ContactTombstone.id, DELETED, after))
+            .order_by(ContactTombstone.deleted_at, ContactTombstone.id)
+            .limit(limit + 1)
+        ).all()
+        entries += [((row.deleted_at, DELETED, row.id), row.contact_id) for row in deleted]
+
+    entries.sort(key=lambda entry: entry[0])
+    page = entries[:limit]
+    last = page[-1][0] if page else after
+    return ([value for key, value in page if key[1] == CHANGED],
+            [value for key, value in page if key[1] == DELETED],
+            last,
+            len(entries) > limit)
+
+
+async def purge_tombstones(before: datetime, db: Session, batch_size: int = 10_000) -> int:
+    """
+    Deletes the tombstones of contacts deleted before a point in time, in batches of ids committed one by one, so
+    the table does not grow without bound. Sync tokens older than that point are rejected by the sync endpoint.
+
+    :param before: Tombstones older than this are deleted.
+    :type before: datetime
+
+    :param db: The database session, bound to the shard to clean.
+    :type db: Session
+
+    :param batch_size: The number of tombstones deleted per transaction.
+    :type batch_size: int
+
+    :return: The number of tombstones deleted.
+    :rtype: int
+
+    """
+
+    purged = 0
+    while True:
+        ids = db.execute(select(ContactTombstone.id).where(ContactTombstone.deleted_at < before)
+                         .order_by(ContactTombstone.id).limit(batch_size)).scalars().all()
+        if not ids:
+            return purged
+        db.execute(delete(ContactTombstone).where(ContactTombstone.id.in_(ids)))
+        db.commit()
+        purged += len(ids)
+
+
 async def update_avatar(email, url: str, db: Session) -> User:
     """
     Updates the avatar of a user with the specified email address.
@@ -277,3 +644,6 @@ async def update_avatar(email, url: str, db: Session) -> User:
     updated_user.avatar = url
     db.commit()
     return updated_user
+
+
+trace_module(sys.modules[__name__])
@@ -1,8 +1,13 @@
+import sys
+
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 
 from ..database.model import User
+from ..database.sharding import select_shard
 from ..schemas import UserModel
+from ..services.tracing import trace_module
 
 
 async def get_user_by_email(email: str, db: Session) -> User:
@@ -20,6 +25,7 @@ async def get_user_by_email(email: str, db: Session) -> User:
     :return: The first user with the specified email address
 
     """
+    select_shard(db, email)
     return db.query(User).filter(User.email == email).first()
 
 
@@ -38,6 +44,7 @@ async def create_user(body: UserModel, db: Session) -> User:
 
     """
 
+    select_shard(db, body.email)
     new_user = User(**body.dict())
     db.add(new_user)
     try:
@@ -49,6 +56,40 @@ async def create_user(body: UserModel, db: Session) -> User:
     return new_user
 
 
+async def insert_user(body: UserModel, db: Session) -> User | None:
+    """
+    Creates a new user unless the email is taken, in a single INSERT ... ON CONFLICT DO NOTHING RETURNING statement
+    backed by the unique constraint on the email. Concurrent signups with one email are settled by the database: one
+    insert returns the row, the others return nothing.
+
+    :param body: The data for the user to create, with the password already hashed.
+    :type body: UserModel
+
+    :param db: The database session.
+    :type db: Session
+
+    :return: The newly created user, or None if a user with the email exists.
+    :rtype: User | None
+
+    """
+
+    select_shard(db, body.email)
+    dialect = sqlite if db.get_bind().dialect.name == "sqlite" else postgresql
+    stmt = (dialect.insert(User).values(**body.dict())
+            .on_conflict_do_nothing(index_elements=[User.email])
+            .returning(User))
+    try:
+        new_user = db.scalars(stmt).first()
+        if new_user is not None:
+            # kept loaded: the commit would expire it and the response would read it back
+            db.expunge(new_user)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise ValueError("Failed to create user", str(e))
+    return new_user
+
+
 async def update_token(user: User, token: str | None, db: Session) -> User:
     """
     Updates the token used for user login.
@@ -67,6 +108,7 @@ async def update_token(user: User, token: str | None, db: Session) -> User:
 
     """
 
+    select_shard(db, user.email)
     user.refresh_token = token
     db.commit()
     db.refresh(user)
@@ -120,3 +162,6 @@ async def update_avatar(email: str, url: str, db: Session) -> User:
     db.commit()
     db.refresh(user)
     return user
+
+
+trace_module(sys.modules[__name__])
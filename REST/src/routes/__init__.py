@@ -16,6 +16,7 @@ from .contacts import (
     remove_contact
 )
 from .users import read_users_me, update_avatar_user
+from .health import liveness, readiness, diagnostics
 
 __all__ =(
     "signup",
@@ -30,5 +31,8 @@ __all__ =(
     "get_contacts_choice",
     "get_contacts_birthdays",
     "update_contact_status",
-    "remove_contact"
+    "remove_contact",
+    "liveness",
+    "readiness",
+    "diagnostics"
 )
\ No newline at end of file
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from src.conf.config import settings
+from src.conf.messages import PROFILER_BUSY
+from src.database.model import User
+from src.services.auth import get_current_admin
+from src.services.stack_sampler import stack_sampler
+
+router = APIRouter(prefix='/admin', tags=["admin"])
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile_worker(seconds: float = Query(default=5.0, gt=0, le=settings.profiler_max_seconds),
+                         idle: bool = False,
+                         _: User = Depends(get_current_admin)) -> PlainTextResponse:
+    """
+    The profile_worker function samples the stacks of the worker serving the request for a number of seconds and
+    returns them in the collapsed stack format, ready for a flame graph. Each worker is profiled on its own, so with
+    several workers the request profiles whichever one the load balancer picks.
+
+    :param seconds: How long to sample.
+    :type seconds: float
+
+    :param idle: Whether the stacks of threads waiting for work are kept.
+    :type idle: bool
+
+    :param _: Get the current admin.
+    :type _: User=Depends(get_current_admin)
+
+    :return: The collapsed stacks, with the number of samples and the share of them the event loop was busy in the
+        headers.
+    :rtype: PlainTextResponse
+
+    """
+
+    profile = await stack_sampler.profile(seconds, idle)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=PROFILER_BUSY)
+    return PlainTextResponse(profile.collapsed(), headers={
+        "X-Profile-Samples": str(profile.samples),
+        "X-Profile-Seconds": f"{profile.duration:.3f}",
+        "X-Event-Loop-Busy": f"{profile.loop_busy_ratio:.3f}",
+    })
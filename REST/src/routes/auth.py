@@ -4,16 +4,21 @@ from fastapi import APIRouter, HTTPException, Depends, status, Security, Backgro
 
 from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from src.database.connect import get_db
+from src.database.replicas import get_read_db
+from src.database.model import User
 from src.schemas import UserModel, UserResponse, TokenModel, RequestEmail
 
 from src.repository import users as repository_users
 from src.services.auth import auth_service
 from src.services.email import send_email
+from src.services.refresh_tokens import refresh_token_store
+from src.services.revocation import revocation_list
 from src.conf.messages import (
     INVALID_PASSWORD, INVALID_EMAIL, EMAIL_NOT_CONFIRMED, USER_EXISTS, EMAIL_CONFIRMED,
-    INVALID_REFRESH_TOKEN, NOT_FOUND, USER_CONFIRMATION, ALREADY_CONFIRMED_EMAIL
+    INVALID_REFRESH_TOKEN, NOT_FOUND, USER_CONFIRMATION, ALREADY_CONFIRMED_EMAIL, LOGGED_OUT, LOGGED_OUT_ALL
 )
 
 
@@ -32,7 +37,9 @@ async def signup(
     Provides signup functionality for a new user to the application.
 
     This function checks the validity of a user's email and password and returns a new user and sends an email notification
-    that it was successfully created.
+    that it was successfully created. The user is created in one statement that does nothing when the email is taken,
+    so concurrent signups with the same email cannot both succeed, and only the one creating the user sends an email.
+    The password is hashed in the threadpool, off the event loop.
 
     :param body: The request body containing the user's email, password, and username.
     :type body: UserModel
@@ -53,12 +60,10 @@ async def signup(
 
     """
 
-    exist_user = await repository_users.get_user_by_email(body.email, db)
-    print(f"{exist_user=}")
-    if exist_user:
+    body.password = await run_in_threadpool(auth_service.get_password_hash, body.password)
+    new_user = await repository_users.insert_user(body, db)
+    if new_user is None:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=USER_EXISTS)
-    body.password = auth_service.get_password_hash(body.password)
-    new_user = await repository_users.create_user(body, db)
     background_tasks.add_task(send_email, new_user.email, new_user.username, request.base_url)
     return {"user": new_user, "detail": USER_CONFIRMATION}
 
@@ -69,9 +74,9 @@ async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depen
     Provides login functionality to the application.
 
     This function checks the validity of a user's email and password and returns access and refresh tokens if the login
-    is successful.
+    is successful. The refresh token starts a new session for the device named by the optional client_id form field.
 
-    :param body: The request body containing the user's email and password.
+    :param body: The request body containing the user's email, password and optionally the client_id of the device.
     :type body: OAuth2PasswordRequestForm
 
     :param db: The database session.
@@ -95,30 +100,25 @@ async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depen
     if not auth_service.verify_password(body.password, user.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_PASSWORD)
 
+    claims = refresh_token_store.issue(user.email, body.client_id)
     access_token = await auth_service.create_access_token(data={"sub": user.email})
-    refresh_token = await auth_service.create_refresh_token(data={"sub": user.email})
-    await repository_users.update_token(user, refresh_token, db)
+    refresh_token = await auth_service.create_refresh_token(data={"sub": user.email, **claims})
 
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 
 @router.get('/refresh_token', response_model=TokenModel)
-async def refresh_token(
-        credentials: HTTPAuthorizationCredentials = Security(security),
-        db: Session = Depends(get_db)
-) -> Dict[str, Any]:
+async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security)) -> Dict[str, Any]:
     """
     Provides the functionality of receiving a refreshed token.
 
-        This function first decodes the token and then retrieves the user from the database.Then it creates new access and
-        refresh token. If the refresh token is invalid, it raises HTTPException that it is invalid.
+        This function first decodes the token and then rotates it in the refresh token store, without touching the
+        database. Then it creates new access and refresh token. If the refresh token is unknown or was already used,
+        its whole token family is revoked and it raises HTTPException that it is invalid.
 
     :param credentials: Checks credentials of user
     :type credentials: HTTPAuthorizationCredentials = Security(security).
 
-    :param db: The database session.
-    :type db: Session = Depends(get_db).
-
     :return: Returns a dictionary containing the access token, refresh token, and token type.
     :rtype: dict
 
@@ -126,21 +126,72 @@ async def refresh_token(
 
     """
 
-    token = credentials.credentials
-    email = await auth_service.decode_refresh_token(token)
-    user = await repository_users.get_user_by_email(email, db)
+    claims = await auth_service.decode_refresh_token_claims(credentials.credentials)
+    email = claims['sub']
+    next_claims = refresh_token_store.rotate(email, claims)
 
-    if user.refresh_token != token:
-        await repository_users.update_token(user, None, db)
+    if next_claims is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_REFRESH_TOKEN)
 
     access_token = await auth_service.create_access_token(data={"sub": email})
-    refresh_token = await auth_service.create_refresh_token(data={"sub": email})
-    await repository_users.update_token(user, refresh_token, db)
+    refresh_token = await auth_service.create_refresh_token(data={"sub": email, **next_claims})
 
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 
+@router.post('/logout')
+async def logout(token: str = Depends(auth_service.oauth2_scheme)) -> Dict[str, str]:
+    """
+    Provides the logout functionality for the current device.
+
+        This function revokes the presented access token until it expires, by its jti, or for tokens issued without
+        one, together with the other tokens of the user issued up to the same second. Every worker picks the
+        revocation up from Redis on its next sync; the worker that served this request rejects the token at once.
+
+    :param token: The access token of the current user.
+    :type token: str
+
+    :return: Returns a dictionary containing the message that the user was logged out.
+    :rtype: Dict[str, str]
+
+    :raises HTTPException 401: If the access token is invalid or already revoked.
+
+    """
+
+    claims = await auth_service.decode_access_token(token)
+    revocation_list.revoke_claims(claims)
+    return {"message": LOGGED_OUT}
+
+
+@router.post('/logout_all')
+async def logout_all(token: str = Depends(auth_service.oauth2_scheme),
+                     current_user: User = Depends(auth_service.get_current_user)) -> Dict[str, str]:
+    """
+    Provides the logout functionality for every device of the current user.
+
+        This function revokes every access token of the user issued before the current second, the presented token
+        itself and every refresh token session.
+
+    :param token: The access token of the current user.
+    :type token: str
+
+    :param current_user: The current user.
+    :type current_user: User
+
+    :return: Returns a dictionary containing the message that the user was logged out from all devices.
+    :rtype: Dict[str, str]
+
+    :raises HTTPException 401: If the access token is invalid or already revoked.
+
+    """
+
+    claims = await auth_service.decode_access_token(token)
+    revocation_list.revoke_user(current_user.email)
+    revocation_list.revoke_claims(claims)
+    refresh_token_store.revoke_all(current_user.email)
+    return {"message": LOGGED_OUT_ALL}
+
+
 @router.get('/confirmed_email/{token}')
 async def confirmed_email(token: str, db: Session = Depends(get_db)) -> dict[str, str] | dict[str, str]:
     """
@@ -178,7 +229,7 @@ async def confirmed_email(token: str, db: Session = Depends(get_db)) -> dict[str
 
 @router.post('/request_email')
 async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, request: Request,
-                        db: Session = Depends(get_db)) -> Dict[str, Any]:
+                        db: Session = Depends(get_read_db)) -> Dict[str, Any]:
     """
     Provides the functionality of additional validation of the email address.
         This function retrieves a user from the database with its email address.
@@ -196,7 +247,7 @@ async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, r
     :type request: Request
 
     :param db: The database session.
-    :type db: Session=Depends(get_db).
+    :type db: Session=Depends(get_read_db).
 
     :return: Returns a dictionary containing the message, that the email was sent or to check email for confirmation.
     :rtype: dict
@@ -1,21 +1,29 @@
-from typing import List
+from typing import List, Sequence
 
-import cloudinary
-import cloudinary.uploader
 from fastapi import APIRouter, Depends, HTTPException, status, Path, Form, Query, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy import Row
 from sqlalchemy.orm import Session
 from pydantic import EmailStr
 from fastapi_limiter.depends import RateLimiter
+from starlette.concurrency import run_in_threadpool
 
 from src.schemas import (ContactModel, ContactUpdate, ContactResponse, ContactStatusUpdate, ContactResponseStatus,
-                         UserDb)
+                         ContactStats, ContactChanges, ContactMerge, DuplicateCandidateResponse, UserDb)
 from src.repository import contacts as repository_contacts
 from src.database.connect import get_db
+from src.database.replicas import get_read_db
 from src.database.model import User, Contact
 from src.conf.config import settings
 from src.services.auth import auth_service
-from src.conf.messages import CREATE_CONTACT_FAILED, NOT_FOUND_CONTACT
+from src.services.change_feed import change_feed
+from src.services.dedupe import DuplicateCandidate, find_duplicates
+from src.services.phones import to_e164
+from src.services.serialization import contacts_json_response
+from src.services.sync import decode_sync_token, encode_sync_token, next_sync_key, tombstone_cutoff
+from src.conf.messages import (CREATE_CONTACT_FAILED, INVALID_PHONE, INVALID_SYNC_TOKEN, NOT_FOUND_CONTACT,
+                               NOTHING_TO_MERGE)
 
 
 router = APIRouter(prefix='/contacts', tags=["contacts"])
@@ -52,11 +60,15 @@ async def create_contact(body: ContactModel, db: Session = Depends(get_db),
 
 @router.get('/', response_model=List[ContactResponse], description='No more than 10 requests per minute',
             dependencies=[Depends(RateLimiter(times=10, seconds=60))])
-async def get_contacts(skip: int = 0, limit: int = 10, db: Session = Depends(get_db),
-                       current_user: User = Depends(auth_service.get_current_user)) -> list[Contact]:
+async def get_contacts(response: Response, skip: int = 0, limit: int = 10, db: Session = Depends(get_read_db),
+                       current_user: User = Depends(auth_service.get_current_user)) -> Sequence[Row]:
     """
     The get_contacts function returns a list of contacts.
-        The skip and limit parameters are used to paginate the results.
+        The skip and limit parameters are used to paginate the results, the total number of contacts of the user is
+        returned in the X-Total-Count header.
+
+    :param response: The response, its X-Total-Count header is set.
+    :type response: Response
 
     :param skip: Skip the first n contacts.
     :type skip: int
@@ -65,44 +77,199 @@ async def get_contacts(skip: int = 0, limit: int = 10, db: Session = Depends(get
     :type limit: int
 
     :param db: Inject the database session into the function.
-    :type db: Session=Depends(get_db)
+    :type db: Session=Depends(get_read_db)
 
     :param current_user: Get the current user.
     :type current_user: User=Depends(auth_service.get_current_user).
 
-    :return: A list of contacts
-    :rtype: list
+    :return: A list of contact rows
+    :rtype: Sequence[Row]
 
     """
 
-    contacts = await repository_contacts.get_contacts(skip, limit, current_user, db)
-    return contacts
+    rows = await repository_contacts.get_contacts_rows(skip, limit, current_user, db)
+    total = str(await repository_contacts.get_contacts_count(current_user, db))
+    if settings.fast_json_responses:
+        json_response = contacts_json_response(rows)
+        json_response.headers["X-Total-Count"] = total
+        return json_response
+
+    response.headers["X-Total-Count"] = total
+    return rows
+
+
+@router.get("/stats", response_model=ContactStats)
+async def get_contacts_stats(db: Session = Depends(get_read_db),
+                             current_user: User = Depends(auth_service.get_current_user)) -> dict[str, int]:
+    """
+    The get_contacts_stats function returns the number of contacts of the current user. The number is read from the
+    counter kept on the user row, so the contacts table is never scanned.
+
+    :param db: Get the database session.
+    :type db: Session=Depends(get_read_db)
+
+    :param current_user: Get the current user.
+    :type current_user: User=Depends(auth_service.get_current_user).
+
+    :return: The total number of contacts.
+    :rtype: dict[str, int]
+
+    """
+
+    return {"total": await repository_contacts.get_contacts_count(current_user, db)}
+
+
+@router.get("/changes", response_model=ContactChanges)
+async def get_contact_changes(since: str | None = None, limit: int = Query(100, ge=1, le=1000),
+                              db: Session = Depends(get_read_db),
+                              current_user: User = Depends(auth_service.get_current_user)) -> dict:
+    """
+    The get_contact_changes function returns the contacts created, updated or deleted since the last sync, so a
+    client keeps its copy of the address book without downloading it again. Without a token every contact is
+    returned. The client stores next_token, and calls again right away while has_more is true. A token older than
+    the tombstone retention is rejected, and the client starts over with a full sync.
+
+    :param since: The next_token of the previous sync, None for a full sync.
+    :type since: str | None
+
+    :param limit: The maximum number of changes and deletions returned.
+    :type limit: int
+
+    :param db: Get the database session.
+    :type db: Session=Depends(get_read_db)
+
+    :param current_user: Get the current user.
+    :type current_user: User=Depends(auth_service.get_current_user).
+
+    :return: The changed contacts, the IDs of the deleted ones and the token of the next sync.
+    :rtype: dict
+
+    """
+
+    try:
+        after = decode_sync_token(since) if since else None
+        if after is not None and after[0] < tombstone_cutoff():
+            raise ValueError("Expired sync token")
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=INVALID_SYNC_TOKEN)
+
+    changes, deleted, last, has_more = await repository_contacts.get_contact_changes(after, limit, current_user, db)
+    return {
+        "changes": changes,
+        "deleted": deleted,
+        "next_token": encode_sync_token(next_sync_key(last, has_more)),
+        "has_more": has_more,
+    }
+
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_contact_changes(db: Session = Depends(get_read_db),
+                                 current_user: User = Depends(auth_service.get_current_user)) -> StreamingResponse:
+    """
+    The stream_contact_changes function pushes the changes of the current user's contacts as server-sent events:
+    ``changed`` and ``deleted`` with the contact id, and ``resync`` before the stream is closed because events were
+    dropped. A client opens the stream, then syncs through /changes, and syncs again on every event.
+
+    :param db: Get the database session, released before streaming starts.
+    :type db: Session=Depends(get_read_db)
+
+    :param current_user: Get the current user.
+    :type current_user: User=Depends(auth_service.get_current_user).
+
+    :return: The event stream.
+    :rtype: StreamingResponse
+
+    """
+
+    db.close()
+    return StreamingResponse(change_feed.events(current_user.email), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.get("/duplicates", response_model=List[DuplicateCandidateResponse])
+async def get_duplicate_contacts(min_score: float = Query(0.3, ge=0, le=1), limit: int = Query(100, ge=1, le=1000),
+                                 db: Session = Depends(get_read_db),
+                                 current_user: User = Depends(auth_service.get_current_user)) -> List[DuplicateCandidate]:
+    """
+    The get_duplicate_contacts function returns pairs of contacts that are likely the same person, best first.
+    Contacts are only compared inside blocks sharing the email, the phone or the phonetic name, and the scoring runs
+    in the threadpool so large address books do not block the event loop.
+
+    :param min_score: The lowest score returned, from 0 to 1.
+    :type min_score: float
+
+    :param limit: The maximum number of candidates returned.
+    :type limit: int
+
+    :param db: Get the database session.
+    :type db: Session=Depends(get_read_db)
+
+    :param current_user: Get the current user.
+    :type current_user: User=Depends(auth_service.get_current_user).
+
+    :return: The merge candidates with their scores and the fields that matched.
+    :rtype: List[DuplicateCandidate]
+
+    """
+
+    rows = await repository_contacts.get_dedupe_rows(current_user, db)
+    return await run_in_threadpool(find_duplicates, rows, min_score, limit)
+
+
+@router.post("/merge", response_model=ContactResponse)
+async def merge_contacts(body: ContactMerge, db: Session = Depends(get_db),
+                         current_user: User = Depends(auth_service.get_current_user)) -> Contact:
+    """
+    The merge_contacts function merges duplicate contacts into the contact to keep in one transaction.
+
+    :param body: The ID of the contact to keep and the IDs of its duplicates.
+    :type body: ContactMerge
+
+    :param db: Get the database session.
+    :type db: Session = Depends(get_db).
+
+    :param current_user: Get the current user.
+    :type current_user: User=Depends(auth_service.get_current_user).
+
+    :return: The merged contact.
+    :rtype: Contact
+
+    """
+
+    if not set(body.duplicate_ids) - {body.keep_id}:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=NOTHING_TO_MERGE)
+
+    contact = await repository_contacts.merge_contacts(body.keep_id, body.duplicate_ids, current_user, db)
+
+    if contact is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=NOT_FOUND_CONTACT)
+    return contact
 
 
 @router.get("/{contact_id}", response_model=ContactResponse)
-async def get_contact(contact_id: int, db: Session = Depends(get_db),
-                      current_user: User = Depends(auth_service.get_current_user)) -> Contact:
+async def get_contact(contact_id: int, db: Session = Depends(get_read_db),
+                      current_user: User = Depends(auth_service.get_current_user)) -> Row:
     """
     The get_contact function returns a contact by its id.
         The function takes the following parameters:
             - contact_id: int, the id of the contact to be returned.
-            - db: Session = Depends(get_db), an instance of a database session object that is used for querying and updating data in our database. This parameter is automatically injected into this function by FastAPI when it calls this function because we have added it as a dependency using @Depends(). We also use @Depends() to inject an instance of our current user into this function so that we can check if they are authorized to access this
+            - db: Session = Depends(get_read_db), an instance of a database session object that is used for querying and updating data in our database. This parameter is automatically injected into this function by FastAPI when it calls this function because we have added it as a dependency using @Depends(). We also use @Depends() to inject an instance of our current user into this function so that we can check if they are authorized to access this
 
     :param contact_id: Specify the id of the contact to be fetched.
     :type contact_id: int
 
     :param db: Get the database session.
-    :type db: Session=Depends(get_db)
+    :type db: Session=Depends(get_read_db)
 
     :param current_user: Get the current user.
     :type current_user: User=Depends(auth_service.get_current_user).
 
-    :return: A contact object
-    :rtype: Contact
+    :return: A contact row
+    :rtype: Row
 
     """
 
-    contact = await repository_contacts.get_contact(contact_id, current_user, db)
+    contact = await repository_contacts.get_contact_row(contact_id, current_user, db)
 
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=NOT_FOUND_CONTACT)
@@ -147,8 +314,8 @@ async def update_contact(body: ContactUpdate, contact_id: int, db: Session = Dep
 async def get_contacts_choice(name: str | None = None,
                               surname: str | None = None,
                               email: EmailStr | None = None,
-                              db: Session = Depends(get_db),
-                              current_user: User = Depends(auth_service.get_current_user)) -> Contact | list[Contact]:
+                              db: Session = Depends(get_read_db),
+                              current_user: User = Depends(auth_service.get_current_user)) -> Sequence[Row]:
     """
     The get_contacts_choice function is used to get a contact or the list of contacts either by name or by surname or by email.
 
@@ -167,27 +334,62 @@ async def get_contacts_choice(name: str | None = None,
     :type email: EmailStr | None
 
     :param db: Get a database session, which is required for accessing the contacts.
-    :type db: Session=Depends(get_db)
+    :type db: Session=Depends(get_read_db)
 
     :param current_user: Get the user that is currently logged in.
     :type current_user: User=Depends(auth_service.get_current_user)
 
-    :return: A list of contacts or a contact that meet the criteria.
-    :rtype: Contact | list[Contact]
+    :return: A list of contact rows that meet the criteria.
+    :rtype: Sequence[Row]
 
     """
 
-    contacts = await repository_contacts.get_contacts_choice(name, surname, email, current_user, db)
+    contacts = await repository_contacts.get_contacts_choice_rows(name, surname, email, current_user, db)
 
     if not contacts:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Not found')
-    print(f"name: {name}, surname: {surname}, email: {email}")
 
+    if settings.fast_json_responses:
+        return contacts_json_response(contacts)
+    return contacts
+
+
+@router.get("/by_phone/{number}", response_model=List[ContactResponse])
+async def get_contacts_by_phone(number: str, db: Session = Depends(get_read_db),
+                                current_user: User = Depends(auth_service.get_current_user)) -> Sequence[Row]:
+    """
+    The get_contacts_by_phone function returns the contacts with a phone number, for caller identification. The
+    number may be written in any usual form, it is normalized to E.164 before the lookup.
+
+    :param number: The phone number to look up.
+    :type number: str
+
+    :param db: Get the database session.
+    :type db: Session=Depends(get_read_db)
+
+    :param current_user: Get the current user.
+    :type current_user: User=Depends(auth_service.get_current_user)
+
+    :return: A list of contact rows with the number.
+    :rtype: Sequence[Row]
+
+    """
+
+    phone = to_e164(number)
+    if phone is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=INVALID_PHONE)
+
+    contacts = await repository_contacts.get_contacts_by_phone_rows(phone, current_user, db)
+
+    if not contacts:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=NOT_FOUND_CONTACT)
+    if settings.fast_json_responses:
+        return contacts_json_response(contacts)
     return contacts
 
 
 @router.get('/birthdays/', response_model=List[ContactResponse])
-async def get_contacts_birthdays(db: Session = Depends(get_db),
+async def get_contacts_birthdays(db: Session = Depends(get_read_db),
                                  current_user: User = Depends(auth_service.get_current_user)) -> list[Contact]:
     """
     The get_contacts_birthdays function returns a list of contacts that have birthdays in the current month.
@@ -197,7 +399,7 @@ async def get_contacts_birthdays(db: Session = Depends(get_db),
     who made this request.
 
     :param db: Get the database session.
-    :type db: Session=Depends(get_db)
+    :type db: Session=Depends(get_read_db)
 
     :param current_user: Get the current user.
     :type current_user: User=Depends(auth_service.get_current_user)
@@ -0,0 +1,61 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends, Response, status
+
+from src.database.model import User
+from src.services.auth import get_current_admin
+from src.services.health import health_monitor
+
+
+router = APIRouter(prefix='/health', tags=["health"])
+
+
+@router.get("/live")
+async def liveness() -> Dict[str, str]:
+    """
+    The liveness function answers as long as the worker can serve requests. It touches no I/O, so it is safe for
+    aggressive probes.
+
+    :return: A dictionary with the status.
+    :rtype: Dict[str, str]
+
+    """
+
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def readiness(response: Response) -> Dict[str, Any]:
+    """
+    The readiness function returns the database and Redis state cached by the background health monitor.
+
+    :param response: The response, its status code is set to 503 when a dependency is down.
+    :type response: Response
+
+    :return: The readiness state with the result of each check.
+    :rtype: Dict[str, Any]
+
+    """
+
+    state = await health_monitor.readiness()
+    if not state["ready"]:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return state
+
+
+@router.get("/deep")
+async def diagnostics(_: User = Depends(get_current_admin)) -> Dict[str, Any]:
+    """
+    The diagnostics function measures the database, Redis and SMTP latency on demand and reports the connection pool
+    occupancy and the event-loop lag. It opens connections to every dependency and reports their errors, so it is
+    restricted to admins.
+
+    :param _: Get the current admin.
+    :type _: User=Depends(get_current_admin)
+
+    :return: The diagnostics report.
+    :rtype: Dict[str, Any]
+
+    """
+
+    return await health_monitor.diagnostics()
@@ -1,14 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends, status, File, UploadFile
 from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.orm import Session
-import cloudinary
-import cloudinary.uploader
 
 from src.database.connect import get_db
 from src.database.model import User
 from src.schemas import UserModel, UserResponse, UserDb
 from src.repository import users as repository_users
 from src.services.auth import auth_service
+from src.services.tracing import tracer
 from src.conf.config import settings
 
 router = APIRouter(prefix='/user', tags=["user"])
@@ -49,6 +48,9 @@ async def update_avatar_user(file: UploadFile = File(), current_user: User = Dep
     :rtype: User
 
     """
+    import cloudinary
+    import cloudinary.uploader
+
     cloudinary.config(
         cloud_name=settings.cloudinary_name,
         api_key=settings.cloudinary_api_key,
@@ -56,7 +58,8 @@ async def update_avatar_user(file: UploadFile = File(), current_user: User = Dep
         secure=True
     )
 
-    cloudinary.uploader.upload(file.file, public_id=f'ContactsApp/{current_user.username}', overwrite=True)
+    with tracer.span("cloudinary.upload"):
+        cloudinary.uploader.upload(file.file, public_id=f'ContactsApp/{current_user.username}', overwrite=True)
     src_url = cloudinary.CloudinaryImage(f'ContactsApp/{current_user.username}')\
                         .build_url(width=250, height=250, crop='fill')
     user = await repository_users.update_avatar(current_user.email, src_url, db)
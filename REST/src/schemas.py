@@ -33,6 +33,31 @@ class ContactResponseStatus(ContactResponse):
         orm_mode = True
 
 
+class ContactStats(BaseModel):
+    total: int
+
+
+class DuplicateCandidateResponse(BaseModel):
+    contact_ids: list[int]
+    score: float
+    reasons: list[str]
+
+    class Config:
+        orm_mode = True
+
+
+class ContactChanges(BaseModel):
+    changes: list[ContactResponse]
+    deleted: list[int]
+    next_token: str
+    has_more: bool
+
+
+class ContactMerge(BaseModel):
+    keep_id: int
+    duplicate_ids: list[int] = Field(min_items=1)
+
+
 class UserModel(BaseModel):
     username: str = Field(min_length=5, max_length=25)
     email: EmailStr
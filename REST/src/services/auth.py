@@ -6,30 +6,76 @@ This is Module, which has authentication (the class was created).
 """
 
 from datetime import datetime, timedelta
+from functools import cached_property
 from typing import Optional
+import asyncio
+import logging
+import math
 import pickle
-import redis as redis_db
+import random
+import time
+import uuid
 
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer, HTTPAuthorizationCredentials
-from passlib.context import CryptContext
+from redis import WatchError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from src.database.connect import get_db
+from src.database.connect import SessionLocal
+from src.database.model import User
+from src.database.replicas import get_read_db
+from src.database.sharding import select_shard
 from src.repository import users as repository_users
 from src.conf.config import settings
-from src.conf.messages import UNAUTHORIZED
+from src.conf.messages import ADMIN_REQUIRED, UNAUTHORIZED
+from src.services.metrics import cache_requests
+from src.services.redis_client import get_redis
+from src.services.revocation import revocation_list
+from src.services.tracing import traced, tracer
+
+logger = logging.getLogger(__name__)
 
 
 class Auth:
-    pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
     SECRET_KEY = settings.secret_key_jwt
     ALGORITHM = settings.algorithm
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-    redis = redis_db.Redis(host=settings.redis_host, port=settings.redis_port, db=0)
 
+    @cached_property
+    def pwd_context(self):
+        """
+        The password hashing context, built on first use so that importing the module does not load passlib.
+
+        :return: The bcrypt context
+        :rtype: CryptContext
+
+        """
+
+        from passlib.context import CryptContext
+
+        return CryptContext(schemes=['bcrypt'], deprecated='auto')
+
+    @cached_property
+    def redis(self):
+        """
+        The Redis client caching the current users, built on first use.
+
+        :return: The shared Redis client
+        :rtype: redis.Redis
+
+        """
+
+        return get_redis()
+
+    def __init__(self):
+        self.session_factory = SessionLocal
+        self._user_loads: dict[str, asyncio.Future] = {}
+        self._refreshes: set[asyncio.Task] = set()
+
+    @traced("auth.verify_password")
     def verify_password(self, plain_password, hashed_password):
         """
         The verify_password function takes a plain-text password and hashed
@@ -48,6 +94,7 @@ class Auth:
 
         return self.pwd_context.verify(plain_password, hashed_password)
 
+    @traced("auth.hash_password")
     def get_password_hash(self, password: str):
         """
         The get_password_hash function takes a password as input and returns the hash of that password.
@@ -86,8 +133,8 @@ class Auth:
         if expires_delta:
             expire = datetime.utcnow() + timedelta(seconds=expires_delta)
         else:
-            expire = datetime.utcnow() + timedelta(minutes=15)
-        to_encode.update({"iat": datetime.utcnow(), "exp": expire, "scope": "access_token"})
+            expire = datetime.utcnow() + timedelta(seconds=settings.access_token_expire)
+        to_encode.update({"iat": datetime.utcnow(), "exp": expire, "scope": "access_token", "jti": uuid.uuid4().hex})
         encoded_access_token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
         return encoded_access_token
 
@@ -135,27 +182,196 @@ class Auth:
 
         """
 
+        payload = await self.decode_refresh_token_claims(refresh_token)
+        return payload['sub']
+
+    async def decode_refresh_token_claims(self, refresh_token: str) -> dict:
+        """
+        The decode_refresh_token_claims function decodes the refresh token and returns all of its claims,
+        including the jti, fam and sid claims used for rotation.
+
+        :param self: Represent the instance of the class
+
+        :param refresh_token: Pass in the refresh token that is sent from the client
+        :type refresh_token: str
+
+        :return: The claims of the refresh token
+        :rtype: dict
+
+        """
+
         try:
             payload = jwt.decode(refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
             if payload['scope'] == 'refresh_token':
-                email = payload['sub']
-                return email
+                return payload
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid scope for token")
         except JWTError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=UNAUTHORIZED)
 
-    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    async def decode_access_token(self, token: str) -> dict:
+        """
+        The decode_access_token function validates an access token and checks it against the revocation list
+        kept in memory, so no network call is made.
+
+        :param self: Represent the instance of the class
+
+        :param token: The access token
+        :type token: str
+
+        :return: The claims of the access token
+        :rtype: dict
+
+        """
+
+        credentials_exception = HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+        )
+        try:
+            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            if payload['scope'] != 'access_token' or payload.get('sub') is None:
+                raise credentials_exception
+        except JWTError as e:
+            raise credentials_exception
+
+        if revocation_list.is_revoked(payload):
+            raise credentials_exception
+        return payload
+
+    @traced("auth.cache_user")
+    def _store_user(self, email: str, user, delta: float):
+        ttl = settings.user_cache_ttl
+        entry = {"user": user, "delta": delta, "expires": time.time() + ttl}
+        self.redis.set(f"users:{email}", pickle.dumps(entry), ex=ttl)
+
+    @staticmethod
+    def _should_refresh(entry: dict) -> bool:
+        """
+        The _should_refresh function decides on probabilistic early expiration (XFetch): the closer the entry is to
+        its expiry, relative to the time it takes to load, the likelier a request refreshes it. Concurrent requests
+        rarely win together, so a hot entry is reloaded once, before it expires.
+
+        :param entry: The cached entry.
+        :type entry: dict
+
+        :return: True if this request should refresh the entry.
+        :rtype: bool
+
+        """
+
+        delta = max(entry["delta"], settings.user_cache_refresh_window)
+        return time.time() - delta * settings.user_cache_beta * math.log(1.0 - random.random()) >= entry["expires"]
+
+    def _release_lock(self, key: str, token: str):
+        with self.redis.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                if pipe.get(key) == token.encode():
+                    pipe.multi()
+                    pipe.delete(key)
+                    pipe.execute()
+            except WatchError:
+                pass
+
+    @traced("auth.fetch_user")
+    async def _fetch_user(self, email: str, db: Session):
+        """
+        The _fetch_user function reads the user from the database and caches it. A short Redis lock lets one worker
+        do it while the others wait for the cache to be filled, falling back to the database when the lock expires.
+        The Redis calls run in the threadpool, so a slow Redis does not stall the event loop. The user is returned
+        detached from the session.
+
+        """
+
+        key, token = f"users_lock:{email}", uuid.uuid4().hex
+        lock_timeout = settings.user_cache_lock_timeout
+        if not await run_in_threadpool(self.redis.set, key, token, nx=True, px=int(lock_timeout * 1000)):
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.02)
+                cached = await run_in_threadpool(self.redis.get, f"users:{email}")
+                if cached is not None:
+                    return self._cached_user(pickle.loads(cached))
+
+        try:
+            logger.info("user loaded from the database", extra={"event": "user_cache", "source": "database"})
+            started = time.monotonic()
+            user = await repository_users.get_user_by_email(email, db)
+            if user is not None:
+                # detached like the users served from the cache: the requests sharing this load must not depend on
+                # a session that its own request commits or closes
+                db.expunge(user)
+                await run_in_threadpool(self._store_user, email, user, time.monotonic() - started)
+            return user
+        finally:
+            await run_in_threadpool(self._release_lock, key, token)
+
+    async def _load_user(self, email: str, db: Session):
+        """
+        The _load_user function loads a user once per worker however many requests miss at the same time: the first
+        one fetches it and the others await the same future.
+
+        """
+
+        future = self._user_loads.get(email)
+        if future is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # the request loading the user was cancelled
+                return await self._fetch_user(email, db)
+
+        future = asyncio.get_running_loop().create_future()
+        self._user_loads[email] = future
+        try:
+            user = await self._fetch_user(email, db)
+            future.set_result(user)
+            return user
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            del self._user_loads[email]
+
+    async def _refresh_user(self, email: str):
+        db = self.session_factory()
+        try:
+            await self._load_user(email, db)
+        finally:
+            db.close()
+
+    def _refresh_in_background(self, email: str):
+        if email in self._user_loads:
+            return
+        task = asyncio.create_task(self._refresh_user(email))
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+
+    @staticmethod
+    def _cached_user(entry):
+        # entries written before early refresh hold the bare user
+        return entry["user"] if isinstance(entry, dict) else entry
+
+    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_read_db)):
         """
         The get_current_user function is a dependency that will be used in the
             UserRouter class. It takes an OAuth2 token as input and returns the user
             associated with that token. If no user is found, it raises an exception.
+            Users are cached in Redis; concurrent misses are coalesced into one database read, and hot entries are
+            refreshed in the background shortly before they expire.
 
         :param self: Represent the instance of the class
 
         :param token: Get the token from the authorization header
         :type token: str
 
-        :param db: Get the database connection from the dependency injection.
+        :param db: Get the database connection from the dependency injection, a replica when one is configured.
         :type db: Session
 
         :return: The user object that is associated with the token
@@ -166,29 +382,25 @@ class Auth:
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
         )
-        try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
-            if payload['scope'] == 'access_token':
-                email: str = payload['sub']
-                if email is None:
-                    raise credentials_exception
-            else:
+        payload = await self.decode_access_token(token)
+        email: str = payload['sub']
+        select_shard(db, email)
+
+        with tracer.span("redis.get", key="users"):
+            cached = await run_in_threadpool(self.redis.get, f"users:{email}")
+        if cached is None:
+            cache_requests.inc("users", "miss")
+            user = await self._load_user(email, db)
+            if user is None:
                 raise credentials_exception
-        except JWTError as e:
-            raise credentials_exception
+            return user
 
-        user = self.redis.get(f"users:{email}")
-        if user is None:
-            print('GET USER FROM POSTGRES')
-            user = await repository_users.get_user_by_email(email, db)
-            if user is None :
-                raise credentials_exception
-            self.redis.set(f"users:{email}", pickle.dumps(user))
-            self.redis.expire(f"users:{email}", 900)
-        else:
-            print('GET USER FROM CACHE')
-            user = pickle.loads(user)
-        return user
+        cache_requests.inc("users", "hit")
+        logger.info("user served from the cache", extra={"event": "user_cache", "source": "cache"})
+        entry = pickle.loads(cached)
+        if isinstance(entry, dict) and self._should_refresh(entry):
+            self._refresh_in_background(email)
+        return self._cached_user(entry)
 
     async def create_email_token(self, data: dict):
         """
@@ -233,9 +445,26 @@ class Auth:
                 return email
             raise HTTPException(status_code = status.HTTP_401_UNAUTHORIZED , detail = 'Invalid scope for token')
         except JWTError as e:
-            print(e)
+            logger.warning("invalid email verification token: %s", e)
             raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                                 detail="Invalid token for email verification")
 
 
 auth_service = Auth()
+
+
+async def get_current_admin(current_user: User = Depends(auth_service.get_current_user)) -> User:
+    """
+    The get_current_admin function lets through the users whose email is listed in the admin_emails setting.
+
+    :param current_user: Get the current user.
+    :type current_user: User=Depends(auth_service.get_current_user)
+
+    :return: The current user.
+    :rtype: User
+
+    """
+
+    if current_user.email.lower() not in {email.lower() for email in settings.admin_emails}:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=ADMIN_REQUIRED)
+    return current_user
@@ -0,0 +1,232 @@
+"""
+Birthday digest module
+______________________
+Nightly batch job that emails every confirmed user the contacts whose birthday falls in the next days. The contacts
+are read once, ordered by user, through a server-side cursor, grouped into one digest per user and sent in batches.
+After every batch the last finished user is written to a JSON checkpoint, so a run that stops is resumed where it
+left off; at most one batch is sent twice.
+
+With sharding every shard is processed in turn, each with its own checkpoint. The same run purges the delta sync
+tombstones older than ``sync_tombstone_retention_days``. Run it once a day, for example from cron:
+
+    0 6 * * * cd /srv/REST && python -m src.services.birthday_digest
+
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Awaitable, Callable, Iterator
+
+from sqlalchemy import and_, extract, or_, select
+from sqlalchemy.orm import Session
+
+from src.conf.config import settings
+from src.database.model import Contact, User
+
+logger = logging.getLogger(__name__)
+
+
+def upcoming_days(today: date, days: int) -> list[tuple[int, int]]:
+    """
+    The upcoming_days function lists the (month, day) pairs of the window starting today. Contacts born on
+    February 29 are congratulated on February 28 in common years.
+
+    :param today: The first day of the window.
+    :type today: date
+
+    :param days: The number of days in the window.
+    :type days: int
+
+    :return: The (month, day) pairs.
+    :rtype: list[tuple[int, int]]
+
+    """
+
+    pairs = []
+    for offset in range(days):
+        day = today + timedelta(days=offset)
+        pairs.append((day.month, day.day))
+        if (day.month, day.day) == (2, 28) and (day + timedelta(days=1)).month == 3:
+            pairs.append((2, 29))
+    return pairs
+
+
+def next_birthday(born: date, today: date) -> date:
+    try:
+        birthday = born.replace(year=today.year)
+    except ValueError:
+        birthday = date(today.year, 2, 28)
+    if birthday < today:
+        try:
+            birthday = born.replace(year=today.year + 1)
+        except ValueError:
+            birthday = date(today.year + 1, 2, 28)
+    return birthday
+
+
+@dataclass
+class DigestStats:
+    users: int = 0
+    contacts: int = 0
+    sent: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+
+class BirthdayDigestJob:
+    def __init__(self, session_factory: Callable[[], Session], send: Callable[[list[dict]], Awaitable[int]],
+                 days: int = 7, batch_size: int = 100, checkpoint_path: str | None = None,
+                 today: date | None = None, yield_per: int = 1000):
+        self.session_factory = session_factory
+        self.send = send
+        self.days = days
+        self.batch_size = batch_size
+        self.checkpoint_path = checkpoint_path
+        self.today = today or date.today()
+        self.yield_per = yield_per
+
+    def load_checkpoint(self) -> tuple[int, bool]:
+        """
+        The load_checkpoint function returns the last user finished by an earlier run of the same day, 0 if none,
+        and whether that run completed.
+
+        """
+
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return 0, False
+        with open(self.checkpoint_path) as fh:
+            checkpoint = json.load(fh)
+        if checkpoint.get("date") != self.today.isoformat():
+            return 0, False
+        return checkpoint["last_user_id"], checkpoint.get("done", False)
+
+    def save_checkpoint(self, last_user_id: int, stats: DigestStats, done: bool = False):
+        if not self.checkpoint_path:
+            return
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as fh:
+            json.dump({"date": self.today.isoformat(), "last_user_id": last_user_id, "done": done,
+                       "users": stats.users, "sent": stats.sent}, fh)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def statement(self, after_user_id: int):
+        birthday = or_(*(
+            and_(extract("month", Contact.date_of_birth) == month, extract("day", Contact.date_of_birth) == day)
+            for month, day in upcoming_days(self.today, self.days)
+        ))
+        return (
+            select(User.id, User.email, User.username, Contact.name, Contact.surname, Contact.date_of_birth)
+            .join(Contact, Contact.user_id == User.id)
+            .where(User.confirmed.is_(True), User.id > after_user_id, birthday)
+            .order_by(User.id, Contact.id)
+            .execution_options(yield_per=self.yield_per)
+        )
+
+    def digests(self, db: Session, after_user_id: int, stats: DigestStats) -> Iterator[dict]:
+        """
+        The digests function streams the rows of the window and yields one digest per user.
+
+        """
+
+        rows = db.execute(self.statement(after_user_id))
+        for user_id, group in itertools.groupby(rows, key=lambda row: row.id):
+            group = list(group)
+            stats.contacts += len(group)
+            birthdays = []
+            for row in group:
+                upcoming = next_birthday(row.date_of_birth, self.today)
+                birthdays.append({"name": row.name, "surname": row.surname,
+                                  "date": upcoming.strftime("%d %B"), "days": (upcoming - self.today).days})
+            birthdays.sort(key=lambda birthday: birthday["days"])
+            yield {"user_id": user_id, "email": group[0].email, "username": group[0].username,
+                   "birthdays": birthdays}
+
+    async def run(self) -> DigestStats:
+        """
+        The run function sends the digests of the day, resuming from the checkpoint if there is one. A day that
+        was already completed is not sent again.
+
+        :return: The figures of the run.
+        :rtype: DigestStats
+
+        """
+
+        stats = DigestStats()
+        last_user_id, done = self.load_checkpoint()
+        if done:
+            logger.info("birthday digests of %s were already sent", self.today)
+            return stats
+        if last_user_id:
+            logger.info("resuming birthday digests of %s after user %d", self.today, last_user_id)
+        started = time.perf_counter()
+
+        db = self.session_factory()
+        try:
+            digests = self.digests(db, last_user_id, stats)
+            while batch := list(itertools.islice(digests, self.batch_size)):
+                stats.sent += await self.send(batch)
+                stats.users += len(batch)
+                stats.batches += 1
+                last_user_id = batch[-1]["user_id"]
+                self.save_checkpoint(last_user_id, stats)
+
+                elapsed = time.perf_counter() - started
+                logger.info("batch %d: %d users, %d contacts, %d sent, %.1f users/s, %.1f contacts/s",
+                            stats.batches, stats.users, stats.contacts, stats.sent,
+                            stats.users / elapsed, stats.contacts / elapsed)
+        finally:
+            db.close()
+
+        stats.seconds = time.perf_counter() - started
+        self.save_checkpoint(last_user_id, stats, done=True)
+        logger.info("birthday digests of %s done: %d users, %d contacts, %d sent in %.1f s",
+                    self.today, stats.users, stats.contacts, stats.sent, stats.seconds)
+        return stats
+
+
+def main():
+    from sqlalchemy.orm import sessionmaker
+
+    from src.database.connect import SessionLocal, shard_router
+    from src.repository.contacts import purge_tombstones
+    from src.services.email import send_birthday_digests
+    from src.services.sync import tombstone_cutoff
+
+    parser = argparse.ArgumentParser(description="Send the upcoming birthday digests of the day and purge the expired "
+                                                 "sync tombstones.")
+    parser.add_argument("--date", type=date.fromisoformat, help="the first day of the window, today by default")
+    parser.add_argument("--days", type=int, default=settings.birthday_digest_days)
+    parser.add_argument("--batch-size", type=int, default=settings.birthday_digest_batch_size)
+    parser.add_argument("--checkpoint", default=settings.birthday_digest_checkpoint)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    targets = [(SessionLocal, args.checkpoint)]
+    if shard_router.engines:
+        targets = [(sessionmaker(bind=engine, autoflush=False), f"{args.checkpoint}.{name}")
+                   for name, engine in shard_router.engines.items()]
+
+    async def run_all():
+        for session_factory, checkpoint in targets:
+            job = BirthdayDigestJob(session_factory, send_birthday_digests, days=args.days,
+                                    batch_size=args.batch_size, checkpoint_path=checkpoint, today=args.date)
+            await job.run()
+            db = session_factory()
+            try:
+                purged = await purge_tombstones(tombstone_cutoff(), db)
+            finally:
+                db.close()
+            logger.info("purged %d sync tombstones", purged)
+
+    asyncio.run(run_all())
+
+
+if __name__ == "__main__":
+    main()
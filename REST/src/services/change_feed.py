@@ -0,0 +1,190 @@
+"""
+Change feed module
+__________________
+Push notifications of contact changes to the devices of their owner. The repository write functions publish every
+committed change to one Redis channel; each worker holds a single subscription to that channel, started with the
+first stream, and fans the events out to the streams of the user in memory. Users are identified by email, which
+is unique across shards where ids are not.
+
+Every stream has a bounded buffer. The listener never waits for a client: when a buffer is full the stream is sent
+a ``resync`` event and closed, and the client catches up through the delta sync endpoint. The same happens to every
+stream when the listener loses Redis, as events published meanwhile are lost.
+
+"""
+
+import asyncio
+import json
+import logging
+from functools import cached_property
+from typing import AsyncIterator
+
+import redis as redis_db
+from starlette.concurrency import run_in_threadpool
+
+from src.conf.config import settings
+from src.services.redis_client import get_async_redis, get_redis
+
+CHANNEL = "contacts:changes"
+CHANGED = "changed"
+DELETED = "deleted"
+RESYNC = "resync"
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    def __init__(self, email: str, buffer_size: int):
+        self.email = email
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=buffer_size)
+        self.closed = False
+
+    def offer(self, event: dict):
+        """
+        The offer function buffers an event without waiting. A full buffer is replaced by a single resync event.
+
+        :param event: The event to deliver.
+        :type event: dict
+
+        """
+
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.resync()
+
+    def resync(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait({"type": RESYNC})
+        self.closed = True
+
+
+def format_event(event: dict) -> str:
+    data = {key: value for key, value in event.items() if key != "type"}
+    return f"event: {event['type']}\ndata: {json.dumps(data)}\n\n"
+
+
+class ChangeFeed:
+    @cached_property
+    def redis(self):
+        return get_redis(decode_responses=True)
+
+    @cached_property
+    def async_redis(self):
+        return get_async_redis()
+
+    def __init__(self, buffer_size: int, keepalive: float, retry_interval: float):
+        self.buffer_size = buffer_size
+        self.keepalive = keepalive
+        self.retry_interval = retry_interval
+        self.subscribers: dict[str, set[Subscription]] = {}
+        self._task: asyncio.Task | None = None
+
+    async def publish(self, email: str, events: list[tuple[str, int]]):
+        """
+        The publish function announces committed changes of a user's contacts to every worker. The call to Redis runs
+        in the threadpool, off the event loop. A Redis failure does not fail the write: the clients miss the push and
+        pick the change up on their next sync.
+
+        :param email: The email of the owner of the contacts.
+        :type email: str
+
+        :param events: The (type, contact id) pairs, type being changed or deleted.
+        :type events: list[tuple[str, int]]
+
+        """
+
+        message = {"user": email, "events": [{"type": kind, "id": contact_id} for kind, contact_id in events]}
+        try:
+            await run_in_threadpool(self.redis.publish, CHANNEL, json.dumps(message))
+        except redis_db.RedisError:
+            pass
+
+    def dispatch(self, data: str):
+        message = json.loads(data)
+        for subscription in tuple(self.subscribers.get(message["user"], ())):
+            for event in message["events"]:
+                subscription.offer(event)
+
+    def subscribe(self, email: str) -> Subscription:
+        self.start()
+        subscription = Subscription(email, self.buffer_size)
+        self.subscribers.setdefault(email, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self.subscribers.get(subscription.email)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscribers[subscription.email]
+
+    def resync_all(self):
+        for subscriptions in tuple(self.subscribers.values()):
+            for subscription in tuple(subscriptions):
+                subscription.resync()
+
+    async def events(self, email: str) -> AsyncIterator[str]:
+        """
+        The events function streams the changes of a user as server-sent events, with a comment line every
+        keepalive seconds so proxies keep the connection open. It ends after a resync event.
+
+        :param email: The email of the user to stream the changes of.
+        :type email: str
+
+        :return: The formatted events.
+        :rtype: AsyncIterator[str]
+
+        """
+
+        subscription = self.subscribe(email)
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_event(event)
+                if event["type"] == RESYNC:
+                    return
+        finally:
+            self.unsubscribe(subscription)
+
+    async def run(self):
+        while True:
+            pubsub = self.async_redis.pubsub()
+            try:
+                await pubsub.subscribe(CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    try:
+                        self.dispatch(message["data"])
+                    except Exception:
+                        logger.exception("malformed change feed message dropped")
+            except redis_db.RedisError:
+                pass
+            finally:
+                await pubsub.close()
+            self.resync_all()
+            await asyncio.sleep(self.retry_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+change_feed = ChangeFeed(settings.change_feed_buffer_size, settings.change_feed_keepalive,
+                         settings.change_feed_retry_interval)
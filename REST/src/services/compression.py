@@ -0,0 +1,201 @@
+"""
+Compression module
+__________________
+Compression of response bodies with gzip, or brotli when the ``brotli`` package is installed and the client prefers
+it. brotli comes with the optional ``compression`` extra, ``poetry install -E compression``. Only bodies of the
+allowed content types are compressed, and only from ``compression_minimum_size`` bytes, as small bodies gain little
+and cost CPU. Responses already encoded or marked ``Cache-Control: no-transform`` are left alone.
+
+Streaming responses are compressed chunk by chunk without buffering: every chunk is flushed, so a client decodes it
+as soon as it arrives. Server-sent events are not on the default allowlist since every event would pay for the
+flush.
+
+"""
+
+import re
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from src.conf.config import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP = "gzip"
+BROTLI = "br"
+_GZIP_WBITS = 31
+_NO_BODY_STATUSES = frozenset((204, 304))
+_ACCEPT_ITEM = re.compile(r"^\s*([^;\s]+)\s*(?:;\s*q\s*=\s*([^;\s]*))?")
+
+
+class GzipCompressor:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, _GZIP_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+def available_encodings() -> tuple[str, ...]:
+    return (BROTLI, GZIP) if brotli is not None else (GZIP,)
+
+
+def choose_encoding(accept_encoding: str, encodings: tuple[str, ...]) -> str | None:
+    """
+    The choose_encoding function picks the encoding of a response from the Accept-Encoding header of the request.
+
+    :param accept_encoding: The Accept-Encoding header.
+    :type accept_encoding: str
+
+    :param encodings: The supported encodings, preferred first.
+    :type encodings: tuple[str, ...]
+
+    :return: The encoding with the highest weight, the earliest supported one on a tie, or None to send the body as
+        it is.
+    :rtype: str | None
+
+    """
+
+    weights = {}
+    for item in accept_encoding.lower().split(","):
+        match = _ACCEPT_ITEM.match(item)
+        if match is None:
+            continue
+        try:
+            weights[match.group(1)] = float(match.group(2)) if match.group(2) is not None else 1.0
+        except ValueError:
+            continue
+
+    wildcard = weights.get("*", 0.0)
+    best, best_weight = None, 0.0
+    for encoding in encodings:
+        weight = weights.get(encoding, wildcard)
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compressible(content_type: str | None, content_types: list[str]) -> bool:
+    if not content_type:
+        return False
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return media_type in content_types
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing the responses of clients that accept gzip or brotli.
+
+    """
+
+    def __init__(self, app, minimum_size: int = settings.compression_minimum_size,
+                 gzip_level: int = settings.compression_gzip_level,
+                 brotli_quality: int = settings.compression_brotli_quality,
+                 content_types: list[str] = settings.compression_content_types,
+                 encodings: tuple[str, ...] | None = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.content_types = [content_type.lower() for content_type in content_types]
+        self.encodings = encodings or available_encodings()
+
+    def compressor(self, encoding: str) -> GzipCompressor | BrotliCompressor:
+        if encoding == BROTLI:
+            return BrotliCompressor(self.brotli_quality)
+        return GzipCompressor(self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body, more_body = message.get("body", b""), message.get("more_body", False)
+            if start is not None:
+                response_start, start = start, None
+                headers = MutableHeaders(scope=response_start)
+                if self.skip(response_start["status"], headers, body, more_body):
+                    await send(response_start)
+                    await send(message)
+                    return
+                compressor = self.compressor(encoding)
+                body = compressor.compress(body) if more_body else compressor.finish(body)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(body))
+                await send(response_start)
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+            elif compressor is None:
+                await send(message)
+            else:
+                body = compressor.compress(body) if more_body else compressor.finish(body)
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def skip(self, status: int, headers: MutableHeaders, body: bytes, more_body: bool) -> bool:
+        """
+        The skip function tells whether a response is sent as it is.
+
+        :param status: The status code of the response.
+        :type status: int
+
+        :param headers: The headers of the response.
+        :type headers: MutableHeaders
+
+        :param body: The first chunk of the body.
+        :type body: bytes
+
+        :param more_body: Whether more chunks follow.
+        :type more_body: bool
+
+        :return: True if the response is not compressed.
+        :rtype: bool
+
+        """
+
+        if status in _NO_BODY_STATUSES or "content-encoding" in headers:
+            return True
+        if "no-transform" in headers.get("cache-control", "").lower():
+            return True
+        if not compressible(headers.get("content-type"), self.content_types):
+            return True
+        if "content-length" in headers:
+            return int(headers["content-length"]) < self.minimum_size
+        return not more_body and len(body) < self.minimum_size
@@ -0,0 +1,222 @@
+"""
+Dedupe module
+_____________
+Detection of near-duplicate contacts. Instead of comparing every pair, each contact gets blocking keys, the
+lowercased email, the E.164 phone and the Soundex codes of name and surname, and only contacts sharing a key are
+compared. Contacts without an E.164 phone fall back to the last nine digits of the number as typed. Name blocks larger than ``max_block_size`` are skipped: a very common name says little
+on its own and would bring the quadratic cost back. The name similarity, the costly part of scoring, is only computed
+for pairs that can still reach the requested score.
+
+"""
+
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from difflib import SequenceMatcher
+from typing import Iterable, Sequence
+
+PHONE_DIGITS = 9
+MAX_BLOCK_SIZE = 50
+
+WEIGHTS = {"email": 0.4, "phone": 0.3, "name": 0.3, "date_of_birth": 0.1}
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+_NON_DIGITS = re.compile(r"\D")
+
+
+@dataclass
+class DuplicateCandidate:
+    contact_ids: tuple[int, int]
+    score: float
+    reasons: list[str] = field(default_factory=list)
+
+
+def normalize_email(email: str | None) -> str | None:
+    return (email.strip().lower() or None) if email else None
+
+
+def normalize_phone(phone: str | int | None) -> str | None:
+    """
+    The normalize_phone function keeps the last nine digits of a phone number, so local and international spellings
+    of the same number match.
+
+    :param phone: The phone number.
+    :type phone: str | int | None
+
+    :return: The digits, or None if the number is too short to compare.
+    :rtype: str | None
+
+    """
+
+    if phone is None:
+        return None
+    digits = _NON_DIGITS.sub("", str(phone))
+    return digits[-PHONE_DIGITS:] if len(digits) >= PHONE_DIGITS else None
+
+
+def soundex(word: str | None) -> str:
+    """
+    The soundex function returns the American Soundex code of a word: its first letter followed by three digits
+    for the consonant sounds, so that names spelled alike by ear share a code.
+
+    :param word: The word to encode.
+    :type word: str | None
+
+    :return: The four character code, or an empty string if the word has no letters.
+    :rtype: str
+
+    """
+
+    letters = [char for char in (word or "").lower() if "a" <= char <= "z"]
+    if not letters:
+        return ""
+
+    code = letters[0].upper()
+    previous = _SOUNDEX_CODES.get(letters[0], "")
+    for char in letters[1:]:
+        digit = _SOUNDEX_CODES.get(char, "")
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        if char not in "hw":
+            previous = digit
+    return code.ljust(4, "0")
+
+
+def _prepare(row: Sequence) -> tuple:
+    contact_id, name, surname, email, mobile, born, *rest = row
+    phone = rest[0] if rest and rest[0] else normalize_phone(mobile)
+    full_name = f"{name or ''} {surname or ''}".strip().lower()
+    return contact_id, full_name, normalize_email(email), phone, born
+
+
+def _keys(row: Sequence, contact: tuple) -> list[tuple[str, str]]:
+    keys = []
+    if contact[2] is not None:
+        keys.append(("email", contact[2]))
+    if contact[3] is not None:
+        keys.append(("phone", contact[3]))
+    if contact[1]:
+        keys.append(("name", soundex(row[1]) + soundex(row[2])))
+    return keys
+
+
+def blocking_keys(row: Sequence) -> list[tuple[str, str]]:
+    """
+    The blocking_keys function computes the blocks a contact belongs to.
+
+    :param row: A (id, name, surname, email, mobile, date_of_birth, phone) row, phone being optional.
+    :type row: Sequence
+
+    :return: The (kind, value) pairs of the contact.
+    :rtype: list[tuple[str, str]]
+
+    """
+
+    return _keys(row, _prepare(row))
+
+
+def _score(first: tuple, second: tuple, min_score: float = 0.0) -> tuple[float, list[str]]:
+    _, name_a, email_a, phone_a, born_a = first
+    _, name_b, email_b, phone_b, born_b = second
+    score, reasons = 0.0, []
+
+    if email_a is not None and email_a == email_b:
+        score += WEIGHTS["email"]
+        reasons.append("email")
+    if phone_a is not None and phone_a == phone_b:
+        score += WEIGHTS["phone"]
+        reasons.append("phone")
+    born = isinstance(born_a, date) and born_a == born_b
+    if born:
+        score += WEIGHTS["date_of_birth"]
+    if name_a and name_b:
+        if name_a == name_b:
+            similarity = 1.0
+        elif score + WEIGHTS["name"] <= min_score:
+            return score, reasons
+        else:
+            similarity = SequenceMatcher(None, name_a, name_b).ratio()
+        if similarity >= 0.8:
+            reasons.append("name")
+        score += WEIGHTS["name"] * similarity
+    if born:
+        reasons.append("date_of_birth")
+    return min(round(score, 3), 1.0), reasons
+
+
+def score_pair(first: Sequence, second: Sequence) -> tuple[float, list[str]]:
+    """
+    The score_pair function rates how likely two contacts are the same person, from 0 to 1.
+
+    :param first: A (id, name, surname, email, mobile, date_of_birth, phone) row, phone being optional.
+    :type first: Sequence
+
+    :param second: Another row of the same shape.
+    :type second: Sequence
+
+    :return: The score and the fields that matched.
+    :rtype: tuple[float, list[str]]
+
+    """
+
+    return _score(_prepare(first), _prepare(second))
+
+
+def find_duplicates(rows: Iterable[Sequence], min_score: float = 0.3, limit: int | None = None,
+                    max_block_size: int = MAX_BLOCK_SIZE) -> list[DuplicateCandidate]:
+    """
+    The find_duplicates function groups the contacts by blocking key and scores the pairs inside each block.
+
+    :param rows: The (id, name, surname, email, mobile, date_of_birth, phone) rows of one user, phone being
+        optional.
+    :type rows: Iterable[Sequence]
+
+    :param min_score: The lowest score returned.
+    :type min_score: float
+
+    :param limit: The number of candidates returned, all by default.
+    :type limit: int | None
+
+    :param max_block_size: Name blocks larger than this are not compared.
+    :type max_block_size: int
+
+    :return: The merge candidates, best first.
+    :rtype: list[DuplicateCandidate]
+
+    """
+
+    prepared = []
+    blocks: dict[tuple[str, str], list[int]] = defaultdict(list)
+    for index, row in enumerate(rows):
+        contact = _prepare(row)
+        prepared.append(contact)
+        for key in _keys(row, contact):
+            blocks[key].append(index)
+
+    seen: set[tuple[int, int]] = set()
+    candidates = []
+    for (kind, _), members in blocks.items():
+        if len(members) < 2 or (kind == "name" and len(members) > max_block_size):
+            continue
+        for position, first in enumerate(members):
+            for second in members[position + 1:]:
+                if (first, second) in seen:
+                    continue
+                seen.add((first, second))
+                score, reasons = _score(prepared[first], prepared[second], min_score)
+                if score >= min_score:
+                    pair = tuple(sorted((prepared[first][0], prepared[second][0])))
+                    candidates.append(DuplicateCandidate(pair, score, reasons))
+
+    candidates.sort(key=lambda candidate: (-candidate.score, candidate.contact_ids))
+    return candidates[:limit] if limit is not None else candidates
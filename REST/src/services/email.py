@@ -1,28 +1,46 @@
+import asyncio
+import logging
+from functools import lru_cache
 from pathlib import Path
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
 from pydantic import EmailStr
 
 from src.services.auth import auth_service
 from src.conf.config import settings
+from src.services.tracing import traced
 
+logger = logging.getLogger(__name__)
 
-conf = ConnectionConfig(
-    MAIL_USERNAME = settings.mail_username,
-    MAIL_PASSWORD = settings.mail_password,
-    MAIL_FROM = EmailStr(settings.mail_from),
-    MAIL_PORT = settings.mail_port,
-    MAIL_SERVER = settings.mail_server,
-    MAIL_FROM_NAME = "Dear Receiver",
-    MAIL_STARTTLS = False,
-    MAIL_SSL_TLS = True,
-    USE_CREDENTIALS = True,
-    VALIDATE_CERTS = True,
-    TEMPLATE_FOLDER=Path(__file__).resolve().parent.parent.parent / 'templates',
-)
 
+@lru_cache
+def get_mail_config():
+    """
+    The get_mail_config function builds the mail connection config on first use, so importing the application does
+    not import fastapi_mail.
+
+    :return: The connection config shared by every mail sent by the application.
+    :rtype: ConnectionConfig
+
+    """
+
+    from fastapi_mail import ConnectionConfig
+
+    return ConnectionConfig(
+        MAIL_USERNAME = settings.mail_username,
+        MAIL_PASSWORD = settings.mail_password,
+        MAIL_FROM = EmailStr(settings.mail_from),
+        MAIL_PORT = settings.mail_port,
+        MAIL_SERVER = settings.mail_server,
+        MAIL_FROM_NAME = "Dear Receiver",
+        MAIL_STARTTLS = False,
+        MAIL_SSL_TLS = True,
+        USE_CREDENTIALS = True,
+        VALIDATE_CERTS = True,
+        TEMPLATE_FOLDER=Path(__file__).resolve().parent.parent.parent / 'templates',
+    )
 
+
+@traced("email.send_confirmation")
 async def send_email(email: EmailStr, username: str, host: str):
     """
     The send_email function sends an email to the user with a link to confirm their email address.
@@ -44,6 +62,9 @@ async def send_email(email: EmailStr, username: str, host: str):
     :return: A coroutine object
 
     """
+    from fastapi_mail import FastMail, MessageSchema, MessageType
+    from fastapi_mail.errors import ConnectionErrors
+
     try:
         token_verification = await auth_service.create_email_token({"sub": email})
         message = MessageSchema(
@@ -53,7 +74,48 @@ async def send_email(email: EmailStr, username: str, host: str):
             subtype=MessageType.html
         )
 
-        fm = FastMail(conf)
+        fm = FastMail(get_mail_config())
         await fm.send_message(message, template_name="email_template.html")
     except ConnectionErrors as err:
-        print(err)
+        logger.warning("confirmation email to %s failed: %s", email, err)
+
+
+@traced("email.send_birthday_digests")
+async def send_birthday_digests(digests: list[dict], concurrency: int = 10) -> int:
+    """
+    The send_birthday_digests function sends a batch of upcoming-birthday digests, several at a time.
+        Each digest is a dictionary with the email and username of the recipient and the list of their contacts
+        with upcoming birthdays. A digest that fails to send is skipped and not counted.
+
+    :param digests: The digests to send.
+    :type digests: list[dict]
+
+    :param concurrency: The number of messages sent at once.
+    :type concurrency: int
+
+    :return: The number of digests sent.
+    :rtype: int
+
+    """
+    from fastapi_mail import FastMail, MessageSchema, MessageType
+    from fastapi_mail.errors import ConnectionErrors
+
+    fm = FastMail(get_mail_config())
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(digest: dict) -> bool:
+        message = MessageSchema(
+            subject="Upcoming birthdays",
+            recipients=[digest["email"]],
+            template_body={"username": digest["username"], "birthdays": digest["birthdays"]},
+            subtype=MessageType.html
+        )
+        async with semaphore:
+            try:
+                await fm.send_message(message, template_name="birthday_digest.html")
+            except ConnectionErrors as err:
+                logger.warning("birthday digest to %s failed: %s", digest["email"], err)
+                return False
+        return True
+
+    return sum(await asyncio.gather(*(send(digest) for digest in digests)))
@@ -0,0 +1,160 @@
+"""
+Health module
+_____________
+Health checks in three tiers: liveness touches no I/O, readiness serves a result cached by a background task, and
+deep diagnostics measure every dependency on demand.
+
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from src.conf.config import settings
+from src.database.connect import write_engines
+from src.database.replicas import database_engines
+from src.services.auth import auth_service
+
+
+def _pool_stat(pool, name: str):
+    # QueuePool has methods, SingletonThreadPool a plain size and nothing else
+    value = getattr(pool, name, None)
+    return value() if callable(value) else value
+
+
+class HealthMonitor:
+    """
+    Keeps the readiness state of the application. A background task refreshes the database and Redis checks every
+    ``interval`` seconds and measures event-loop lag as a side effect of its own sleeps.
+
+    """
+
+    def __init__(self, interval: float, timeout: float):
+        self.interval = interval
+        self.timeout = timeout
+        self.ready = False
+        self.checked_at: float | None = None
+        self.checks: dict[str, dict[str, Any]] = {}
+        self.loop_lag_ms = 0.0
+        self.max_loop_lag_ms = 0.0
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def check_database():
+        for engine in write_engines().values():
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+
+    @staticmethod
+    def check_redis():
+        auth_service.redis.ping()
+
+    @staticmethod
+    async def check_smtp():
+        reader, writer = await asyncio.open_connection(settings.mail_server, settings.mail_port)
+        writer.close()
+        await writer.wait_closed()
+
+    async def _measure(self, check: Callable[[], Any] | Callable[[], Awaitable[Any]]) -> dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            if asyncio.iscoroutinefunction(check):
+                await asyncio.wait_for(check(), self.timeout)
+            else:
+                await asyncio.wait_for(run_in_threadpool(check), self.timeout)
+        except Exception as e:
+            return {"ok": False, "latency_ms": round((time.perf_counter() - start) * 1000, 3),
+                    "error": repr(e)}
+        return {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+    async def refresh(self):
+        """
+        The refresh function runs the readiness checks and stores the result.
+
+        """
+
+        database, redis = await asyncio.gather(self._measure(self.check_database), self._measure(self.check_redis))
+        self.checks = {"database": database, "redis": redis}
+        self.ready = database["ok"] and redis["ok"]
+        self.checked_at = time.monotonic()
+
+    async def readiness(self) -> dict[str, Any]:
+        """
+        The readiness function returns the cached state. The checks only run inline when the background task has
+        not produced a result recently, and concurrent callers share that single run.
+
+        :return: The readiness state and the age of the last check.
+        :rtype: dict[str, Any]
+
+        """
+
+        if self.checked_at is None or time.monotonic() - self.checked_at > 3 * self.interval:
+            async with self._lock:
+                if self.checked_at is None or time.monotonic() - self.checked_at > 3 * self.interval:
+                    await self.refresh()
+        return {
+            "ready": self.ready,
+            "checked_seconds_ago": round(time.monotonic() - self.checked_at, 3),
+            "checks": self.checks,
+        }
+
+    async def diagnostics(self) -> dict[str, Any]:
+        """
+        The diagnostics function measures the database, Redis and SMTP latency, reads the connection pool
+        occupancy of every database, replicas included, and the event-loop lag.
+
+        :return: The diagnostics report.
+        :rtype: dict[str, Any]
+
+        """
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.sleep(0)
+        instant_lag_ms = (loop.time() - start) * 1000
+
+        database, redis, smtp = await asyncio.gather(
+            self._measure(self.check_database), self._measure(self.check_redis), self._measure(self.check_smtp)
+        )
+        return {
+            "checks": {"database": database, "redis": redis, "smtp": smtp},
+            "pool": {name: {
+                "status": engine.pool.status(),
+                "size": _pool_stat(engine.pool, "size"),
+                "checked_out": _pool_stat(engine.pool, "checkedout"),
+                "overflow": _pool_stat(engine.pool, "overflow"),
+            } for name, engine in database_engines().items()},
+            "event_loop": {
+                "lag_ms": round(max(self.loop_lag_ms, instant_lag_ms), 3),
+                "max_lag_ms": round(max(self.max_loop_lag_ms, instant_lag_ms), 3),
+            },
+        }
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.refresh()
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.loop_lag_ms = max(0.0, (loop.time() - expected) * 1000)
+            self.max_loop_lag_ms = max(self.max_loop_lag_ms, self.loop_lag_ms)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+health_monitor = HealthMonitor(settings.health_check_interval, settings.health_check_timeout)
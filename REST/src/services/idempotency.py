@@ -0,0 +1,233 @@
+"""
+Idempotency module
+__________________
+Safe retries of write requests. A client sends the same ``Idempotency-Key`` header with every attempt of one
+operation; the first attempt runs and its response is kept in Redis for ``idempotency_ttl`` seconds, later attempts
+get that response back with an ``Idempotent-Replayed: true`` header instead of running the handler again.
+
+An attempt arriving while the first one is still running waits for it, up to ``idempotency_wait`` seconds, then gets
+409. Reusing a key with a different body is rejected with 422. Keys are scoped by the user the bearer token was issued
+to, method and path, so clients cannot read each other's responses and a retry made with a refreshed token still
+replays. The token is validated before the store is used; anonymous requests and requests with an invalid or expired
+token run as if no key had been sent. Only successful responses and the client errors caused by the request itself
+are kept, so a request rejected for its credentials or failing on the server can be retried. When Redis is
+unavailable requests run as if no key had been sent.
+
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import time
+from functools import cached_property
+
+import redis as redis_db
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from src.conf.config import settings
+from src.conf.messages import IDEMPOTENCY_IN_PROGRESS, IDEMPOTENCY_KEY_INVALID, IDEMPOTENCY_KEY_REUSED
+from src.services.auth import auth_service
+from src.services.redis_client import get_redis
+
+HEADER = "idempotency-key"
+UNSAFE_METHODS = frozenset(("POST", "PUT", "PATCH", "DELETE"))
+MAX_KEY_LENGTH = 255
+IN_FLIGHT = "in_flight"
+DONE = "done"
+# client errors caused by the request itself, the same whatever the credentials or the time of the retry
+KEPT_CLIENT_ERRORS = frozenset((400, 409, 422))
+
+
+class IdempotencyStore:
+    @cached_property
+    def redis(self):
+        return get_redis(decode_responses=True)
+
+    def __init__(self, ttl: int, wait: float, lock_ttl: float):
+        self.ttl = ttl
+        self.wait = wait
+        self.lock_ttl = lock_ttl
+        self._local: dict[str, asyncio.Event] = {}
+
+    def claim(self, key: str, fingerprint: str) -> dict | None:
+        """
+        The claim function marks a key as in flight unless an attempt already did.
+
+        :param key: The scoped key.
+        :type key: str
+
+        :param fingerprint: The hash of the request body.
+        :type fingerprint: str
+
+        :return: None if the key was claimed, otherwise the stored entry, which may have expired in between.
+        :rtype: dict | None
+
+        """
+
+        entry = json.dumps({"state": IN_FLIGHT, "fingerprint": fingerprint})
+        if self.redis.set(key, entry, nx=True, px=int(self.lock_ttl * 1000)):
+            self._local[key] = asyncio.Event()
+            return None
+        stored = self.redis.get(key)
+        return json.loads(stored) if stored is not None else {"state": IN_FLIGHT, "fingerprint": fingerprint}
+
+    def complete(self, key: str, fingerprint: str, status: int, headers: list, body: bytes):
+        try:
+            if not (200 <= status < 300 or status in KEPT_CLIENT_ERRORS):
+                self.redis.delete(key)
+            else:
+                self.redis.set(key, json.dumps({
+                    "state": DONE,
+                    "fingerprint": fingerprint,
+                    "status": status,
+                    "headers": [[name.decode("latin-1"), value.decode("latin-1")] for name, value in headers],
+                    "body": base64.b64encode(body).decode(),
+                }), ex=self.ttl)
+        finally:
+            event = self._local.pop(key, None)
+            if event is not None:
+                event.set()
+
+    async def wait_for(self, key: str) -> dict | None:
+        """
+        The wait_for function waits until the attempt holding a key is done. Attempts on this worker are awaited
+        directly, the others are polled in Redis.
+
+        :param key: The scoped key.
+        :type key: str
+
+        :return: The stored entry, or None if it is still in flight after the wait or was dropped after an error.
+        :rtype: dict | None
+
+        """
+
+        deadline = time.monotonic() + self.wait
+        while (remaining := deadline - time.monotonic()) > 0:
+            event = self._local.get(key)
+            if event is not None:
+                try:
+                    await asyncio.wait_for(event.wait(), remaining)
+                except asyncio.TimeoutError:
+                    return None
+            else:
+                await asyncio.sleep(min(0.05, remaining))
+            stored = self.redis.get(key)
+            if stored is None:
+                return None
+            entry = json.loads(stored)
+            if entry["state"] == DONE:
+                return entry
+        return None
+
+
+idempotency_store = IdempotencyStore(settings.idempotency_ttl, settings.idempotency_wait,
+                                     settings.idempotency_lock_ttl)
+
+
+async def _owner(headers: Headers) -> str | None:
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return (await auth_service.decode_access_token(token))["sub"]
+    except HTTPException:
+        return None
+
+
+def _error(status_code: int, detail: str) -> JSONResponse:
+    return JSONResponse({"detail": detail}, status_code=status_code)
+
+
+async def _replay(entry: dict, send):
+    headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in entry["headers"]]
+    await send({"type": "http.response.start", "status": entry["status"],
+                "headers": [*headers, (b"idempotent-replayed", b"true")]})
+    await send({"type": "http.response.body", "body": base64.b64decode(entry["body"])})
+
+
+class IdempotencyMiddleware:
+    """
+    ASGI middleware replaying the stored response of write requests carrying an Idempotency-Key header.
+
+    """
+
+    def __init__(self, app, store: IdempotencyStore = idempotency_store):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in UNSAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        idempotency_key = headers.get(HEADER)
+        owner = await _owner(headers) if idempotency_key is not None else None
+        if owner is None:
+            await self.app(scope, receive, send)
+            return
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            await _error(400, IDEMPOTENCY_KEY_INVALID)(scope, receive, send)
+            return
+
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+
+        replayed = False
+
+        async def replay_receive():
+            nonlocal replayed
+            if replayed:
+                return await receive()
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        owner = hashlib.sha256(owner.encode()).hexdigest()
+        key = f"idempotency:{owner}:{scope['method']}:{scope['path']}:{idempotency_key}"
+        fingerprint = hashlib.sha256(body).hexdigest()
+
+        try:
+            entry = self.store.claim(key, fingerprint)
+        except redis_db.RedisError:
+            await self.app(scope, replay_receive, send)
+            return
+
+        if entry is not None:
+            if entry["fingerprint"] != fingerprint:
+                await _error(422, IDEMPOTENCY_KEY_REUSED)(scope, receive, send)
+                return
+            if entry["state"] != DONE:
+                try:
+                    entry = await self.store.wait_for(key)
+                except redis_db.RedisError:
+                    entry = None
+            if entry is None:
+                await _error(409, IDEMPOTENCY_IN_PROGRESS)(scope, receive, send)
+                return
+            await _replay(entry, send)
+            return
+
+        status, response_headers, response_body = 500, [], []
+
+        async def send_wrapper(message):
+            nonlocal status, response_headers
+            if message["type"] == "http.response.start":
+                status, response_headers = message["status"], message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                response_body.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, send_wrapper)
+        finally:
+            try:
+                self.store.complete(key, fingerprint, status, response_headers, b"".join(response_body))
+            except redis_db.RedisError:
+                pass
@@ -0,0 +1,203 @@
+"""
+Logs module
+___________
+Structured logging that never blocks a request. Records are put on a bounded in-memory queue by the thread that logs
+them, and a background thread formats them as JSON lines and writes them out. When the queue is full, records are
+dropped and counted rather than waited on.
+
+Every record carries the id of the request it was logged for, taken from the ``X-Request-ID`` header or generated,
+and echoed in the response so client and server logs can be joined. High-frequency events, named by the ``event``
+extra field, can be sampled: only a share of them is kept and each kept record states the rate, so counts can be
+scaled back. Warnings and errors are always kept.
+
+"""
+
+import copy
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import TextIO
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from src.conf.config import settings
+
+REQUEST_ID_HEADER = "x-request-id"
+_REQUEST_ID = re.compile(r"[A-Za-z0-9._:-]{1,128}")
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        The format function turns a record into one JSON line with the time, level, logger, message and request id,
+        then the extra fields given to the logging call.
+
+        :param record: The record to format.
+        :type record: logging.LogRecord
+
+        :return: The JSON line.
+        :rtype: str
+
+        """
+
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        entry.update((key, value) for key, value in vars(record).items()
+                     if key not in _RECORD_FIELDS and key not in entry)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """
+        The filter function keeps a share of the records of sampled events, given by their rate.
+
+        :param record: The record to filter.
+        :type record: logging.LogRecord
+
+        :return: Whether the record is kept.
+        :rtype: bool
+
+        """
+
+        rate = self.rates.get(getattr(record, "event", None))
+        if rate is None or rate >= 1 or record.levelno >= logging.WARNING:
+            return True
+        record.sample_rate = rate
+        return random.random() < rate
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Queue handler that never waits: records arriving while the queue is full are dropped and counted.
+
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # the message is rendered now, the arguments may change before the listener formats the record
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    def __init__(self, level: str, queue_size: int, sample_rates: dict[str, float]):
+        self.level = level
+        self.queue_size = queue_size
+        self.sample_rates = sample_rates
+        self.handler: DroppingQueueHandler | None = None
+        self._listener: QueueListener | None = None
+        self._previous: tuple[list[logging.Handler], int] | None = None
+
+    def start(self, stream: TextIO | None = None):
+        """
+        The start function routes the records of every logger through the queue to a JSON writer thread.
+
+        :param stream: Where the lines are written, standard error by default.
+        :type stream: TextIO | None
+
+        """
+
+        if self._listener is not None:
+            return
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(JsonFormatter())
+        self.handler = DroppingQueueHandler(queue.Queue(self.queue_size))
+        self.handler.addFilter(SamplingFilter(self.sample_rates))
+        self.handler.addFilter(RequestIdFilter())
+
+        root = logging.getLogger()
+        self._previous = root.handlers[:], root.level
+        root.handlers = [self.handler]
+        root.setLevel(self.level)
+        self._listener = QueueListener(self.handler.queue, output)
+        self._listener.start()
+
+    def stop(self):
+        """
+        The stop function writes out the queued records and gives the loggers their previous handlers back.
+
+        """
+
+        if self._listener is None:
+            return
+        root = logging.getLogger()
+        root.handlers, level = self._previous
+        root.setLevel(level)
+        self._listener.stop()
+        self._listener = None
+
+
+log_pipeline = LogPipeline(settings.log_level, settings.log_queue_size, settings.log_sample_rates)
+
+
+def _request_id(headers: Headers) -> str:
+    value = headers.get(REQUEST_ID_HEADER)
+    if value is not None and _REQUEST_ID.fullmatch(value):
+        return value
+    return uuid.uuid4().hex
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware giving every request an id for its log records and returning it in the X-Request-ID header.
+
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        current = _request_id(Headers(scope=scope))
+        token = request_id.set(current)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[REQUEST_ID_HEADER] = current
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id.reset(token)
@@ -0,0 +1,276 @@
+"""
+Metrics module
+______________
+In-process metrics in the Prometheus text exposition format: per-route latency histograms, in-flight requests,
+database query counts and durations, and cache hit/miss counters. Timings use ``perf_counter_ns`` and histogram
+buckets are preallocated per label set, so recording is an index lookup plus an increment.
+
+"""
+
+import threading
+from bisect import bisect_left
+from time import perf_counter_ns
+from typing import Any, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, ...], Any] = {}
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """
+    A monotonically increasing value per label set.
+
+    """
+
+    type_name = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """
+    A value per label set that can go up and down.
+
+    """
+
+    type_name = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    """
+    A distribution of observations over fixed buckets. Bucket bounds are given in seconds and kept in nanoseconds,
+    counts are stored per bucket and made cumulative only when rendered.
+
+    """
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._bounds_ns = tuple(int(bound * 1_000_000_000) for bound in self.buckets)
+
+    def observe_ns(self, duration_ns: int, *labels: str):
+        """
+        The observe_ns function records a duration measured with perf_counter_ns.
+
+        :param duration_ns: The observed duration in nanoseconds.
+        :type duration_ns: int
+
+        :param labels: The label values, in the order of labelnames.
+        :type labels: str
+
+        """
+
+        index = bisect_left(self._bounds_ns, duration_ns)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                # one slot per bucket plus +Inf, then the sum in ns
+                series = self._values[labels] = [0] * (len(self._bounds_ns) + 2)
+            series[index] += 1
+            series[-1] += duration_ns
+
+    def observe(self, seconds: float, *labels: str):
+        self.observe_ns(int(seconds * 1_000_000_000), *labels)
+
+    def count(self, *labels: str) -> int:
+        series = self._values.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for labels, series in sorted(self._values.items()):
+            cumulative = 0
+            for bound, observed in zip(self.buckets, series):
+                cumulative += observed
+                le = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            cumulative += series[-2]
+            inf = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} "
+                         f"{_format_value(series[-1] / 1_000_000_000)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds the metrics of the application and renders them for the /metrics endpoint.
+
+    """
+
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        for metric in self._metrics:
+            metric.clear()
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status")))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served."))
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "Database statement latency by operation.", ("operation",)))
+db_queries = registry.register(Counter(
+    "db_queries_total", "Database statements executed by operation.", ("operation",)))
+cache_requests = registry.register(Counter(
+    "cache_requests_total", "Cache lookups by cache and result.", ("cache", "result")))
+
+_OPERATIONS = frozenset(("SELECT", "INSERT", "UPDATE", "DELETE"))
+
+
+def _operation(statement: str) -> str:
+    head = statement.lstrip()[:6].upper()
+    return head if head in _OPERATIONS else "OTHER"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_start_ns = perf_counter_ns()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = perf_counter_ns() - context._metrics_start_ns
+    operation = _operation(statement)
+    db_queries.inc(operation)
+    db_query_duration.observe_ns(elapsed, operation)
+
+
+def instrument_engine(engine: Engine):
+    """
+    The instrument_engine function attaches the query count and duration hooks to an engine.
+
+    :param engine: The engine to instrument.
+    :type engine: Engine
+
+    """
+
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class RoutePaths:
+    """
+    Maps a request to the template of the route it matched, such as ``/api/contacts/{contact_id}``, so per-route
+    series and span names stay bounded. The routes of the app are read once and again when a new endpoint shows up.
+
+    """
+
+    def __init__(self):
+        self._routes: dict = {}
+
+    def __call__(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._routes.get(endpoint)
+        if path is None:
+            self._routes = {getattr(route, "endpoint", None): route.path for route in scope["app"].routes}
+            path = self._routes.get(endpoint, "unmatched")
+        return path
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency per route template and the number of requests in flight.
+    Requests that match no route are grouped under one label to keep the series count bounded.
+
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._route_path = RoutePaths()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        start = perf_counter_ns()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_duration.observe_ns(perf_counter_ns() - start, scope["method"], self._route_path(scope),
+                                             str(status_code))
+            http_requests_in_flight.dec()
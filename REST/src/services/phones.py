@@ -0,0 +1,56 @@
+"""
+Phones module
+_____________
+Normalization of phone numbers to E.164, ``+`` followed by the country code and the subscriber number, at most 15
+digits. Contacts keep the number as it was typed for display, and the normalized form for lookups, so ``+380 50
+123 45 67``, ``0501234567`` and ``00380501234567`` are all found by any of those spellings.
+
+Numbers without an international prefix are read in the country of ``phone_country_code``: a leading trunk ``0`` is
+dropped and the country code prepended, unless the number already starts with the country code and is too long to
+be a national number.
+
+"""
+
+import re
+
+from src.conf.config import settings
+
+_FORMATTING = re.compile(r"[\s().\-/]")
+_DIGITS = re.compile(r"[1-9][0-9]{7,14}")
+_NATIONAL_MIN_LENGTH = 7
+_NATIONAL_MAX_LENGTH = 10
+
+
+def to_e164(number: str | int | None, country_code: str | None = None) -> str | None:
+    """
+    The to_e164 function normalizes a phone number to E.164.
+
+    :param number: The phone number, with or without spaces, dashes, dots and brackets.
+    :type number: str | int | None
+
+    :param country_code: The country code of national numbers, phone_country_code by default.
+    :type country_code: str | None
+
+    :return: The normalized number, or None if it is not a valid phone number.
+    :rtype: str | None
+
+    """
+
+    if number is None:
+        return None
+    country_code = country_code or settings.phone_country_code
+    text = _FORMATTING.sub("", str(number))
+    if text.startswith("+"):
+        digits = text[1:]
+    elif text.startswith("00"):
+        digits = text[2:]
+    elif text.startswith(country_code) and len(text) > _NATIONAL_MAX_LENGTH:
+        digits = text
+    else:
+        national = text[1:] if text.startswith("0") else text
+        if len(national) < _NATIONAL_MIN_LENGTH:
+            return None
+        digits = country_code + national
+    if not _DIGITS.fullmatch(digits):
+        return None
+    return f"+{digits}"
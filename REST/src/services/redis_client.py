@@ -0,0 +1,45 @@
+"""
+Redis client module
+___________________
+Redis clients shared by the services. A client is built on first use and reuses one connection pool per decoding
+mode, so importing the application opens nothing.
+
+"""
+
+from functools import lru_cache
+
+import redis as redis_db
+import redis.asyncio as aioredis
+
+from src.conf.config import settings
+
+
+@lru_cache
+def get_redis(decode_responses: bool = False) -> redis_db.Redis:
+    """
+    The get_redis function returns the synchronous Redis client of the application.
+
+    :param decode_responses: Return str instead of bytes.
+    :type decode_responses: bool
+
+    :return: The shared client.
+    :rtype: redis.Redis
+
+    """
+
+    return redis_db.Redis(host=settings.redis_host, port=settings.redis_port, db=0,
+                          decode_responses=decode_responses)
+
+
+@lru_cache
+def get_async_redis() -> aioredis.Redis:
+    """
+    The get_async_redis function returns the asyncio Redis client of the application, for blocking reads such as
+    pub/sub that must not hold a threadpool worker.
+
+    :return: The shared client, decoding responses to str.
+    :rtype: redis.asyncio.Redis
+
+    """
+
+    return aioredis.Redis(host=settings.redis_host, port=settings.redis_port, db=0, decode_responses=True)
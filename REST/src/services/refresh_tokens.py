@@ -0,0 +1,156 @@
+"""
+Refresh tokens module
+_____________________
+Refresh-token rotation state kept in Redis instead of the user table. Every login starts a token family for one
+device; every refresh consumes the presented token and issues the next one in the same family. Presenting a token
+that was already consumed revokes the whole family.
+
+Keys, all expiring with the refresh token lifetime:
+
+- ``refresh:{jti}`` hash with the email, family and device of one issued token;
+- ``refresh_family:{family}`` set of the token ids issued in a family;
+- ``refresh_sessions:{email}`` hash mapping each device to its active family.
+
+"""
+
+import uuid
+from functools import cached_property
+
+from src.services.redis_client import get_redis
+
+REFRESH_TOKEN_TTL = 7 * 24 * 60 * 60
+DEFAULT_DEVICE = "default"
+
+
+class RefreshTokenStore:
+    @cached_property
+    def redis(self):
+        return get_redis(decode_responses=True)
+
+    def __init__(self, ttl: int = REFRESH_TOKEN_TTL):
+        self.ttl = ttl
+
+    def _add_token(self, pipe, email: str, family: str, device: str) -> dict[str, str]:
+        jti = uuid.uuid4().hex
+        pipe.hset(f"refresh:{jti}", mapping={"email": email, "family": family, "device": device})
+        pipe.expire(f"refresh:{jti}", self.ttl)
+        pipe.sadd(f"refresh_family:{family}", jti)
+        pipe.expire(f"refresh_family:{family}", self.ttl)
+        pipe.hset(f"refresh_sessions:{email}", device, family)
+        pipe.expire(f"refresh_sessions:{email}", self.ttl)
+        return {"jti": jti, "fam": family, "sid": device}
+
+    def issue(self, email: str, device: str | None = None) -> dict[str, str]:
+        """
+        The issue function starts a new token family for a device, replacing the family the device had before.
+
+        :param email: The email of the user logging in.
+        :type email: str
+
+        :param device: The device or client the session belongs to.
+        :type device: str | None
+
+        :return: The claims to put into the refresh token: jti, fam and sid.
+        :rtype: dict[str, str]
+
+        """
+
+        device = device or DEFAULT_DEVICE
+        previous = self.redis.hget(f"refresh_sessions:{email}", device)
+        if previous:
+            self.revoke_family(previous, email, device)
+
+        pipe = self.redis.pipeline()
+        claims = self._add_token(pipe, email, uuid.uuid4().hex, device)
+        pipe.execute()
+        return claims
+
+    def rotate(self, email: str, claims: dict) -> dict[str, str] | None:
+        """
+        The rotate function consumes the presented refresh token and issues the next one of its family.
+        A token that is unknown, expired or already consumed revokes the family and returns None.
+
+        :param email: The subject of the presented token.
+        :type email: str
+
+        :param claims: The decoded claims of the presented token.
+        :type claims: dict
+
+        :return: The claims for the next refresh token, or None if the token must be rejected.
+        :rtype: dict[str, str] | None
+
+        """
+
+        jti, family = claims.get("jti"), claims.get("fam")
+        if not jti or not family:
+            return None
+
+        pipe = self.redis.pipeline()
+        pipe.hgetall(f"refresh:{jti}")
+        pipe.delete(f"refresh:{jti}")
+        record, deleted = pipe.execute()
+
+        if not deleted or record.get("email") != email or record.get("family") != family:
+            self.revoke_family(family, email, claims.get("sid"))
+            return None
+
+        pipe = self.redis.pipeline()
+        pipe.srem(f"refresh_family:{family}", jti)
+        new_claims = self._add_token(pipe, email, family, record["device"])
+        pipe.execute()
+        return new_claims
+
+    def revoke_family(self, family: str, email: str | None = None, device: str | None = None):
+        """
+        The revoke_family function invalidates every token of a family and closes the device session it belongs to.
+
+        :param family: The family to revoke.
+        :type family: str
+
+        :param email: The owner of the family.
+        :type email: str | None
+
+        :param device: The device of the family.
+        :type device: str | None
+
+        """
+
+        jtis = self.redis.smembers(f"refresh_family:{family}")
+        pipe = self.redis.pipeline()
+        for jti in jtis:
+            pipe.delete(f"refresh:{jti}")
+        pipe.delete(f"refresh_family:{family}")
+        pipe.execute()
+
+        if email and device and self.redis.hget(f"refresh_sessions:{email}", device) == family:
+            self.redis.hdel(f"refresh_sessions:{email}", device)
+
+    def sessions(self, email: str) -> dict[str, str]:
+        """
+        The sessions function lists the active sessions of a user.
+
+        :param email: The email of the user.
+        :type email: str
+
+        :return: The active token family of each device.
+        :rtype: dict[str, str]
+
+        """
+
+        return self.redis.hgetall(f"refresh_sessions:{email}")
+
+    def revoke_all(self, email: str):
+        """
+        The revoke_all function revokes every session of a user.
+
+        :param email: The email of the user.
+        :type email: str
+
+        """
+
+        for device, family in self.sessions(email).items():
+            self.revoke_family(family)
+        self.redis.delete(f"refresh_sessions:{email}")
+
+
+refresh_token_store = RefreshTokenStore()
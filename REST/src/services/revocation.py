@@ -0,0 +1,208 @@
+"""
+Revocation module
+_________________
+Revocation of access tokens before they expire, either one token by its ``jti`` or every token of a user issued
+before a point in time. Redis is the source of truth; each worker keeps an in-memory copy that a background task
+brings up to date from a versioned change log, so checking a token never makes a network call.
+
+Keys:
+
+- ``revocation:version`` counter incremented by every revocation;
+- ``revocation:log`` sorted set of changes scored by version, trimmed to the most recent entries;
+- ``revocation:jtis`` sorted set of revoked token ids scored by the token expiry;
+- ``revocation:users`` hash of user email to the "tokens issued before" timestamp.
+
+Entries are dropped once every token they reject has expired: revoked ids after their ``exp``, user entries
+``access_token_expire`` seconds after their timestamp.
+
+"""
+
+import asyncio
+import time
+from functools import cached_property
+
+import redis as redis_db
+from redis import WatchError
+from starlette.concurrency import run_in_threadpool
+
+from src.conf.config import settings
+from src.services.redis_client import get_redis
+
+LOG_SIZE = 10_000
+
+
+class RevocationList:
+    @cached_property
+    def redis(self):
+        return get_redis(decode_responses=True)
+
+    def __init__(self, sync_interval: float, token_lifetime: int = settings.access_token_expire):
+        self.sync_interval = sync_interval
+        self.token_lifetime = token_lifetime
+        self.revoked: dict[str, float] = {}
+        self.not_before: dict[str, int] = {}
+        self.version = 0
+        self._task: asyncio.Task | None = None
+
+    def _append(self, entry: str, apply):
+        pipe = self.redis.pipeline()
+        apply(pipe)
+        pipe.incr("revocation:version")
+        version = pipe.execute()[-1]
+        pipe = self.redis.pipeline()
+        pipe.zadd("revocation:log", {entry: version})
+        pipe.zremrangebyrank("revocation:log", 0, -LOG_SIZE - 1)
+        pipe.execute()
+
+    def revoke_token(self, jti: str, expires_at: float):
+        """
+        The revoke_token function revokes a single access token until it expires.
+
+        :param jti: The id of the token.
+        :type jti: str
+
+        :param expires_at: The exp claim of the token.
+        :type expires_at: float
+
+        """
+
+        self._append(f"jti:{jti}:{int(expires_at)}",
+                     lambda pipe: pipe.zadd("revocation:jtis", {jti: int(expires_at)}))
+        self.revoked[jti] = expires_at
+
+    def revoke_user(self, email: str, issued_before: int | None = None):
+        """
+        The revoke_user function revokes every access token of a user issued before the given second, now by default.
+
+        :param email: The email of the user.
+        :type email: str
+
+        :param issued_before: Tokens with an iat claim lower than this Unix time are rejected.
+        :type issued_before: int | None
+
+        """
+
+        issued_before = int(time.time()) if issued_before is None else issued_before
+        self._append(f"user:{issued_before}:{email}",
+                     lambda pipe: pipe.hset("revocation:users", email, issued_before))
+        self.not_before[email] = max(issued_before, self.not_before.get(email, 0))
+
+    def revoke_claims(self, claims: dict):
+        """
+        The revoke_claims function revokes the access token with the given claims until it expires. Tokens issued
+        before access tokens carried a jti are revoked through their user instead, with every other token of that user
+        issued up to the same second.
+
+        :param claims: The decoded access token.
+        :type claims: dict
+
+        """
+
+        jti = claims.get("jti")
+        if jti is not None:
+            self.revoke_token(jti, claims["exp"])
+        else:
+            self.revoke_user(claims["sub"], int(claims["iat"]) + 1 if "iat" in claims else None)
+
+    def is_revoked(self, payload: dict) -> bool:
+        """
+        The is_revoked function checks the claims of an access token against the in-memory copy only.
+
+        :param payload: The decoded access token.
+        :type payload: dict
+
+        :return: True if the token was revoked.
+        :rtype: bool
+
+        """
+
+        jti = payload.get("jti")
+        if jti is not None and jti in self.revoked:
+            return True
+        not_before = self.not_before.get(payload.get("sub"))
+        return not_before is not None and payload.get("iat", 0) < not_before
+
+    def _apply(self, entry: str):
+        kind, first, rest = entry.split(":", 2)
+        if kind == "jti":
+            self.revoked[first] = float(rest)
+        elif kind == "user":
+            self.not_before[rest] = max(int(first), self.not_before.get(rest, 0))
+
+    def _reload(self, version: int):
+        now = time.time()
+        self.revoked = {jti: expires for jti, expires in
+                        self.redis.zrangebyscore("revocation:jtis", now, "+inf", withscores=True)}
+        self.not_before = {email: int(ts) for email, ts in self.redis.hgetall("revocation:users").items()}
+        self.version = version
+
+    def _prune_users(self, now: float):
+        cutoff = now - self.token_lifetime
+        stale = [email for email, issued_before in self.not_before.items() if issued_before <= cutoff]
+        for email in stale:
+            del self.not_before[email]
+        if not stale:
+            return
+        with self.redis.pipeline() as pipe:
+            try:
+                pipe.watch("revocation:users")
+                # another worker may have revoked one of these users again since the reload
+                expired = [email for email, issued_before in zip(stale, pipe.hmget("revocation:users", stale))
+                           if issued_before is not None and int(issued_before) <= cutoff]
+                if expired:
+                    pipe.multi()
+                    pipe.hdel("revocation:users", *expired)
+                    pipe.execute()
+            except WatchError:
+                pass
+
+    def sync(self):
+        """
+        The sync function brings the in-memory copy up to date. When nothing changed it costs a single GET; otherwise
+        it reads only the log entries after the last seen version, or reloads everything if the log was trimmed past it.
+
+        """
+
+        version = int(self.redis.get("revocation:version") or 0)
+        if version == self.version:
+            return
+        if version < self.version:
+            self._reload(version)
+            return
+
+        entries = self.redis.zrangebyscore("revocation:log", f"({self.version}", version, withscores=True)
+        if not entries or int(entries[0][1]) != self.version + 1:
+            self._reload(version)
+        else:
+            for entry, _ in entries:
+                self._apply(entry)
+            self.version = int(entries[-1][1])
+
+        now = time.time()
+        self.revoked = {jti: expires for jti, expires in self.revoked.items() if expires > now}
+        self.redis.zremrangebyscore("revocation:jtis", "-inf", now)
+        self._prune_users(now)
+
+    async def run(self):
+        while True:
+            try:
+                await run_in_threadpool(self.sync)
+            except redis_db.RedisError:
+                pass
+            await asyncio.sleep(self.sync_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+revocation_list = RevocationList(settings.revocation_sync_interval)
@@ -0,0 +1,55 @@
+"""
+Serialization module
+____________________
+Fast path for list endpoints: response rows are built straight from Core result tuples and encoded with orjson,
+skipping the per-row ``ContactResponse`` validation done by FastAPI's ``response_model``.
+
+"""
+
+from typing import Any, Iterable, Sequence
+
+from fastapi.responses import ORJSONResponse
+
+
+def contact_rows_to_dicts(rows: Iterable[Sequence[Any]]) -> list[dict[str, Any]]:
+    """
+    The contact_rows_to_dicts function turns rows selected with CONTACT_RESPONSE_COLUMNS into plain dictionaries
+    shaped like ContactResponse.
+
+    :param rows: Rows ordered as id, name, surname, email, mobile, date_of_birth.
+    :type rows: Iterable[Sequence[Any]]
+
+    :return: A list of dictionaries ready to be encoded.
+    :rtype: list[dict[str, Any]]
+
+    """
+
+    return [
+        {
+            "id": id_,
+            "name": name,
+            "surname": surname,
+            "email": email,
+            "mobile": None if mobile is None else str(mobile),
+            "date_of_birth": date_of_birth,
+        }
+        for id_, name, surname, email, mobile, date_of_birth in rows
+    ]
+
+
+def contacts_json_response(rows: Iterable[Sequence[Any]], status_code: int = 200) -> ORJSONResponse:
+    """
+    The contacts_json_response function encodes contact rows with orjson into a ready-made response.
+
+    :param rows: Rows ordered as id, name, surname, email, mobile, date_of_birth.
+    :type rows: Iterable[Sequence[Any]]
+
+    :param status_code: The status code of the response.
+    :type status_code: int
+
+    :return: The encoded response.
+    :rtype: ORJSONResponse
+
+    """
+
+    return ORJSONResponse(contact_rows_to_dicts(rows), status_code=status_code)
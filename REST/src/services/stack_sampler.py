@@ -0,0 +1,167 @@
+"""
+Stack sampler module
+____________________
+On-demand profiling of a running worker. For a bounded number of seconds a background thread reads the Python stack
+of every thread of the process at a fixed interval, ``profiler_interval`` seconds, and counts identical stacks.
+Nothing is installed in the worker beforehand and nothing runs between profiles.
+
+The result is in the collapsed stack format, one ``thread;outer;...;inner count`` line per distinct stack, which
+flamegraph.pl, speedscope and most flame graph viewers read as it is. The stacks of the event loop thread are rooted
+at ``event-loop``: a blocking call made on the loop, such as a synchronous database or Redis round trip, shows as the
+loop's stack sitting in that call. Threads waiting for work, the loop included when it is idle in its selector, are
+left out unless asked for.
+
+A thread samples rather than a ``SIGPROF`` timer because signal handlers only run on the main thread, between
+bytecodes, so they would miss the threadpool and report a loop blocked in C code late.
+
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import CodeType, FrameType
+
+from src.conf.config import settings
+
+EVENT_LOOP = "event-loop"
+_MAX_DEPTH = 128
+_IDLE_LEAVES = frozenset((
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+))
+
+
+class StackProfile:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self.loop_busy = 0
+        self.duration = 0.0
+
+    @property
+    def loop_busy_ratio(self) -> float:
+        return self.loop_busy / self.samples if self.samples else 0.0
+
+    def collapsed(self) -> str:
+        """
+        The collapsed function renders the profile in the collapsed stack format, the most frequent stacks first.
+
+        :return: One line per distinct stack, the frames from the outermost separated by semicolons, then the number
+            of samples.
+        :rtype: str
+
+        """
+
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _short_path(filename: str) -> str:
+    for root in sorted((path for path in sys.path if path), key=len, reverse=True):
+        if filename.startswith(root + os.sep):
+            return filename[len(root) + 1:]
+    return filename
+
+
+class StackSampler:
+    def __init__(self, interval: float, max_depth: int = _MAX_DEPTH):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._labels: dict[CodeType, str] = {}
+        self._lock = threading.Lock()
+
+    def _label(self, code: CodeType) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            name = getattr(code, "co_qualname", code.co_name)
+            label = f"{name} ({_short_path(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+            self._labels[code] = label
+        return label
+
+    def _stack(self, frame: FrameType) -> tuple[list[str], bool]:
+        codes = []
+        while frame is not None and len(codes) < self.max_depth:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        waiting = (os.path.basename(codes[0].co_filename), codes[0].co_name) in _IDLE_LEAVES
+        return [self._label(code) for code in reversed(codes)], waiting
+
+    def sample(self, profile: StackProfile, loop_thread: int | None, idle: bool = False):
+        """
+        The sample function adds the current stack of every other thread to a profile.
+
+        :param profile: The profile to fill.
+        :type profile: StackProfile
+
+        :param loop_thread: The id of the thread running the event loop.
+        :type loop_thread: int | None
+
+        :param idle: Whether the stacks of threads waiting for work are kept.
+        :type idle: bool
+
+        """
+
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+        profile.samples += 1
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack, waiting = self._stack(frame)
+            if ident == loop_thread:
+                thread = EVENT_LOOP
+                if not waiting:
+                    profile.loop_busy += 1
+            else:
+                thread = names.get(ident, f"thread-{ident}").replace(";", ":")
+            if not waiting or idle:
+                profile.stacks[";".join((thread, *stack))] += 1
+
+    def _run(self, profile: StackProfile, loop_thread: int, idle: bool, stop: threading.Event):
+        next_sample = time.perf_counter()
+        while not stop.wait(max(0.0, next_sample - time.perf_counter())):
+            self.sample(profile, loop_thread, idle)
+            next_sample = max(next_sample + self.interval, time.perf_counter())
+
+    async def profile(self, seconds: float, idle: bool = False) -> StackProfile | None:
+        """
+        The profile function samples the stacks of the worker for a number of seconds. The event loop keeps serving
+        requests meanwhile, so the profile shows the worker under its real load.
+
+        :param seconds: How long to sample.
+        :type seconds: float
+
+        :param idle: Whether the stacks of threads waiting for work are kept.
+        :type idle: bool
+
+        :return: The profile, or None if another profile is running in this worker.
+        :rtype: StackProfile | None
+
+        """
+
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            profile = StackProfile(self.interval)
+            stop = threading.Event()
+            sampler = threading.Thread(target=self._run, args=(profile, threading.get_ident(), idle, stop),
+                                       name="stack-sampler", daemon=True)
+            started = time.perf_counter()
+            sampler.start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                stop.set()
+                await asyncio.to_thread(sampler.join)
+                profile.duration = time.perf_counter() - started
+            return profile
+        finally:
+            self._lock.release()
+
+
+stack_sampler = StackSampler(settings.profiler_interval)
@@ -0,0 +1,420 @@
+"""
+Tracing module
+______________
+Spans showing where the time of a request goes: the route, repository calls, SQL statements, the user cache in
+Redis, password hashing, mail and avatar uploads. Spans nest through a context variable, so they follow the request
+across awaits, background tasks and the threadpool.
+
+A request joins the trace of its caller from the W3C ``traceparent`` header, and ``traceparent_header`` gives the
+header for calls made to other services. Finished spans are queued and exported by a background thread to the
+backend named by ``tracing_exporter``: ``file`` writes JSON lines to ``tracing_file``, ``memory`` keeps them in a
+list for tests, and ``package.module:factory`` plugs in any other exporter. Without an exporter, tracing is disabled
+and a traced call costs one attribute check.
+
+"""
+
+import functools
+import importlib
+import inspect
+import json
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+from contextvars import ContextVar
+from types import ModuleType
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import Headers
+
+from src.conf.config import settings
+from src.services.metrics import RoutePaths
+
+_TRACEPARENT = re.compile(r"00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})")
+_INVALID_TRACE_ID = "0" * 32
+_INVALID_SPAN_ID = "0" * 16
+_BATCH_SIZE = 512
+
+
+class Span:
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: str | None, attributes: dict):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = "ok"
+        self.error: str | None = None
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+        self._started = time.perf_counter_ns()
+        self._token = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"
+
+    def end(self):
+        self.end_ns = self.start_ns + time.perf_counter_ns() - self._started
+        self.tracer.export(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1_000_000,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.record_error(exc)
+        self.end()
+
+
+class _NoopSpan:
+    def set_attribute(self, key: str, value):
+        pass
+
+    def record_error(self, error: BaseException):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+def parse_traceparent(value: str | None) -> tuple[str, str, bool] | None:
+    """
+    The parse_traceparent function reads a W3C traceparent header.
+
+    :param value: The header value.
+    :type value: str | None
+
+    :return: The trace id, the id of the parent span and whether the caller sampled the trace, or None if the header
+        is missing or malformed.
+    :rtype: tuple[str, str, bool] | None
+
+    """
+
+    match = _TRACEPARENT.fullmatch(value.strip().lower()) if value else None
+    if match is None:
+        return None
+    trace_id, parent_id, flags = match.groups()
+    if trace_id == _INVALID_TRACE_ID or parent_id == _INVALID_SPAN_ID:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+def traceparent_header() -> str | None:
+    """
+    The traceparent_header function returns the traceparent header to send with an outgoing call, so the service
+    called continues the current trace.
+
+    :return: The header value, or None outside a span.
+    :rtype: str | None
+
+    """
+
+    span = _current_span.get()
+    if span is None:
+        return None
+    return f"00-{span.trace_id}-{span.span_id}-01"
+
+
+class InMemoryExporter:
+    def __init__(self):
+        self.spans: list[dict] = []
+
+    def export(self, spans: list[Span]):
+        self.spans.extend(span.to_dict() for span in spans)
+
+
+class FileExporter:
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: list[Span]):
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.writelines(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+
+
+def build_exporter(name: str):
+    """
+    The build_exporter function creates the exporter named in the settings.
+
+    :param name: ``file``, ``memory``, ``package.module:factory``, or an empty string to disable tracing.
+    :type name: str
+
+    :return: The exporter, or None.
+
+    """
+
+    if not name:
+        return None
+    if name == "file":
+        return FileExporter(settings.tracing_file)
+    if name == "memory":
+        return InMemoryExporter()
+    module_name, _, attribute = name.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)()
+
+
+class Tracer:
+    def __init__(self, exporter=None, sample_rate: float = 1.0, queue_size: int = 2048):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.dropped = 0
+        self._queue: queue.Queue[Span] = queue.Queue(queue_size)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def configure(self, exporter, sample_rate: float = 1.0):
+        self.flush()
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    def span(self, name: str, **attributes) -> Span | _NoopSpan:
+        """
+        The span function returns a span to use as a context manager, a child of the current span. Outside a trace
+        it does nothing, so library code is only traced inside requests and jobs that start a trace.
+
+        :param name: The name of the operation.
+        :type name: str
+
+        :param attributes: Details of the operation.
+        :type attributes: dict
+
+        :return: The span.
+        :rtype: Span | _NoopSpan
+
+        """
+
+        parent = _current_span.get()
+        if parent is None or not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, parent.trace_id, parent.span_id, attributes)
+
+    def start_trace(self, name: str, traceparent: str | None = None, **attributes) -> Span | _NoopSpan:
+        """
+        The start_trace function returns the root span of a unit of work, continuing the trace of the caller when a
+        traceparent header is given. A trace the caller sampled is always recorded, a new one with sample_rate.
+
+        :param name: The name of the operation.
+        :type name: str
+
+        :param traceparent: The traceparent header of the request.
+        :type traceparent: str | None
+
+        :param attributes: Details of the operation.
+        :type attributes: dict
+
+        :return: The span.
+        :rtype: Span | _NoopSpan
+
+        """
+
+        if not self.enabled:
+            return NOOP_SPAN
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id, sampled = secrets.token_hex(16), None, random.random() < self.sample_rate
+        if not sampled:
+            return NOOP_SPAN
+        return Span(self, name, trace_id, parent_id, attributes)
+
+    def export(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < _BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                if self.exporter is not None:
+                    self.exporter.export(batch)
+            except Exception:
+                self.dropped += len(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        """
+        The flush function waits until the finished spans are exported.
+
+        """
+
+        if self._thread is not None:
+            self._queue.join()
+
+
+tracer = Tracer(build_exporter(settings.tracing_exporter), settings.tracing_sample_rate)
+
+
+def traced(name: str | None = None):
+    """
+    The traced function decorates a function or coroutine function to run in a span named after it.
+
+    :param name: The name of the span, the module and name of the function by default.
+    :type name: str | None
+
+    :return: The decorator.
+
+    """
+
+    def decorator(func):
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not tracer.enabled:
+                    return await func(*args, **kwargs)
+                with tracer.span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def trace_module(module: ModuleType):
+    """
+    The trace_module function traces every public function defined in a module. Calls between the functions of the
+    module go through the module globals, so they are traced as nested spans too.
+
+    :param module: The module, usually the caller's own ``sys.modules[__name__]``.
+    :type module: ModuleType
+
+    """
+
+    for attribute, value in list(vars(module).items()):
+        if (not attribute.startswith("_") and inspect.isfunction(value)
+                and value.__module__ == module.__name__):
+            setattr(module, attribute, traced()(value))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    span = tracer.span("db.query", statement=statement.split(None, 1)[0].upper() if statement else "")
+    if span is not NOOP_SPAN:
+        span.__enter__()
+        context._trace_span = span
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    span = getattr(context, "_trace_span", None)
+    if span is not None:
+        context._trace_span = None
+        span.__exit__(None, None, None)
+
+
+def _handle_error(exception_context):
+    span = getattr(exception_context.execution_context, "_trace_span", None)
+    if span is not None:
+        exception_context.execution_context._trace_span = None
+        error = exception_context.original_exception
+        span.__exit__(type(error), error, None)
+
+
+def instrument_engine(engine: Engine):
+    """
+    The instrument_engine function records a span for every SQL statement run by an engine inside a trace.
+
+    :param engine: The engine to instrument.
+    :type engine: Engine
+
+    """
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware running every request in a root span named after its method and route template.
+
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._route_path = RoutePaths()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+        span = tracer.start_trace(scope["method"], Headers(scope=scope).get("traceparent"))
+        if span is NOOP_SPAN:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    span.status = "error"
+            await send(message)
+
+        with span:
+            span.set_attribute("http.method", scope["method"])
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = self._route_path(scope)
+                span.name = f"{scope['method']} {route}"
+                span.set_attribute("http.route", route)
@@ -3,14 +3,24 @@ import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+import fakeredis
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from main import app
-from src.database.model import Base
+from src.database.model import Base, User
 from src.database.connect import get_db
+from src.database.profiler import count_queries
+from src.services.auth import auth_service
+from src.services.change_feed import change_feed
+from src.services.idempotency import idempotency_store
+from src.services.refresh_tokens import refresh_token_store
+from src.services.revocation import revocation_list
 
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -48,6 +58,18 @@ def client(session):
     yield TestClient(app)
 
 
+@pytest.fixture(autouse=True, scope="session")
+def fake_redis():
+    server = fakeredis.FakeServer()
+    stores = refresh_token_store, revocation_list, change_feed, idempotency_store
+    originals = [store.redis for store in stores]
+    for store in stores:
+        store.redis = fakeredis.FakeRedis(server=server, decode_responses=True)
+    yield server
+    for store, original in zip(stores, originals):
+        store.redis = original
+
+
 @pytest.fixture(scope="module")
 def user():
     return {
@@ -55,3 +77,52 @@ def user():
         "email": "test2@example.com",
         "password": "123456789"
     }
+
+
+@pytest.fixture(scope="module")
+def headers(client, user, session):
+    with patch("src.routes.auth.send_email", MagicMock()):
+        client.post("/api/auth/signup", json=user)
+
+    current_user: User = session.query(User).filter(User.email == user.get('email')).first()
+    current_user.confirmed = True
+    session.commit()
+
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get('email'), "password": user.get('password')},
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture()
+def redis_cache():
+    """
+    Bypasses the user cache: the current user is read from the database on every request.
+
+    """
+
+    with patch.object(auth_service, 'redis') as r_mock:
+        r_mock.get.return_value = None
+        yield r_mock
+
+
+@pytest.fixture()
+def query_budget():
+    """
+    Asserts how many SQL statements a block may issue against the test database:
+
+        with query_budget(3):
+            client.post("/api/auth/signup", json=user)
+
+    """
+
+    @contextmanager
+    def budget(max_queries: int):
+        with count_queries(engine) as profile:
+            yield profile
+        assert profile.count <= max_queries, (
+            f"{profile.count} statements issued, budget is {max_queries}: {list(profile.statements.elements())}"
+        )
+
+    return budget
@@ -0,0 +1,116 @@
+import os
+from datetime import date
+
+import pytest
+from sqlalchemy import Column, ForeignKey, Integer, MetaData, String, Table, create_engine, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+
+from src.database import partitioning
+from src.database.model import Base
+
+POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+requires_postgres = pytest.mark.skipif(not POSTGRES_URL, reason="set TEST_POSTGRES_URL to an empty PostgreSQL database")
+
+
+def contacts_table(partitions):
+    args = partitioning.contacts_table_args(partitions)
+    constraints = [arg for arg in args if not isinstance(arg, dict)]
+    options = args[-1] if isinstance(args[-1], dict) else {}
+    metadata = MetaData()
+    Table("user", metadata, Column("id", Integer, primary_key=True))
+    return Table(
+        "contacts", metadata,
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("email", String(100)),
+        Column("user_id", ForeignKey("user.id"), primary_key=bool(partitions), autoincrement=False),
+        Column("updated_at", Integer),
+        Column("phone", String(16)),
+        *constraints, **options,
+    )
+
+
+def test_plain_table_args():
+    ddl = str(CreateTable(contacts_table(0)).compile(dialect=postgresql.dialect()))
+
+    assert "PARTITION BY" not in ddl
+    assert "PRIMARY KEY (id)" in ddl
+
+
+def test_partitioned_table_args():
+    ddl = str(CreateTable(contacts_table(4)).compile(dialect=postgresql.dialect()))
+
+    assert "PARTITION BY HASH (user_id)" in ddl
+    assert "PRIMARY KEY (id, user_id)" in ddl
+    assert "UNIQUE (user_id, email)" in ddl
+
+
+def test_hash_partitions_ddl():
+    assert partitioning.hash_partitions_ddl("contacts", 2) == [
+        "CREATE TABLE contacts_p0 PARTITION OF contacts FOR VALUES WITH (MODULUS 2, REMAINDER 0)",
+        "CREATE TABLE contacts_p1 PARTITION OF contacts FOR VALUES WITH (MODULUS 2, REMAINDER 1)",
+    ]
+
+
+def test_swap_renames_every_partition():
+    statements = partitioning.swap_ddl(3)
+
+    assert statements[0] == "LOCK TABLE contacts IN ACCESS EXCLUSIVE MODE"
+    assert "DROP TRIGGER IF EXISTS contacts_mirror ON contacts" in statements
+    assert f"DROP TABLE IF EXISTS {partitioning.SHADOW}" not in statements
+    assert [s for s in statements if s.startswith(f"ALTER TABLE {partitioning.SHADOW}_p")] == [
+        f"ALTER TABLE {partitioning.SHADOW}_p{remainder} RENAME TO contacts_p{remainder}" for remainder in range(3)
+    ]
+
+
+@pytest.fixture()
+def pg_engine():
+    engine = create_engine(POSTGRES_URL)
+    Base.metadata.drop_all(engine)
+    with engine.begin() as connection:
+        for statement in partitioning.drop_shadow_ddl():
+            connection.execute(text(statement))
+        connection.execute(text(f"DROP TABLE IF EXISTS {partitioning.OLD}"))
+    Base.metadata.create_all(engine)
+    yield engine
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {partitioning.OLD}"))
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@requires_postgres
+def test_online_migration_and_pruning(pg_engine):
+    def insert(connection, contact_id, user_id):
+        connection.execute(text(
+            "INSERT INTO contacts (id, name, surname, email, date_of_birth, user_id, updated_at) "
+            "VALUES (:id, 'Name', 'Surname', :email, :born, :user_id, now())"
+        ), {"id": contact_id, "email": f"c{contact_id}@example.com", "born": date(1990, 1, 1), "user_id": user_id})
+
+    with pg_engine.begin() as connection:
+        for user_id in range(1, 5):
+            connection.execute(text('INSERT INTO "user" (id, password) VALUES (:id, \'x\')'), {"id": user_id})
+        for contact_id in range(1, 11):
+            insert(connection, contact_id, contact_id % 4 + 1)
+        for statement in partitioning.shadow_table_ddl(4):
+            connection.execute(text(statement))
+        for statement in partitioning.shadow_indexes_ddl(partitioning.PHONE_INDEXES):
+            connection.execute(text(statement))
+
+    with pg_engine.begin() as connection:
+        insert(connection, 11, 1)
+        connection.execute(text("UPDATE contacts SET name = 'Renamed' WHERE id IN (2, 11)"))
+        connection.execute(text("DELETE FROM contacts WHERE id = 3"))
+
+    assert partitioning.copy(pg_engine, batch_size=3) == 8
+    partitioning.swap(pg_engine)
+
+    with pg_engine.connect() as connection:
+        rows = connection.execute(text("SELECT id, name FROM contacts ORDER BY id")).all()
+        assert [row.id for row in rows] == [1, 2, 4, 5, 6, 7, 8, 9, 10, 11]
+        assert {row.id for row in rows if row.name == "Renamed"} == {2, 11}
+
+        scanned = partitioning.scanned_tables(connection, "SELECT * FROM contacts WHERE user_id = :user_id",
+                                              {"user_id": 3})
+        assert len(scanned) == 1 and scanned.pop().startswith("contacts_p")
+        assert len(partitioning.scanned_tables(connection, "SELECT * FROM contacts")) == 4
@@ -0,0 +1,98 @@
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from src.database.model import User
+from src.database.profiler import QueryProfile, QueryProfilerMiddleware, instrument_engine, profile_queries
+
+
+@pytest.fixture(scope="module")
+def profiled_client():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    instrument_engine(engine)
+    app = FastAPI()
+    app.add_middleware(QueryProfilerMiddleware)
+
+    @app.get("/repeated")
+    async def repeated():
+        with engine.connect() as connection:
+            for _ in range(3):
+                connection.execute(text("SELECT 1"))
+        return {}
+
+    @app.get("/threaded")
+    def threaded():
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            connection.execute(text("SELECT 2"))
+        return {}
+
+    return TestClient(app)
+
+
+def test_profile_reports_duplicates():
+    profile = QueryProfile()
+    profile.record("SELECT a", 1_000_000)
+    profile.record("SELECT a", 2_000_000)
+    profile.record("SELECT b", 500_000)
+
+    assert profile.count == 3
+    assert profile.total_ms == 3.5
+    assert profile.duplicates == {"SELECT a": 2}
+    assert profile.duplicate_count == 1
+
+
+def test_statements_outside_a_profile_are_ignored():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        with profile_queries() as profile:
+            connection.execute(text("SELECT 2"))
+
+    assert profile.count == 1
+
+
+def test_middleware_headers(profiled_client):
+    response = profiled_client.get("/repeated")
+
+    assert response.headers["x-db-query-count"] == "3"
+    assert response.headers["x-db-duplicate-queries"] == "2"
+    assert float(response.headers["x-db-time-ms"]) > 0
+
+
+def test_middleware_follows_sync_endpoints_into_the_threadpool(profiled_client):
+    response = profiled_client.get("/threaded")
+
+    assert response.headers["x-db-query-count"] == "2"
+    assert response.headers["x-db-duplicate-queries"] == "0"
+
+
+class TestRouteBudgets:
+    user = {"username": "budget_user", "email": "budget@example.com", "password": "123456789"}
+
+    def test_signup(self, client, query_budget, monkeypatch):
+        monkeypatch.setattr("src.routes.auth.send_email", MagicMock())
+
+        with query_budget(1):
+            response = client.post("/api/auth/signup", json=self.user)
+
+        assert response.status_code == 201, response.text
+
+    def test_login(self, client, session, query_budget):
+        current_user: User = session.query(User).filter(User.email == self.user["email"]).first()
+        current_user.confirmed = True
+        session.commit()
+
+        with query_budget(1):
+            response = client.post(
+                "/api/auth/login",
+                data={"username": self.user["email"], "password": self.user["password"]},
+            )
+
+        assert response.status_code == 200, response.text
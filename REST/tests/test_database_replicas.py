@@ -0,0 +1,168 @@
+import asyncio
+import time
+
+import fakeredis
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from src.database import replicas
+from src.database.connect import get_db
+from src.database.replicas import (
+    LEAST_CONNECTIONS, ReadYourWritesMiddleware, ReplicaRouter, check_topology, get_read_db, read_your_writes_key
+)
+from src.services.auth import auth_service
+
+
+def make_router(urls=("sqlite://", "sqlite://"), **kwargs) -> ReplicaRouter:
+    router = ReplicaRouter(list(urls), **kwargs)
+    router.redis = fakeredis.FakeRedis(decode_responses=True)
+    return router
+
+
+def test_round_robin_alternates():
+    router = make_router()
+
+    binds = [router.session().bind for _ in range(4)]
+
+    assert binds == [router.replicas[0], router.replicas[1], router.replicas[0], router.replicas[1]]
+
+
+def test_least_connections_prefers_the_idle_replica():
+    router = make_router(strategy=LEAST_CONNECTIONS)
+
+    first = router.session()
+    second = router.session()
+    router.release(first)
+
+    assert first.bind is not second.bind
+    assert router.session().bind is first.bind
+
+
+def test_failed_connection_takes_the_replica_out():
+    router = make_router(urls=("sqlite:////nonexistent/replica.db", "sqlite://"), retry_interval=60)
+    failing = router.replicas[0]
+
+    with pytest.raises(OperationalError):
+        with failing.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    assert router.healthy() == [router.replicas[1]]
+    assert all(router.session().bind is router.replicas[1] for _ in range(3))
+
+
+def test_read_is_retried_on_the_primary():
+    primary = create_engine("sqlite://", poolclass=StaticPool)
+    with primary.begin() as connection:
+        connection.execute(text("CREATE TABLE origin (name TEXT)"))
+        connection.execute(text("INSERT INTO origin VALUES ('primary')"))
+    router = make_router(urls=("sqlite:////nonexistent/replica.db",), retry_interval=60)
+    failing = router.replicas[0]
+
+    session = router.session(primary=primary)
+    names = [session.execute(text("SELECT name FROM origin")).scalar() for _ in range(2)]
+    router.release(session)
+
+    assert names == ["primary", "primary"]
+    assert router.is_down(failing)
+    assert router.in_use[failing] == 0
+
+
+def test_read_fails_without_a_primary():
+    router = make_router(urls=("sqlite:////nonexistent/replica.db",))
+    session = router.session()
+
+    with pytest.raises(OperationalError):
+        session.execute(text("SELECT 1"))
+    router.release(session)
+
+
+def test_replicas_are_not_combined_with_shards():
+    check_topology(["sqlite://"], {})
+    check_topology([], {"a": "sqlite://"})
+
+    with pytest.raises(ValueError):
+        check_topology(["sqlite://"], {"a": "sqlite://"})
+
+
+def test_falls_back_to_the_primary_when_every_replica_is_down():
+    router = make_router(retry_interval=60)
+    for replica in router.replicas:
+        router.mark_down(replica)
+
+    assert router.session() is None
+
+    router.down_until = {replica: time.monotonic() - 1 for replica in router.replicas}
+    assert router.session() is not None
+
+
+def test_recent_writer_reads_from_the_primary():
+    router = make_router()
+    router.record_write("test@example.com")
+
+    assert router.session("test@example.com") is None
+    assert router.session("other@example.com") is not None
+
+
+def test_read_your_writes_key():
+    token = asyncio.run(auth_service.create_access_token(data={"sub": "test@example.com"}))
+
+    assert read_your_writes_key({"authorization": f"Bearer {token}"}) == "test@example.com"
+    assert read_your_writes_key({"authorization": "Bearer not-a-token"}) is None
+    assert read_your_writes_key({}) is None
+
+
+@pytest.fixture()
+def replica_app(monkeypatch):
+    primary = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    with primary.begin() as connection:
+        connection.execute(text("CREATE TABLE origin (name TEXT)"))
+        connection.execute(text("INSERT INTO origin VALUES ('primary')"))
+
+    router = make_router(urls=["sqlite://"], poolclass=StaticPool, connect_args={"check_same_thread": False})
+    with router.replicas[0].begin() as connection:
+        connection.execute(text("CREATE TABLE origin (name TEXT)"))
+        connection.execute(text("INSERT INTO origin VALUES ('replica')"))
+    monkeypatch.setattr(replicas, "replica_router", router)
+
+    app = FastAPI()
+    app.add_middleware(ReadYourWritesMiddleware, router=router)
+
+    def override_get_db():
+        db = Session(bind=primary)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+
+    @app.get("/origin")
+    def origin(db: Session = Depends(get_read_db)):
+        return db.execute(text("SELECT name FROM origin")).scalar()
+
+    @app.post("/write")
+    def write(db: Session = Depends(get_db)):
+        db.execute(text("INSERT INTO origin VALUES ('written')"))
+        db.commit()
+
+    return TestClient(app)
+
+
+def test_read_your_writes_after_a_commit(replica_app):
+    token = asyncio.run(auth_service.create_access_token(data={"sub": "reader@example.com"}))
+    headers = {"Authorization": f"Bearer {token}"}
+
+    before = replica_app.get("/origin", headers=headers)
+    replica_app.post("/write", headers=headers)
+    after = replica_app.get("/origin", headers=headers)
+    anonymous = replica_app.get("/origin")
+
+    assert before.json() == "replica"
+    assert after.json() == "primary"
+    assert anonymous.json() == "replica"
+
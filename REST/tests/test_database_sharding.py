@@ -0,0 +1,93 @@
+import unittest
+from collections import Counter
+from datetime import date
+
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.database.model import Base, Contact, User
+from src.database.sharding import HashRing, ShardRouter, ShardSession, select_shard
+from src.repository import contacts as repository_contacts
+from src.repository import users as repository_users
+from src.schemas import ContactModel, UserModel
+
+KEYS = [f"user{index}@example.com" for index in range(3000)]
+
+
+class TestHashRing(unittest.TestCase):
+    def test_keys_are_spread(self):
+        ring = HashRing(["a", "b", "c"])
+
+        counts = Counter(ring.node_for(key) for key in KEYS)
+
+        self.assertEqual(set(counts), {"a", "b", "c"})
+        for count in counts.values():
+            self.assertGreater(count, len(KEYS) * 0.2)
+
+    def test_adding_a_node_moves_only_its_share(self):
+        before = HashRing(["a", "b", "c"])
+        after = HashRing(["a", "b", "c", "d"])
+
+        moved = [key for key in KEYS if before.node_for(key) != after.node_for(key)]
+
+        self.assertTrue(all(after.node_for(key) == "d" for key in moved))
+        self.assertLess(len(moved), len(KEYS) * 0.35)
+
+    def test_empty_ring(self):
+        with self.assertRaises(ValueError):
+            HashRing([])
+
+
+class TestShardSession(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.router = ShardRouter({"a": "sqlite://", "b": "sqlite://"}, poolclass=StaticPool,
+                                  connect_args={"check_same_thread": False})
+        for engine in self.router.engines.values():
+            Base.metadata.create_all(engine)
+        self.SessionLocal = sessionmaker(class_=ShardSession, router=self.router, autoflush=False)
+        self.emails = {self.router.shard_for(email): email for email in KEYS[:20]}
+
+    def tearDown(self):
+        for engine in self.router.engines.values():
+            engine.dispose()
+
+    def rows(self, shard, model):
+        with sessionmaker(bind=self.router.engines[shard])() as db:
+            return db.query(model).all()
+
+    async def test_user_and_contacts_are_co_located(self):
+        for shard, email in self.emails.items():
+            with self.SessionLocal() as db:
+                user = await repository_users.create_user(
+                    UserModel(username="username", email=email, password="password"), db)
+                await repository_contacts.create_contact(
+                    ContactModel(name="Contact", surname="Surname", email=f"contact.{email}", mobile="501234567",
+                                 date_of_birth=date(1990, 1, 1)), user, db)
+
+        for shard, email in self.emails.items():
+            self.assertEqual([user.email for user in self.rows(shard, User)], [email])
+            self.assertEqual([contact.email for contact in self.rows(shard, Contact)], [f"contact.{email}"])
+            self.assertEqual(self.rows(shard, User)[0].contacts_count, 1)
+
+            with self.SessionLocal() as db:
+                user = await repository_users.get_user_by_email(email, db)
+                self.assertEqual(db.shard, shard)
+                self.assertEqual(len(await repository_contacts.get_contacts(0, 10, user, db)), 1)
+
+    def test_unselected_session_refuses_queries(self):
+        with self.SessionLocal() as db:
+            with self.assertRaises(RuntimeError):
+                db.query(User).all()
+
+    def test_no_shard_switch_inside_a_transaction(self):
+        first, second = self.emails["a"], self.emails["b"]
+        with self.SessionLocal() as db:
+            select_shard(db, first)
+            db.query(User).all()
+
+            with self.assertRaises(RuntimeError):
+                select_shard(db, second)
+
+            db.commit()
+            select_shard(db, second)
+            self.assertEqual(db.shard, "b")
@@ -1,11 +1,26 @@
+import os
+import subprocess
+import sys
+
 from fastapi.testclient import TestClient
 
 import main
 
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
 client = TestClient(main.app)
 
 
 def test_root():
     response = client.get("/")
     assert response.status_code == 200
-    assert response.json() == {"message": "REST APP v1.2"}
\ No newline at end of file
+    assert response.json() == {"message": "REST APP v1.2"}
+
+
+def test_import_defers_heavy_modules():
+    deferred = ("cloudinary", "fastapi_mail", "passlib.context", "uvicorn")
+    code = f"import sys, main; print(','.join(name for name in {deferred!r} if name in sys.modules))"
+
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == ""
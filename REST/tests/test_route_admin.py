@@ -0,0 +1,52 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi import status
+
+from src.conf.config import settings
+from src.conf.messages import ADMIN_REQUIRED, PROFILER_BUSY
+from src.services.stack_sampler import stack_sampler
+
+
+pytestmark = pytest.mark.usefixtures("redis_cache")
+
+
+@pytest.fixture()
+def admin(monkeypatch, user):
+    monkeypatch.setattr(settings, "admin_emails", [user["email"].upper()])
+
+
+class TestProfileWorker:
+    def test_requires_login(self, client):
+        response = client.get("/api/admin/profile", params={"seconds": 0.05})
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED, response.text
+
+    def test_requires_admin(self, client, headers):
+        response = client.get("/api/admin/profile", params={"seconds": 0.05}, headers=headers)
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN, response.text
+        assert response.json()["detail"] == ADMIN_REQUIRED
+
+    def test_profile(self, client, headers, admin):
+        response = client.get("/api/admin/profile", params={"seconds": 0.1, "idle": True}, headers=headers)
+
+        assert response.status_code == status.HTTP_200_OK, response.text
+        assert response.headers["content-type"].startswith("text/plain")
+        assert int(response.headers["X-Profile-Samples"]) > 0
+        assert float(response.headers["X-Profile-Seconds"]) >= 0.1
+        assert 0 <= float(response.headers["X-Event-Loop-Busy"]) <= 1
+        assert any(line.startswith("event-loop;") for line in response.text.splitlines()), response.text
+
+    @pytest.mark.parametrize("seconds", [0, -1, settings.profiler_max_seconds + 1])
+    def test_duration_is_bounded(self, client, headers, admin, seconds):
+        response = client.get("/api/admin/profile", params={"seconds": seconds}, headers=headers)
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY, response.text
+
+    def test_one_profile_per_worker(self, client, headers, admin):
+        with patch.object(stack_sampler, "profile", return_value=None):
+            response = client.get("/api/admin/profile", params={"seconds": 0.05}, headers=headers)
+
+        assert response.status_code == status.HTTP_409_CONFLICT, response.text
+        assert response.json()["detail"] == PROFILER_BUSY
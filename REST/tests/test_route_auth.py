@@ -1,10 +1,12 @@
 import pytest
 import asyncio
+from datetime import datetime, timedelta
 from unittest import mock
 from unittest.mock import MagicMock, patch, Mock
 from fastapi.testclient import TestClient
 from fastapi import HTTPException, status
 from fastapi.responses import JSONResponse
+from jose import jwt
 
 from src.database.model import User
 from src.routes.auth import signup
@@ -13,7 +15,8 @@ from src.services.auth import auth_service
 
 from src.conf.messages import (
     INVALID_PASSWORD, INVALID_EMAIL, EMAIL_NOT_CONFIRMED, USER_EXISTS, EMAIL_CONFIRMED,
-    INVALID_REFRESH_TOKEN, NOT_FOUND, USER_CONFIRMATION, INVALID_TOKEN, ALREADY_CONFIRMED_EMAIL
+    INVALID_REFRESH_TOKEN, NOT_FOUND, USER_CONFIRMATION, INVALID_TOKEN, ALREADY_CONFIRMED_EMAIL, LOGGED_OUT,
+    LOGGED_OUT_ALL
 )
 
 
@@ -33,7 +36,10 @@ class TestSignupUser:
         assert "id" in data["user"]
         assert data['detail'] == USER_CONFIRMATION
 
-    def test_exception(self, client, user):
+    def test_exception(self, client, user, monkeypatch):
+        mock_send_email = MagicMock()
+        monkeypatch.setattr("src.routes.auth.send_email", mock_send_email)
+
         response = client.post(
             "/api/auth/signup",
             json=user,
@@ -41,6 +47,7 @@ class TestSignupUser:
 
         assert response.status_code == status.HTTP_409_CONFLICT, response.text
         assert response.json()["detail"] == USER_EXISTS
+        mock_send_email.assert_not_called()
 
 
 class TestLogin:
@@ -133,13 +140,24 @@ class TestRequestEmail:
         assert response.json() == {"message": "Check your email for confirmation."}
 
 
-class TestRefreshToken:
-    def test_refresh_token_success(self, user, session, client):
-        current_user: User = session.query(User).filter(User.email == user.get('email')).first()
+@pytest.fixture()
+def login_refresh_token(client, user, session):
+    current_user: User = session.query(User).filter(User.email == user.get('email')).first()
+    current_user.confirmed = True
+    session.commit()
+
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get('email'), "password": user.get('password')},
+    )
+    return response.json()["refresh_token"]
 
+
+class TestRefreshToken:
+    def test_refresh_token_success(self, user, client, login_refresh_token):
         response = client.get(
             f"/api/auth/refresh_token",
-            headers={"Authorization": f"Bearer {current_user.refresh_token}"}
+            headers={"Authorization": f"Bearer {login_refresh_token}"}
         )
 
         assert response.status_code == status.HTTP_200_OK, response.text
@@ -147,6 +165,25 @@ class TestRefreshToken:
         assert "refresh_token" in response.json()
         assert response.json()["token_type"] == "bearer"
 
+    def test_refresh_token_reuse_revokes_family(self, user, client, login_refresh_token):
+        rotated = client.get(
+            f"/api/auth/refresh_token",
+            headers={"Authorization": f"Bearer {login_refresh_token}"}
+        ).json()["refresh_token"]
+
+        reused = client.get(
+            f"/api/auth/refresh_token",
+            headers={"Authorization": f"Bearer {login_refresh_token}"}
+        )
+        after_reuse = client.get(
+            f"/api/auth/refresh_token",
+            headers={"Authorization": f"Bearer {rotated}"}
+        )
+
+        assert reused.status_code == status.HTTP_401_UNAUTHORIZED, reused.text
+        assert reused.json()["detail"] == INVALID_REFRESH_TOKEN
+        assert after_reuse.status_code == status.HTTP_401_UNAUTHORIZED, after_reuse.text
+
     def test_invalid_token(self, user, client):
         invalid_refresh_token = asyncio.run(auth_service.create_refresh_token(
             data = {"sub": user['email']}, expires_delta=100)
@@ -159,3 +196,63 @@ class TestRefreshToken:
 
         assert response.status_code == status.HTTP_401_UNAUTHORIZED, response.text
         assert response.json()["detail"] == INVALID_REFRESH_TOKEN
+
+
+@pytest.fixture()
+def login_tokens(client, user, session):
+    current_user: User = session.query(User).filter(User.email == user.get('email')).first()
+    current_user.confirmed = True
+    session.commit()
+
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get('email'), "password": user.get('password')},
+    )
+    return response.json()
+
+
+class TestLogout:
+    def test_logout_revokes_access_token(self, client, login_tokens):
+        headers = {"Authorization": f"Bearer {login_tokens['access_token']}"}
+
+        with patch.object(auth_service, 'redis') as r_mock:
+            r_mock.get.return_value = None
+            response = client.post("/api/auth/logout", headers=headers)
+            after_logout = client.get("/api/user/me", headers=headers)
+
+        assert response.status_code == status.HTTP_200_OK, response.text
+        assert response.json() == {"message": LOGGED_OUT}
+        assert after_logout.status_code == status.HTTP_401_UNAUTHORIZED, after_logout.text
+
+    def test_logout_accepts_token_without_jti(self, client, user, login_tokens):
+        issued = datetime.utcnow() - timedelta(minutes=1)
+        legacy_token = jwt.encode({"sub": user["email"], "iat": issued, "exp": issued + timedelta(minutes=15),
+                                   "scope": "access_token"}, auth_service.SECRET_KEY, algorithm=auth_service.ALGORITHM)
+        headers = {"Authorization": f"Bearer {legacy_token}"}
+
+        with patch.object(auth_service, 'redis') as r_mock:
+            r_mock.get.return_value = None
+            response = client.post("/api/auth/logout", headers=headers)
+            after_logout = client.get("/api/user/me", headers=headers)
+            current = client.get("/api/user/me", headers={"Authorization": f"Bearer {login_tokens['access_token']}"})
+
+        assert response.status_code == status.HTTP_200_OK, response.text
+        assert after_logout.status_code == status.HTTP_401_UNAUTHORIZED, after_logout.text
+        assert current.status_code == status.HTTP_200_OK, current.text
+
+    def test_logout_all_revokes_sessions(self, client, login_tokens):
+        headers = {"Authorization": f"Bearer {login_tokens['access_token']}"}
+
+        with patch.object(auth_service, 'redis') as r_mock:
+            r_mock.get.return_value = None
+            response = client.post("/api/auth/logout_all", headers=headers)
+            after_logout = client.get("/api/user/me", headers=headers)
+        refresh = client.get(
+            "/api/auth/refresh_token",
+            headers={"Authorization": f"Bearer {login_tokens['refresh_token']}"}
+        )
+
+        assert response.status_code == status.HTTP_200_OK, response.text
+        assert response.json() == {"message": LOGGED_OUT_ALL}
+        assert after_logout.status_code == status.HTTP_401_UNAUTHORIZED, after_logout.text
+        assert refresh.status_code == status.HTTP_401_UNAUTHORIZED, refresh.text
@@ -94,6 +94,22 @@ class TestGetContacts:
             assert isinstance(data, list)
             assert data[0]["name"] == "Isana"
             assert "id" in data[0]
+            assert response.headers["X-Total-Count"] == "1"
+
+    def test_get_contacts_fast_json(self, client, access_token, contact, mocker, monkeypatch):
+        with patch.object(auth_service, 'redis') as r_mock:
+            mocker.patch('src.routes.contacts.RateLimiter.__call__', autospec=True)
+            r_mock.get.return_value = None
+            headers = {"Authorization": f"Bearer {access_token}"}
+
+            default = client.get("/api/contacts", headers=headers)
+            monkeypatch.setattr("src.routes.contacts.settings.fast_json_responses", True)
+            fast = client.get("/api/contacts", headers=headers)
+
+            assert fast.status_code == status.HTTP_200_OK, fast.text
+            assert fast.json() == default.json()
+            assert fast.headers["X-Total-Count"] == default.headers["X-Total-Count"]
+            assert fast.json()[0]["mobile"] == contact["mobile"]
 
 
 class TestGetContact:
@@ -261,6 +277,20 @@ class TestUpdateContactStatus:
 #
 
 
+class TestContactsStats:
+    def test_contacts_stats(self, client, access_token):
+        with patch.object(auth_service, 'redis') as r_mock:
+            r_mock.get.return_value = None
+
+            response = client.get(
+                "/api/contacts/stats",
+                headers={"Authorization": f"Bearer {access_token}"}
+            )
+
+            assert response.status_code == status.HTTP_200_OK, response.text
+            assert response.json() == {"total": 1}
+
+
 class TestRemoveContact:
     def test_remove_contact(self, client, access_token, contact):
         with patch.object(auth_service, 'redis') as r_mock:
@@ -287,3 +317,15 @@ class TestRemoveContact:
 
             assert response.status_code == status.HTTP_404_NOT_FOUND, response.text
             assert response.json()["detail"] == "Not Found"
+
+    def test_contacts_stats_after_remove(self, client, access_token):
+        with patch.object(auth_service, 'redis') as r_mock:
+            r_mock.get.return_value = None
+
+            response = client.get(
+                "/api/contacts/stats",
+                headers={"Authorization": f"Bearer {access_token}"}
+            )
+
+            assert response.status_code == status.HTTP_200_OK, response.text
+            assert response.json() == {"total": 0}
@@ -0,0 +1,82 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi import status
+
+from src.services.auth import auth_service
+from src.conf.messages import NOT_FOUND_CONTACT, NOTHING_TO_MERGE
+
+
+@pytest.fixture(scope="module")
+def contact_ids(client, headers):
+    contacts = [
+        {"name": "Robert", "surname": "Smith", "email": "bob@example.com", "mobile": "501234567",
+         "date_of_birth": "1990-05-17"},
+        {"name": "Rupert", "surname": "Smith", "email": "Bob@Example.com", "mobile": "501234567",
+         "date_of_birth": "1990-05-17"},
+        {"name": "Alice", "surname": "Brown", "email": "alice@example.com", "mobile": "671111111",
+         "date_of_birth": "1985-01-02"},
+    ]
+    with patch.object(auth_service, 'redis') as r_mock:
+        r_mock.get.return_value = None
+        return [client.post("/api/contacts/new/", json=body, headers=headers).json()["id"] for body in contacts]
+
+
+class TestDuplicates:
+    def test_get_duplicates(self, client, headers, contact_ids):
+        with patch.object(auth_service, 'redis') as r_mock:
+            r_mock.get.return_value = None
+
+            response = client.get("/api/contacts/duplicates", headers=headers)
+
+            assert response.status_code == status.HTTP_200_OK, response.text
+            data = response.json()
+            assert len(data) == 1
+            assert data[0]["contact_ids"] == contact_ids[:2]
+            assert data[0]["score"] > 0.9
+            assert data[0]["reasons"] == ["email", "phone", "name", "date_of_birth"]
+
+    def test_merge_nothing(self, client, headers, contact_ids):
+        with patch.object(auth_service, 'redis') as r_mock:
+            r_mock.get.return_value = None
+
+            response = client.post(
+                "/api/contacts/merge",
+                json={"keep_id": contact_ids[0], "duplicate_ids": [contact_ids[0]]},
+                headers=headers
+            )
+
+            assert response.status_code == status.HTTP_400_BAD_REQUEST, response.text
+            assert response.json()["detail"] == NOTHING_TO_MERGE
+
+    def test_merge_unknown_contact(self, client, headers, contact_ids):
+        with patch.object(auth_service, 'redis') as r_mock:
+            r_mock.get.return_value = None
+
+            response = client.post(
+                "/api/contacts/merge",
+                json={"keep_id": contact_ids[0], "duplicate_ids": [contact_ids[1], 999]},
+                headers=headers
+            )
+
+            assert response.status_code == status.HTTP_404_NOT_FOUND, response.text
+            assert response.json()["detail"] == NOT_FOUND_CONTACT
+
+    def test_merge(self, client, headers, contact_ids):
+        with patch.object(auth_service, 'redis') as r_mock:
+            r_mock.get.return_value = None
+
+            response = client.post(
+                "/api/contacts/merge",
+                json={"keep_id": contact_ids[0], "duplicate_ids": [contact_ids[1]]},
+                headers=headers
+            )
+            removed = client.get(f"/api/contacts/{contact_ids[1]}", headers=headers)
+            stats = client.get("/api/contacts/stats", headers=headers)
+            duplicates = client.get("/api/contacts/duplicates", headers=headers)
+
+            assert response.status_code == status.HTTP_200_OK, response.text
+            assert response.json()["id"] == contact_ids[0]
+            assert removed.status_code == status.HTTP_404_NOT_FOUND
+            assert stats.json() == {"total": 2}
+            assert duplicates.json() == []
@@ -0,0 +1,33 @@
+import pytest
+from fastapi import status
+
+
+pytestmark = pytest.mark.usefixtures("redis_cache")
+
+
+@pytest.fixture(scope="module")
+def contact():
+    return {"name": "Retry", "surname": "Safe", "email": "retry@example.com", "mobile": "501234567",
+            "date_of_birth": "1990-05-17"}
+
+
+class TestIdempotentCreateContact:
+    def test_retried_create_returns_same_contact(self, client, headers, contact):
+        retry_headers = {**headers, "Idempotency-Key": "create-retry-1"}
+
+        first = client.post("/api/contacts/new/", json=contact, headers=retry_headers)
+        second = client.post("/api/contacts/new/", json=contact, headers=retry_headers)
+
+        assert first.status_code == status.HTTP_201_CREATED, first.text
+        assert second.status_code == status.HTTP_201_CREATED, second.text
+        assert second.json() == first.json()
+        assert second.headers["idempotent-replayed"] == "true"
+
+        response = client.get("/api/contacts/stats", headers=headers)
+        assert response.json() == {"total": 1}
+
+    def test_create_without_key_is_not_replayed(self, client, headers, contact):
+        response = client.post("/api/contacts/new/", json=contact, headers=headers)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST, response.text
+        assert "idempotent-replayed" not in response.headers
@@ -0,0 +1,61 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi import status
+from sqlalchemy import text
+
+from src.services.auth import auth_service
+from src.conf.messages import INVALID_PHONE, NOT_FOUND_CONTACT
+
+
+pytestmark = pytest.mark.usefixtures("redis_cache")
+
+
+@pytest.fixture(scope="module")
+def contact(client, headers):
+    body = {"name": "Caller", "surname": "Known", "email": "caller@example.com", "mobile": "+380 (50) 123-45-67",
+            "date_of_birth": "1990-05-17"}
+    with patch.object(auth_service, 'redis') as r_mock:
+        r_mock.get.return_value = None
+        response = client.post("/api/contacts/new/", json=body, headers=headers)
+    assert response.status_code == status.HTTP_201_CREATED, response.text
+    return response.json()
+
+
+class TestGetContactsByPhone:
+    def test_mobile_is_kept_as_typed(self, contact):
+        assert contact["mobile"] == "+380 (50) 123-45-67"
+
+    @pytest.mark.parametrize("number", ["+380501234567", "0501234567", "00380501234567", "050-123-45-67"])
+    def test_lookup_by_any_spelling(self, client, headers, contact, number):
+        response = client.get(f"/api/contacts/by_phone/{number}", headers=headers)
+
+        assert response.status_code == status.HTTP_200_OK, response.text
+        assert [row["id"] for row in response.json()] == [contact["id"]]
+
+    def test_lookup_follows_update(self, client, headers, contact):
+        body = {**contact, "mobile": "067 111 22 33", "done": False}
+        assert client.put(f"/api/contacts/{contact['id']}", json=body, headers=headers).status_code == 200
+
+        assert client.get("/api/contacts/by_phone/0501234567", headers=headers).status_code == 404
+        response = client.get("/api/contacts/by_phone/+380671112233", headers=headers)
+        assert [row["id"] for row in response.json()] == [contact["id"]]
+
+    def test_unknown_number(self, client, headers, contact):
+        response = client.get("/api/contacts/by_phone/0991234567", headers=headers)
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND, response.text
+        assert response.json()["detail"] == NOT_FOUND_CONTACT
+
+    def test_invalid_number(self, client, headers):
+        response = client.get("/api/contacts/by_phone/12345", headers=headers)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST, response.text
+        assert response.json()["detail"] == INVALID_PHONE
+
+    def test_lookup_uses_index(self, session):
+        plan = session.execute(text(
+            "EXPLAIN QUERY PLAN SELECT name FROM contacts WHERE user_id = 1 AND phone = '+380501234567'"
+        )).all()
+
+        assert "USING INDEX ix_contacts_user_id_phone" in plan[0][-1]
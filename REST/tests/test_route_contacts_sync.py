@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import status
+
+from src.conf.config import settings
+from src.conf.messages import INVALID_SYNC_TOKEN
+from src.services.sync import CHANGED, encode_sync_token
+
+
+pytestmark = pytest.mark.usefixtures("redis_cache")
+
+
+@pytest.fixture(autouse=True)
+def no_commit_lag(monkeypatch):
+    monkeypatch.setattr(settings, "sync_commit_lag_seconds", 0)
+
+
+def new_contact(client, headers, name):
+    body = {"name": name, "surname": "Sync", "email": f"{name.lower()}@example.com", "mobile": "501234567",
+            "date_of_birth": "1990-05-17"}
+    return client.post("/api/contacts/new/", json=body, headers=headers).json()
+
+
+def sync(client, headers, since=None, limit=100):
+    params = {"limit": limit}
+    if since is not None:
+        params["since"] = since
+    response = client.get("/api/contacts/changes", params=params, headers=headers)
+    assert response.status_code == status.HTTP_200_OK, response.text
+    return response.json()
+
+
+class TestContactChanges:
+    def test_full_then_delta_sync(self, client, headers):
+        first = new_contact(client, headers, "Anna")
+        second = new_contact(client, headers, "Boris")
+
+        full = sync(client, headers)
+        assert [contact["id"] for contact in full["changes"]] == [first["id"], second["id"]]
+        assert full["deleted"] == []
+        assert full["has_more"] is False
+
+        assert sync(client, headers, full["next_token"])["changes"] == []
+
+        body = {**first, "surname": "Changed", "done": False}
+        client.put(f"/api/contacts/{first['id']}", json=body, headers=headers)
+        client.delete(f"/api/contacts/{second['id']}", headers=headers)
+        third = new_contact(client, headers, "Clara")
+
+        delta = sync(client, headers, full["next_token"])
+        assert [contact["id"] for contact in delta["changes"]] == [first["id"], third["id"]]
+        assert delta["changes"][0]["surname"] == "Changed"
+        assert delta["deleted"] == [second["id"]]
+
+        assert sync(client, headers, delta["next_token"]) == {**delta, "changes": [], "deleted": []}
+
+    def test_pages(self, client, headers):
+        token = sync(client, headers)["next_token"]
+        created = [new_contact(client, headers, name)["id"] for name in ("Dmitry", "Elena", "Fedor")]
+
+        seen = []
+        while True:
+            page = sync(client, headers, token, limit=2)
+            seen += [contact["id"] for contact in page["changes"]]
+            token = page["next_token"]
+            if not page["has_more"]:
+                break
+
+        assert seen == created
+
+    def test_invalid_token(self, client, headers):
+        response = client.get("/api/contacts/changes", params={"since": "garbage"}, headers=headers)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST, response.text
+        assert response.json()["detail"] == INVALID_SYNC_TOKEN
+
+    def test_token_older_than_tombstones(self, client, headers):
+        since = datetime.utcnow() - timedelta(days=settings.sync_tombstone_retention_days, minutes=1)
+        token = encode_sync_token((since, CHANGED, 0))
+
+        response = client.get("/api/contacts/changes", params={"since": token}, headers=headers)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST, response.text
+        assert response.json()["detail"] == INVALID_SYNC_TOKEN
@@ -0,0 +1,121 @@
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+import main
+from src.database import connect, replicas
+from src.database.model import User
+from src.services.auth import get_current_admin
+from src.services.health import health_monitor
+
+client = TestClient(main.app)
+
+
+@pytest.fixture()
+def monitor(monkeypatch):
+    monkeypatch.setattr(health_monitor, "checked_at", None)
+    monkeypatch.setattr(health_monitor, "check_database", MagicMock())
+    monkeypatch.setattr(health_monitor, "check_redis", MagicMock())
+    return health_monitor
+
+
+def test_liveness_touches_no_io(monitor):
+    response = client.get("/api/health/live")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"status": "ok"}
+    monitor.check_database.assert_not_called()
+    monitor.check_redis.assert_not_called()
+
+
+def test_readiness_is_cached(monitor):
+    first = client.get("/api/health/ready")
+    second = client.get("/api/health/ready")
+
+    assert first.status_code == status.HTTP_200_OK, first.text
+    assert second.json()["ready"] is True
+    assert monitor.check_database.call_count == 1
+    assert monitor.check_redis.call_count == 1
+
+
+def test_readiness_reports_failed_dependency(monitor):
+    monitor.check_redis.side_effect = ConnectionError("redis is down")
+
+    response = client.get("/api/health/ready")
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json()["checks"]["database"]["ok"] is True
+    assert "redis is down" in response.json()["checks"]["redis"]["error"]
+
+
+def test_healthchecker_uses_cached_readiness(monitor):
+    client.get("/api/health/ready")
+
+    response = client.get("/api/healthchecker")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"message": "Welcome to FastAPI!"}
+    assert monitor.check_database.call_count == 1
+
+
+@pytest.fixture()
+def admin():
+    main.app.dependency_overrides[get_current_admin] = lambda: User(email="admin@example.com")
+    yield
+    del main.app.dependency_overrides[get_current_admin]
+
+
+def test_deep_diagnostics_requires_admin(monitor, monkeypatch):
+    smtp = MagicMock()
+    monkeypatch.setattr(health_monitor, "check_smtp", smtp)
+
+    response = client.get("/api/health/deep")
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    monitor.check_database.assert_not_called()
+    smtp.assert_not_called()
+
+
+def test_deep_diagnostics(monitor, monkeypatch, admin):
+    async def smtp_down():
+        raise OSError("connection refused")
+
+    monkeypatch.setattr(health_monitor, "check_smtp", smtp_down)
+
+    response = client.get("/api/health/deep")
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["checks"]["database"]["ok"] is True
+    assert data["checks"]["smtp"]["ok"] is False
+    assert "status" in data["pool"]["primary"]
+    assert data["event_loop"]["lag_ms"] >= 0
+
+
+@pytest.fixture()
+def sharded(monkeypatch):
+    shards = {"a": create_engine("sqlite://"), "b": create_engine("sqlite://")}
+    monkeypatch.setattr(connect.shard_router, "engines", shards)
+    monkeypatch.setattr(replicas.replica_router, "replicas", [create_engine("sqlite://")])
+    return shards
+
+
+def test_database_check_covers_every_shard(sharded):
+    health_monitor.check_database()
+
+    sharded["b"] = create_engine("sqlite:////nonexistent/shard.db")
+    with pytest.raises(OperationalError):
+        health_monitor.check_database()
+
+
+def test_deep_diagnostics_reports_every_pool(monitor, monkeypatch, admin, sharded):
+    monkeypatch.setattr(health_monitor, "check_smtp", MagicMock())
+
+    response = client.get("/api/health/deep")
+
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert set(response.json()["pool"]) == {"a", "b", "replica0"}
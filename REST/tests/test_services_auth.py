@@ -1,12 +1,19 @@
 from datetime import datetime, timedelta
+import asyncio
+import pickle
+import time
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import fakeredis
 from fastapi import HTTPException, status
 
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
 
 from src.services.auth import Auth
-from src.database.model import User
+from src.database.model import Base, User
 from src.conf.messages import UNAUTHORIZED
 
 
@@ -45,5 +52,125 @@ class TestAuth(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(decoded_token, test_email)
 
 
+
+class TestCurrentUserCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.auth = Auth()
+        self.auth.redis = fakeredis.FakeRedis()
+        self.auth.session_factory = MagicMock()
+        self.session = MagicMock(spec=Session)
+        self.email = "cached@example.com"
+        self.user = User(id=1, email=self.email)
+
+    async def token(self):
+        return await self.auth.create_access_token({"sub": self.email})
+
+    def load_slowly(self):
+        async def get_user_by_email(email, db):
+            await asyncio.sleep(0.05)
+            return self.user
+
+        return patch("src.services.auth.repository_users.get_user_by_email",
+                     AsyncMock(side_effect=get_user_by_email))
+
+    async def test_concurrent_misses_load_once(self):
+        token = await self.token()
+
+        with self.load_slowly() as get_user:
+            users = await asyncio.gather(*(self.auth.get_current_user(token, self.session) for _ in range(5)))
+
+        get_user.assert_awaited_once()
+        self.assertEqual({user.email for user in users}, {self.email})
+        self.assertIsNotNone(self.auth.redis.get(f"users:{self.email}"))
+        self.assertIsNone(self.auth.redis.get(f"users_lock:{self.email}"))
+
+    async def test_shared_load_is_detached(self):
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine)
+        with Session(engine) as setup:
+            setup.add(User(username="cached", email=self.email, password="secret"))
+            setup.commit()
+        token = await self.token()
+
+        db = Session(engine)
+        users = await asyncio.gather(*(self.auth.get_current_user(token, db) for _ in range(3)))
+        db.commit()
+        db.close()
+
+        self.assertTrue(all(inspect(user).detached for user in users))
+        self.assertEqual({user.username for user in users}, {"cached"})
+
+    async def test_waits_for_the_worker_holding_the_lock(self):
+        self.auth.redis.set(f"users_lock:{self.email}", "other worker", px=2000)
+
+        async def other_worker():
+            await asyncio.sleep(0.05)
+            self.auth._store_user(self.email, self.user, 0.01)
+
+        with self.load_slowly() as get_user:
+            user, _ = await asyncio.gather(self.auth.get_current_user(await self.token(), self.session),
+                                           other_worker())
+
+        get_user.assert_not_awaited()
+        self.assertEqual(user.email, self.email)
+
+    async def test_slow_redis_does_not_stall_the_loop(self):
+        redis = self.auth.redis
+
+        class SlowRedis:
+            def __getattr__(self, name):
+                def call(*args, **kwargs):
+                    time.sleep(0.05)
+                    return getattr(redis, name)(*args, **kwargs)
+                return call
+
+            def pipeline(self):
+                time.sleep(0.05)
+                return redis.pipeline()
+
+        self.auth.redis = SlowRedis()
+        token = await self.token()
+        gaps = []
+
+        async def ticker(done: asyncio.Event):
+            last = time.perf_counter()
+            while not done.is_set():
+                await asyncio.sleep(0.005)
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+
+        done = asyncio.Event()
+        ticks = asyncio.create_task(ticker(done))
+        with self.load_slowly():
+            await self.auth.get_current_user(token, self.session)
+            await self.auth.get_current_user(token, self.session)
+        done.set()
+        await ticks
+
+        self.assertLess(max(gaps), 0.04)
+
+    async def test_refreshes_in_background_before_expiry(self):
+        entry = {"user": self.user, "delta": 0.01, "expires": time.time() + 0.5}
+        self.auth.redis.set(f"users:{self.email}", pickle.dumps(entry))
+
+        with self.load_slowly() as get_user, patch("src.services.auth.random.random", return_value=0.9999):
+            user = await self.auth.get_current_user(await self.token(), self.session)
+            get_user.assert_not_awaited()
+            await asyncio.gather(*self.auth._refreshes)
+
+        self.assertEqual(user.email, self.email)
+        get_user.assert_awaited_once()
+        self.auth.session_factory.return_value.close.assert_called_once()
+        refreshed = pickle.loads(self.auth.redis.get(f"users:{self.email}"))
+        self.assertGreater(refreshed["expires"], entry["expires"])
+
+    async def test_no_refresh_far_from_expiry(self):
+        entry = {"user": self.user, "delta": 0.01, "expires": time.time() + 900}
+
+        with patch("src.services.auth.random.random", return_value=0.5):
+            self.assertFalse(self.auth._should_refresh(entry))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,96 @@
+import asyncio
+import json
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.database.model import Base, Contact, User
+from src.services.birthday_digest import BirthdayDigestJob, next_birthday, upcoming_days
+
+TODAY = date(2023, 12, 29)
+
+
+@pytest.fixture()
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+
+    db = factory()
+    for user_id in range(1, 5):
+        db.add(User(id=user_id, username=f"user{user_id}", email=f"user{user_id}@example.com", password="x",
+                    confirmed=user_id != 4))
+    db.add_all([
+        Contact(name="Ann", surname="Lee", email="ann@example.com", date_of_birth=date(1990, 1, 2), user_id=1),
+        Contact(name="Bob", surname="Ray", email="bob@example.com", date_of_birth=date(1985, 12, 29), user_id=1),
+        Contact(name="Cid", surname="Fox", email="cid@example.com", date_of_birth=date(1970, 6, 1), user_id=1),
+        Contact(name="Dan", surname="Kim", email="dan@example.com", date_of_birth=date(2000, 12, 31), user_id=2),
+        Contact(name="Eve", surname="Poe", email="eve@example.com", date_of_birth=date(1999, 3, 3), user_id=3),
+        Contact(name="Fay", surname="Orr", email="fay@example.com", date_of_birth=date(2001, 12, 30), user_id=4),
+    ])
+    db.commit()
+    db.close()
+    return factory
+
+
+class Outbox:
+    def __init__(self, fail_on_batch: int | None = None):
+        self.digests = []
+        self.batches = 0
+        self.fail_on_batch = fail_on_batch
+
+    async def __call__(self, batch):
+        self.batches += 1
+        if self.batches == self.fail_on_batch:
+            raise ConnectionError("smtp is down")
+        self.digests.extend(batch)
+        return len(batch)
+
+
+def test_upcoming_days_wrap_the_year():
+    assert upcoming_days(TODAY, 5) == [(12, 29), (12, 30), (12, 31), (1, 1), (1, 2)]
+    assert (2, 29) in upcoming_days(date(2023, 2, 27), 3)
+    assert (2, 29) not in upcoming_days(date(2023, 2, 20), 3)
+
+
+def test_next_birthday():
+    assert next_birthday(date(1990, 1, 2), TODAY) == date(2024, 1, 2)
+    assert next_birthday(date(1996, 2, 29), date(2023, 2, 27)) == date(2023, 2, 28)
+
+
+def test_sends_one_digest_per_confirmed_user(session_factory):
+    outbox = Outbox()
+    job = BirthdayDigestJob(session_factory, outbox, days=7, batch_size=10, today=TODAY)
+
+    stats = asyncio.run(job.run())
+
+    assert [digest["email"] for digest in outbox.digests] == ["user1@example.com", "user2@example.com"]
+    assert [birthday["name"] for birthday in outbox.digests[0]["birthdays"]] == ["Bob", "Ann"]
+    assert [birthday["days"] for birthday in outbox.digests[0]["birthdays"]] == [0, 4]
+    assert (stats.users, stats.contacts, stats.sent, stats.batches) == (2, 3, 2, 1)
+
+
+def test_resumes_from_the_checkpoint(session_factory, tmp_path):
+    checkpoint = tmp_path / "checkpoint.json"
+    failing = Outbox(fail_on_batch=2)
+    job = BirthdayDigestJob(session_factory, failing, days=7, batch_size=1, checkpoint_path=str(checkpoint),
+                            today=TODAY)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(job.run())
+    assert json.loads(checkpoint.read_text())["last_user_id"] == 1
+
+    outbox = Outbox()
+    job.send = outbox
+    asyncio.run(job.run())
+
+    assert [digest["user_id"] for digest in outbox.digests] == [2]
+    assert json.loads(checkpoint.read_text())["done"] is True
+
+    rerun = Outbox()
+    job.send = rerun
+    asyncio.run(job.run())
+    assert rerun.digests == []
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import MagicMock
+
+import fakeredis
+import fakeredis.aioredis
+import redis
+
+from src.services.change_feed import CHANNEL, ChangeFeed, format_event
+
+
+class TestChangeFeed(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        server = fakeredis.FakeServer()
+        self.feed = ChangeFeed(buffer_size=3, keepalive=0.5, retry_interval=0.01)
+        self.feed.redis = fakeredis.FakeRedis(server=server, decode_responses=True)
+        self.feed.async_redis = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+
+    async def asyncTearDown(self):
+        await self.feed.stop()
+
+    @staticmethod
+    def message(email, *events):
+        return json.dumps({"user": email, "events": [{"type": kind, "id": i} for kind, i in events]})
+
+    async def test_dispatch_reaches_only_the_owner(self):
+        first, second = self.feed.subscribe("user1@example.com"), self.feed.subscribe("user1@example.com")
+        other = self.feed.subscribe("user2@example.com")
+
+        self.feed.dispatch(self.message("user1@example.com", ("changed", 10), ("deleted", 11)))
+
+        for subscription in (first, second):
+            self.assertEqual(subscription.queue.get_nowait(), {"type": "changed", "id": 10})
+            self.assertEqual(subscription.queue.get_nowait(), {"type": "deleted", "id": 11})
+        self.assertTrue(other.queue.empty())
+
+    async def test_full_buffer_resyncs_and_closes_stream(self):
+        stream = self.feed.events("user1@example.com")
+        first = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+
+        self.feed.dispatch(self.message("user1@example.com", *(("changed", i) for i in range(5))))
+
+        self.assertEqual(await first, format_event({"type": "resync"}))
+        with self.assertRaises(StopAsyncIteration):
+            await stream.__anext__()
+        self.assertEqual(self.feed.subscribers, {})
+
+    async def test_keepalive(self):
+        self.feed.keepalive = 0.01
+        stream = self.feed.events("user1@example.com")
+
+        self.assertEqual(await stream.__anext__(), ": keepalive\n\n")
+        await stream.aclose()
+        self.assertEqual(self.feed.subscribers, {})
+
+    async def test_published_changes_are_streamed(self):
+        stream = self.feed.events("user7@example.com")
+        first = asyncio.ensure_future(stream.__anext__())
+        while not (await self.feed.async_redis.pubsub_numsub(CHANNEL))[0][1]:
+            await asyncio.sleep(0.01)
+
+        await self.feed.publish("user7@example.com", [("changed", 3)])
+
+        self.assertEqual(await asyncio.wait_for(first, 1), 'event: changed\ndata: {"id": 3}\n\n')
+        await stream.aclose()
+
+    async def test_publish_ignores_redis_errors(self):
+        self.feed.redis = MagicMock()
+        self.feed.redis.publish.side_effect = redis.ConnectionError
+
+        await self.feed.publish("user1@example.com", [("changed", 3)])
+
+        self.feed.redis.publish.assert_called_once_with(CHANNEL, self.message("user1@example.com", ("changed", 3)))
+
+    async def test_malformed_message_keeps_the_listener(self):
+        stream = self.feed.events("user7@example.com")
+        first = asyncio.ensure_future(stream.__anext__())
+        while not (await self.feed.async_redis.pubsub_numsub(CHANNEL))[0][1]:
+            await asyncio.sleep(0.01)
+
+        with self.assertLogs("src.services.change_feed", "ERROR"):
+            for garbage in ("not json", json.dumps({"events": []}), json.dumps({"user": "user7@example.com"})):
+                await self.feed.async_redis.publish(CHANNEL, garbage)
+            await self.feed.publish("user7@example.com", [("changed", 3)])
+
+            self.assertEqual(await asyncio.wait_for(first, 1), 'event: changed\ndata: {"id": 3}\n\n')
+        self.assertFalse(self.feed._task.done())
+        await stream.aclose()
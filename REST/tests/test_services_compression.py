@@ -0,0 +1,118 @@
+import json
+import unittest
+import zlib
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from src.services import compression
+from src.services.compression import CompressionMiddleware, choose_encoding
+
+PAYLOAD = [{"id": i, "name": f"Name{i}", "email": f"contact{i}@example.com"} for i in range(200)]
+
+
+def make_app(**options):
+    app = FastAPI()
+
+    @app.get("/large")
+    async def large():
+        return JSONResponse(PAYLOAD)
+
+    @app.get("/small")
+    async def small():
+        return JSONResponse({"id": 1})
+
+    @app.get("/image")
+    async def image():
+        return Response(b"\x89PNG" + b"\x00" * 4096, media_type="image/png")
+
+    @app.get("/no-transform")
+    async def no_transform():
+        return JSONResponse(PAYLOAD, headers={"Cache-Control": "no-transform"})
+
+    @app.get("/events")
+    async def events():
+        async def stream():
+            yield "event: changed\ndata: {}\n\n"
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    app.add_middleware(CompressionMiddleware, minimum_size=500, content_types=["application/json", "text/csv"],
+                       **options)
+    return app
+
+
+class TestChooseEncoding(unittest.TestCase):
+    def test_weights(self):
+        self.assertEqual(choose_encoding("gzip, deflate, br", ("br", "gzip")), "br")
+        self.assertEqual(choose_encoding("gzip;q=1.0, br;q=0.5", ("br", "gzip")), "gzip")
+        self.assertEqual(choose_encoding("br;q=0, *", ("br", "gzip")), "gzip")
+        self.assertEqual(choose_encoding("br", ("gzip",)), None)
+        self.assertEqual(choose_encoding("gzip;q=0", ("gzip",)), None)
+        self.assertEqual(choose_encoding("", ("gzip",)), None)
+        self.assertEqual(choose_encoding("gzip;q=abc, identity", ("gzip",)), None)
+
+
+class TestCompressionMiddleware(unittest.IsolatedAsyncioTestCase):
+    async def get(self, path, accept_encoding="gzip", encodings=("gzip",), **options):
+        transport = httpx.ASGITransport(app=make_app(encodings=encodings, **options))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path, headers={"Accept-Encoding": accept_encoding})
+
+    async def test_large_json_is_gzipped(self):
+        response = await self.get("/large")
+
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["vary"])
+        self.assertLess(int(response.headers["content-length"]), len(json.dumps(PAYLOAD)) // 3)
+        self.assertEqual(response.json(), PAYLOAD)
+
+    @unittest.skipIf(compression.brotli is None, "brotli is not installed")
+    async def test_brotli_is_preferred(self):
+        response = await self.get("/large", "gzip, br", encodings=("br", "gzip"))
+
+        self.assertEqual(response.headers["content-encoding"], "br")
+        self.assertEqual(response.json(), PAYLOAD)
+
+    async def test_sent_as_is(self):
+        for path, accept_encoding in (("/small", "gzip"), ("/image", "gzip"), ("/no-transform", "gzip"),
+                                      ("/events", "gzip"), ("/large", "identity")):
+            with self.subTest(path=path, accept_encoding=accept_encoding):
+                response = await self.get(path, accept_encoding)
+                self.assertNotIn("content-encoding", response.headers)
+
+    async def test_level(self):
+        fast = await self.get("/large", gzip_level=1)
+        best = await self.get("/large", gzip_level=9)
+
+        self.assertLessEqual(int(best.headers["content-length"]), int(fast.headers["content-length"]))
+
+    async def test_stream_chunks_are_flushed(self):
+        chunks = [f"{i},Name{i},contact{i}@example.com\n".encode() * 20 for i in range(3)]
+        sent = []
+
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-type", b"text/csv")]})
+            for index, chunk in enumerate(chunks):
+                await send({"type": "http.response.body", "body": chunk, "more_body": index < len(chunks) - 1})
+
+        async def send(message):
+            sent.append(message)
+
+        async def receive():
+            return {"type": "http.request"}
+
+        middleware = CompressionMiddleware(app, minimum_size=10_000, content_types=["text/csv"], encodings=("gzip",))
+        scope = {"type": "http", "method": "GET", "path": "/export", "headers": [(b"accept-encoding", b"gzip")]}
+        await middleware(scope, receive, send)
+
+        headers = dict(sent[0]["headers"])
+        self.assertEqual(headers[b"content-encoding"], b"gzip")
+        self.assertNotIn(b"content-length", headers)
+
+        decompressor = zlib.decompressobj(31)
+        for message, chunk in zip(sent[1:], chunks):
+            self.assertEqual(decompressor.decompress(message["body"]), chunk)
+        self.assertFalse(sent[-1]["more_body"])
+        self.assertTrue(decompressor.eof)
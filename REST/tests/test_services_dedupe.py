@@ -0,0 +1,74 @@
+import unittest
+from datetime import date
+
+from src.services.dedupe import blocking_keys, find_duplicates, normalize_phone, score_pair, soundex
+
+
+class TestDedupe(unittest.TestCase):
+    def test_soundex(self):
+        self.assertEqual(soundex("Robert"), "R163")
+        self.assertEqual(soundex("Rupert"), "R163")
+        self.assertEqual(soundex("Ashcraft"), "A261")
+        self.assertEqual(soundex("Tymczak"), "T522")
+        self.assertEqual(soundex("Pfister"), "P236")
+        self.assertEqual(soundex("Lee"), "L000")
+        self.assertEqual(soundex(""), "")
+
+    def test_normalize_phone(self):
+        self.assertEqual(normalize_phone("+380 (50) 123-45-67"), "501234567")
+        self.assertEqual(normalize_phone(501234567), "501234567")
+        self.assertIsNone(normalize_phone("12345"))
+        self.assertIsNone(normalize_phone(None))
+
+    def test_blocking_keys(self):
+        keys = blocking_keys((1, "Robert", "Smith", " Bob@Example.com ", "050-123-45-67", None))
+
+        self.assertEqual(keys, [("email", "bob@example.com"), ("phone", "501234567"), ("name", "R163S530")])
+
+    def test_score_pair(self):
+        born = date(1990, 5, 17)
+        score, reasons = score_pair((1, "Robert", "Smith", "bob@example.com", 501234567, born),
+                                    (2, "Robert", "Smith", "BOB@example.com", "+380501234567", born))
+
+        self.assertEqual(score, 1.0)
+        self.assertEqual(reasons, ["email", "phone", "name", "date_of_birth"])
+
+    def test_phone_keys_use_e164(self):
+        first = (1, "Robert", "Smith", None, "050 123 45 67", None, "+380501234567")
+        second = (2, "Anna", "Kowalska", None, "+48 501 234 567", None, "+48501234567")
+        legacy = (3, "Robert", "Smith", None, "0501234567", None, None)
+
+        self.assertEqual(blocking_keys(first)[0], ("phone", "+380501234567"))
+        self.assertEqual(blocking_keys(legacy)[0], ("phone", "501234567"))
+        self.assertEqual(find_duplicates([first, second], min_score=0), [])
+
+    def test_find_duplicates_compares_only_within_blocks(self):
+        rows = [
+            (1, "Robert", "Smith", "bob@example.com", 501234567, None),
+            (2, "Rupert", "Smith", "rupert@example.com", 671111111, None),
+            (3, "Alice", "Brown", "Bob@Example.com", 931111111, None),
+            (4, "Carol", "White", "carol@example.com", 501234567, None),
+            (5, "Dave", "Green", "dave@example.com", 991111111, None),
+        ]
+
+        candidates = find_duplicates(rows, min_score=0)
+
+        self.assertEqual({candidate.contact_ids for candidate in candidates}, {(1, 2), (1, 3), (1, 4)})
+        self.assertEqual(candidates[0].contact_ids, (1, 3))
+        self.assertEqual(candidates[0].reasons, ["email"])
+
+    def test_large_name_blocks_are_skipped(self):
+        rows = [(i, "John", "Smith", f"john{i}@example.com", None, None) for i in range(10)]
+
+        self.assertEqual(len(find_duplicates(rows, min_score=0, max_block_size=20)), 45)
+        self.assertEqual(find_duplicates(rows, min_score=0, max_block_size=5), [])
+
+    def test_min_score_and_limit(self):
+        rows = [(i, "John", "Smith", "john@example.com", None, None) for i in range(4)]
+
+        self.assertEqual(len(find_duplicates(rows, limit=2)), 2)
+        self.assertEqual(find_duplicates(rows, min_score=0.9), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock
+
+import fakeredis
+import httpx
+import redis
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from jose import jwt
+
+from src.conf.messages import IDEMPOTENCY_IN_PROGRESS, IDEMPOTENCY_KEY_REUSED
+from src.services.auth import auth_service
+from src.services.idempotency import IdempotencyMiddleware, IdempotencyStore
+
+
+class TestIdempotencyMiddleware(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.store = IdempotencyStore(ttl=60, wait=1.0, lock_ttl=5.0)
+        self.store.redis = fakeredis.FakeRedis(decode_responses=True)
+        self.calls = 0
+        self.rejected = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+        app = FastAPI()
+
+        @app.post("/items")
+        async def create_item(request: Request):
+            self.calls += 1
+            if self.rejected:
+                self.rejected -= 1
+                return JSONResponse({"detail": "expired"}, status_code=401)
+            await self.release.wait()
+            return JSONResponse({"id": self.calls, "body": (await request.json())}, status_code=201)
+
+        @app.post("/broken")
+        async def broken():
+            self.calls += 1
+            return JSONResponse({"detail": "boom"}, status_code=503)
+
+        @app.post("/stream")
+        async def stream():
+            self.calls += 1
+            return StreamingResponse(iter([b"a", b"b"]), status_code=201)
+
+        app.add_middleware(IdempotencyMiddleware, store=self.store)
+        self.client = httpx.AsyncClient(app=app, base_url="http://test")
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def post(self, path, key, json=None, email="first@example.com", token=None):
+        headers = {}
+        if email is not None:
+            token = token or await auth_service.create_access_token(data={"sub": email})
+            headers["Authorization"] = f"Bearer {token}"
+        if key is not None:
+            headers["Idempotency-Key"] = key
+        return await self.client.post(path, json=json if json is not None else {"name": "a"}, headers=headers)
+
+    async def test_retry_replays_first_response(self):
+        first = await self.post("/items", "key1")
+        second = await self.post("/items", "key1")
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second.headers["idempotent-replayed"], "true")
+        self.assertNotIn("idempotent-replayed", first.headers)
+
+    async def test_without_key_every_request_runs(self):
+        await self.post("/items", None)
+        await self.post("/items", None)
+        self.assertEqual(self.calls, 2)
+
+    async def test_empty_key_is_rejected(self):
+        response = await self.post("/items", "")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.calls, 0)
+
+    async def test_key_reused_with_other_body(self):
+        await self.post("/items", "key1", {"name": "a"})
+        response = await self.post("/items", "key1", {"name": "b"})
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json()["detail"], IDEMPOTENCY_KEY_REUSED)
+        self.assertEqual(self.calls, 1)
+
+    async def test_keys_are_scoped_by_client(self):
+        await self.post("/items", "key1", email="first@example.com")
+        response = await self.post("/items", "key1", email="second@example.com")
+
+        self.assertEqual(self.calls, 2)
+        self.assertNotIn("idempotent-replayed", response.headers)
+
+    async def test_retry_with_refreshed_token_replays(self):
+        await self.post("/items", "key1")
+        response = await self.post("/items", "key1")
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(response.headers["idempotent-replayed"], "true")
+
+    async def test_forged_token_is_not_replayed(self):
+        await self.post("/items", "key1")
+        forged = jwt.encode({"sub": "first@example.com", "scope": "access_token"}, "wrong secret")
+        response = await self.post("/items", "key1", token=forged)
+
+        self.assertEqual(self.calls, 2)
+        self.assertNotIn("idempotent-replayed", response.headers)
+
+    async def test_retry_after_401_runs_again(self):
+        self.rejected = 1
+        first = await self.post("/items", "key1")
+        second = await self.post("/items", "key1")
+
+        self.assertEqual(first.status_code, 401)
+        self.assertEqual(second.status_code, 201)
+        self.assertNotIn("idempotent-replayed", second.headers)
+        self.assertEqual(self.calls, 2)
+
+    async def test_anonymous_requests_are_not_kept(self):
+        await self.post("/items", "key1", email=None)
+        response = await self.post("/items", "key1", email=None)
+
+        self.assertEqual(self.calls, 2)
+        self.assertNotIn("idempotent-replayed", response.headers)
+
+    async def test_streaming_response_completes(self):
+        first = await asyncio.wait_for(self.post("/stream", "key1"), 1)
+        second = await self.post("/stream", "key1")
+
+        self.assertEqual(first.content, b"ab")
+        self.assertEqual(second.content, b"ab")
+        self.assertEqual(self.calls, 1)
+
+    async def test_concurrent_duplicates_run_once(self):
+        self.release.clear()
+        first = asyncio.ensure_future(self.post("/items", "key1"))
+        second = asyncio.ensure_future(self.post("/items", "key1"))
+        await asyncio.sleep(0.05)
+        self.release.set()
+
+        responses = await asyncio.gather(first, second)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(responses[0].json(), responses[1].json())
+
+    async def test_duplicate_gets_409_when_first_is_too_slow(self):
+        self.store.wait = 0.05
+        self.release.clear()
+        first = asyncio.ensure_future(self.post("/items", "key1"))
+        await asyncio.sleep(0.01)
+
+        response = await self.post("/items", "key1")
+        self.release.set()
+        await first
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["detail"], IDEMPOTENCY_IN_PROGRESS)
+        self.assertEqual(self.calls, 1)
+
+    async def test_server_errors_are_not_kept(self):
+        await self.post("/broken", "key1")
+        response = await self.post("/broken", "key1")
+
+        self.assertEqual(self.calls, 2)
+        self.assertNotIn("idempotent-replayed", response.headers)
+
+    async def test_runs_without_redis(self):
+        self.store.redis = MagicMock()
+        self.store.redis.set.side_effect = redis.ConnectionError
+
+        await self.post("/items", "key1")
+        response = await self.post("/items", "key1")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.calls, 2)
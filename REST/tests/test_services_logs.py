@@ -0,0 +1,127 @@
+import io
+import json
+import logging
+import queue
+import sys
+import unittest
+from unittest.mock import patch
+
+import httpx
+from fastapi import FastAPI
+
+from src.services.logs import (DroppingQueueHandler, JsonFormatter, LogPipeline, RequestIdMiddleware,
+                               SamplingFilter, request_id)
+
+
+def make_record(level=logging.INFO, msg="hello %s", args=("world",), **extra):
+    record = logging.LogRecord("test", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class TestJsonFormatter(unittest.TestCase):
+    def test_fields(self):
+        line = JsonFormatter().format(make_record(request_id="abc", event="user_cache", source="cache"))
+
+        entry = json.loads(line)
+        self.assertEqual(entry["message"], "hello world")
+        self.assertEqual(entry["level"], "INFO")
+        self.assertEqual(entry["logger"], "test")
+        self.assertEqual(entry["request_id"], "abc")
+        self.assertEqual((entry["event"], entry["source"]), ("user_cache", "cache"))
+        self.assertNotIn("args", entry)
+
+    def test_exception(self):
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.LogRecord("test", logging.ERROR, __file__, 1, "failed", None, sys.exc_info())
+
+        self.assertIn("ValueError: boom", json.loads(JsonFormatter().format(record))["exception"])
+
+
+class TestSamplingFilter(unittest.TestCase):
+    def test_sampled_events(self):
+        sampling = SamplingFilter({"user_cache": 0.25})
+
+        with patch("src.services.logs.random.random", side_effect=[0.1, 0.9]):
+            kept = make_record(event="user_cache")
+            self.assertTrue(sampling.filter(kept))
+            self.assertFalse(sampling.filter(make_record(event="user_cache")))
+        self.assertEqual(kept.sample_rate, 0.25)
+
+    def test_other_records_are_kept(self):
+        sampling = SamplingFilter({"user_cache": 0.0})
+
+        self.assertTrue(sampling.filter(make_record()))
+        self.assertTrue(sampling.filter(make_record(event="other")))
+        self.assertTrue(sampling.filter(make_record(logging.WARNING, event="user_cache")))
+
+
+class TestDroppingQueueHandler(unittest.TestCase):
+    def test_full_queue_drops_instead_of_waiting(self):
+        handler = DroppingQueueHandler(queue.Queue(1))
+        for _ in range(3):
+            handler.handle(make_record())
+
+        self.assertEqual(handler.dropped, 2)
+        self.assertEqual(handler.queue.qsize(), 1)
+
+    def test_message_is_rendered_when_logged(self):
+        handler = DroppingQueueHandler(queue.Queue())
+        values = ["first"]
+        handler.handle(make_record(msg="%s", args=(values,)))
+        values.append("second")
+
+        self.assertEqual(handler.queue.get_nowait().msg, "['first']")
+
+
+class TestLogPipeline(unittest.TestCase):
+    def test_records_are_written_as_json_with_request_id(self):
+        stream = io.StringIO()
+        pipeline = LogPipeline("INFO", 100, {})
+        root = logging.getLogger()
+        handlers = root.handlers[:]
+
+        pipeline.start(stream)
+        token = request_id.set("req-1")
+        try:
+            logging.getLogger("src.test").info("user %s", "loaded", extra={"event": "user_cache"})
+            logging.getLogger("src.test").debug("not written")
+        finally:
+            request_id.reset(token)
+            pipeline.stop()
+
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual([(line["message"], line["request_id"], line["event"]) for line in lines],
+                         [("user loaded", "req-1", "user_cache")])
+        self.assertEqual(root.handlers, handlers)
+
+
+class TestRequestIdMiddleware(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        app = FastAPI()
+
+        @app.get("/")
+        async def read():
+            return {"request_id": request_id.get()}
+
+        app.add_middleware(RequestIdMiddleware)
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_generated(self):
+        response = await self.client.get("/")
+
+        self.assertEqual(len(response.headers["x-request-id"]), 32)
+        self.assertEqual(response.json()["request_id"], response.headers["x-request-id"])
+        self.assertIsNone(request_id.get())
+
+    async def test_client_id_is_kept_when_valid(self):
+        response = await self.client.get("/", headers={"X-Request-ID": "edge-1234"})
+        self.assertEqual(response.json()["request_id"], "edge-1234")
+
+        response = await self.client.get("/", headers={"X-Request-ID": "bad id\twith spaces"})
+        self.assertNotEqual(response.json()["request_id"], "bad id\twith spaces")
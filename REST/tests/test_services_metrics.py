@@ -0,0 +1,82 @@
+import unittest
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+import main
+from src.services.metrics import Counter, Gauge, Histogram, MetricsRegistry, db_queries, instrument_engine
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = self.registry.register(Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0)))
+        histogram.observe_ns(50_000_000, "/")
+        histogram.observe_ns(500_000_000, "/")
+        histogram.observe_ns(5_000_000_000, "/")
+
+        output = self.registry.render()
+
+        self.assertIn('latency_seconds_bucket{route="/",le="0.1"} 1', output)
+        self.assertIn('latency_seconds_bucket{route="/",le="1.0"} 2', output)
+        self.assertIn('latency_seconds_bucket{route="/",le="+Inf"} 3', output)
+        self.assertIn('latency_seconds_sum{route="/"} 5.55', output)
+        self.assertIn('latency_seconds_count{route="/"} 3', output)
+        self.assertEqual(histogram.count("/"), 3)
+
+    def test_counter_and_gauge(self):
+        counter = self.registry.register(Counter("hits_total", "Hits.", ("cache", "result")))
+        gauge = self.registry.register(Gauge("in_flight", "In flight."))
+        counter.inc("users", "hit")
+        counter.inc("users", "hit")
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+
+        output = self.registry.render()
+
+        self.assertIn("# TYPE hits_total counter", output)
+        self.assertIn('hits_total{cache="users",result="hit"} 2', output)
+        self.assertIn("in_flight 1", output)
+
+    def test_clear(self):
+        counter = self.registry.register(Counter("hits_total", "Hits."))
+        histogram = self.registry.register(Histogram("latency_seconds", "Latency.", buckets=(0.1,)))
+        counter.inc()
+        histogram.observe(0.05)
+
+        self.registry.clear()
+
+        self.assertEqual((counter.value(), histogram.count()), (0, 0))
+        self.assertNotIn("hits_total 1", self.registry.render())
+
+    def test_label_values_are_escaped(self):
+        counter = self.registry.register(Counter("odd_total", "Odd.", ("value",)))
+        counter.inc('a"b\\c')
+
+        self.assertIn('odd_total{value="a\\"b\\\\c"} 1', self.registry.render())
+
+    def test_instrument_engine_counts_queries(self):
+        engine = create_engine("sqlite://")
+        instrument_engine(engine)
+        instrument_engine(engine)
+        before = db_queries.value("SELECT")
+
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+        self.assertEqual(db_queries.value("SELECT"), before + 1)
+
+
+def test_metrics_endpoint_reports_route_latency():
+    client = TestClient(main.app)
+    client.get("/")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/",status="200"}' in response.text
+    assert "http_requests_in_flight" in response.text
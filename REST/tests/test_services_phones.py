@@ -0,0 +1,20 @@
+import unittest
+
+from src.services.phones import to_e164
+
+
+class TestToE164(unittest.TestCase):
+    def test_spellings_of_one_number(self):
+        for number in ("+380 (50) 123-45-67", "0501234567", "050.123.45.67", "00380501234567", "380501234567",
+                       "501234567", 501234567):
+            with self.subTest(number=number):
+                self.assertEqual(to_e164(number), "+380501234567")
+
+    def test_other_country_code(self):
+        self.assertEqual(to_e164("030 1234567", country_code="49"), "+49301234567")
+        self.assertEqual(to_e164("+1 415 555 2671", country_code="49"), "+14155552671")
+
+    def test_invalid_numbers(self):
+        for number in (None, "", "+", "12345", "+0501234567", "+1234567890123456", "050-CALL-NOW"):
+            with self.subTest(number=number):
+                self.assertIsNone(to_e164(number))
@@ -0,0 +1,63 @@
+import unittest
+
+import fakeredis
+
+from src.services.refresh_tokens import RefreshTokenStore
+
+
+class TestRefreshTokenStore(unittest.TestCase):
+    def setUp(self):
+        self.store = RefreshTokenStore(ttl=60)
+        self.store.redis = fakeredis.FakeRedis(decode_responses=True)
+        self.email = "test@example.com"
+
+    def test_issue_starts_a_family(self):
+        claims = self.store.issue(self.email, "phone")
+
+        self.assertEqual(self.store.sessions(self.email), {"phone": claims["fam"]})
+        self.assertEqual(self.store.redis.hget(f"refresh:{claims['jti']}", "email"), self.email)
+        self.assertLessEqual(self.store.redis.ttl(f"refresh:{claims['jti']}"), 60)
+
+    def test_rotate_keeps_the_family(self):
+        claims = self.store.issue(self.email)
+
+        rotated = self.store.rotate(self.email, claims)
+
+        self.assertEqual(rotated["fam"], claims["fam"])
+        self.assertNotEqual(rotated["jti"], claims["jti"])
+        self.assertFalse(self.store.redis.exists(f"refresh:{claims['jti']}"))
+
+    def test_reuse_revokes_the_family(self):
+        claims = self.store.issue(self.email, "laptop")
+        rotated = self.store.rotate(self.email, claims)
+
+        self.assertIsNone(self.store.rotate(self.email, claims))
+        self.assertIsNone(self.store.rotate(self.email, rotated))
+        self.assertEqual(self.store.sessions(self.email), {})
+
+    def test_token_of_another_user_is_rejected(self):
+        claims = self.store.issue(self.email)
+
+        self.assertIsNone(self.store.rotate("other@example.com", claims))
+
+    def test_sessions_per_device(self):
+        phone = self.store.issue(self.email, "phone")
+        laptop = self.store.issue(self.email, "laptop")
+        phone_again = self.store.issue(self.email, "phone")
+
+        self.assertEqual(self.store.sessions(self.email), {"phone": phone_again["fam"], "laptop": laptop["fam"]})
+        self.assertIsNone(self.store.rotate(self.email, phone))
+        self.assertIsNotNone(self.store.rotate(self.email, laptop))
+
+    def test_revoke_all(self):
+        claims = self.store.issue(self.email, "phone")
+        self.store.issue(self.email, "laptop")
+
+        self.store.revoke_all(self.email)
+
+        self.assertEqual(self.store.sessions(self.email), {})
+        self.assertIsNone(self.store.rotate(self.email, claims))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import time
+import unittest
+
+import fakeredis
+
+from src.services import revocation
+from src.services.revocation import RevocationList
+
+
+class TestRevocationList(unittest.TestCase):
+    def setUp(self):
+        server = fakeredis.FakeServer()
+        self.worker = RevocationList(sync_interval=1)
+        self.worker.redis = fakeredis.FakeRedis(server=server, decode_responses=True)
+        self.other = RevocationList(sync_interval=1)
+        self.other.redis = fakeredis.FakeRedis(server=server, decode_responses=True)
+        self.email = "test@example.com"
+        self.expires = time.time() + 60
+
+    def test_revoked_token_is_rejected_locally(self):
+        self.worker.revoke_token("abc", self.expires)
+
+        self.assertTrue(self.worker.is_revoked({"sub": self.email, "jti": "abc", "iat": int(time.time())}))
+        self.assertFalse(self.worker.is_revoked({"sub": self.email, "jti": "def", "iat": int(time.time())}))
+
+    def test_other_workers_catch_up_on_sync(self):
+        now = int(time.time())
+        self.worker.revoke_token("abc", self.expires)
+        self.worker.revoke_user(self.email, issued_before=now)
+
+        self.assertFalse(self.other.is_revoked({"sub": self.email, "jti": "abc", "iat": now + 1}))
+        self.other.sync()
+
+        self.assertEqual(self.other.version, 2)
+        self.assertTrue(self.other.is_revoked({"sub": self.email, "jti": "abc", "iat": now + 1}))
+        self.assertTrue(self.other.is_revoked({"sub": self.email, "jti": "def", "iat": now - 1}))
+        self.assertFalse(self.other.is_revoked({"sub": self.email, "jti": "def", "iat": now}))
+
+    def test_sync_reads_only_new_entries(self):
+        self.worker.revoke_token("abc", self.expires)
+        self.other.sync()
+        self.worker.revoke_token("def", self.expires)
+        self.other.redis.delete("revocation:jtis")
+
+        self.other.sync()
+
+        self.assertEqual(set(self.other.revoked), {"abc", "def"})
+
+    def test_sync_reloads_when_the_log_was_trimmed(self):
+        original = revocation.LOG_SIZE
+        revocation.LOG_SIZE = 2
+        try:
+            for jti in ("a", "b", "c", "d"):
+                self.worker.revoke_token(jti, self.expires)
+        finally:
+            revocation.LOG_SIZE = original
+
+        self.other.sync()
+
+        self.assertEqual(self.other.redis.zcard("revocation:log"), 2)
+        self.assertEqual(set(self.other.revoked), {"a", "b", "c", "d"})
+        self.assertEqual(self.other.version, 4)
+
+    def test_expired_tokens_are_dropped(self):
+        self.worker.revoke_token("old", time.time() - 1)
+        self.worker.revoke_token("new", self.expires)
+
+        self.other.sync()
+
+        self.assertEqual(set(self.other.revoked), {"new"})
+        self.assertEqual(self.other.redis.zrange("revocation:jtis", 0, -1), ["new"])
+
+    def test_users_are_dropped_after_their_tokens_expire(self):
+        now = int(time.time())
+        self.worker.revoke_user("old@example.com", issued_before=now - self.other.token_lifetime - 1)
+        self.worker.revoke_user(self.email, issued_before=now)
+
+        self.other.sync()
+
+        self.assertEqual(set(self.other.not_before), {self.email})
+        self.assertEqual(set(self.other.redis.hgetall("revocation:users")), {self.email})
+
+    def test_user_revoked_again_is_kept(self):
+        now = int(time.time())
+        self.worker.revoke_user(self.email, issued_before=now - self.other.token_lifetime - 1)
+        self.other.sync()
+        self.worker.revoke_user(self.email, issued_before=now)
+        self.other.not_before[self.email] = now - self.other.token_lifetime - 1
+
+        self.other._prune_users(now)
+
+        self.assertEqual(self.other.redis.hget("revocation:users", self.email), str(now))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import asyncio
+import re
+import threading
+import time
+import unittest
+
+from src.services.stack_sampler import EVENT_LOOP, StackSampler
+
+
+def _block_the_loop():
+    time.sleep(0.2)
+
+
+def _wait_for_work(event: threading.Event):
+    event.wait()
+
+
+class TestStackSampler(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.sampler = StackSampler(0.005)
+        self.event = threading.Event()
+        self.worker = threading.Thread(target=_wait_for_work, args=(self.event,), name="idle-worker")
+        self.worker.start()
+
+    def tearDown(self):
+        self.event.set()
+        self.worker.join()
+
+    async def stall(self):
+        await asyncio.sleep(0.05)
+        _block_the_loop()
+
+    async def test_blocking_call_on_the_loop(self):
+        profile, _ = await asyncio.gather(self.sampler.profile(0.4), self.stall())
+
+        stalls = [stack for stack in profile.stacks if stack.startswith(f"{EVENT_LOOP};")]
+        self.assertTrue(stalls)
+        self.assertTrue(all("_block_the_loop" in stack for stack in stalls), stalls)
+        self.assertIn("stall (tests/test_services_stack_sampler.py:", stalls[0])
+        self.assertGreater(profile.loop_busy, 0)
+        self.assertLess(profile.loop_busy_ratio, 1)
+        self.assertGreaterEqual(profile.duration, 0.4)
+
+    async def test_idle_threads(self):
+        profile = await self.sampler.profile(0.05)
+        self.assertFalse([stack for stack in profile.stacks if "_wait_for_work" in stack])
+
+        profile = await self.sampler.profile(0.05, idle=True)
+        waiting = [stack for stack in profile.stacks if "_wait_for_work" in stack]
+        self.assertTrue(waiting)
+        self.assertTrue(waiting[0].startswith("idle-worker;"))
+        self.assertTrue([stack for stack in profile.stacks if stack.startswith(f"{EVENT_LOOP};")])
+
+    async def test_one_profile_at_a_time(self):
+        first, second = await asyncio.gather(self.sampler.profile(0.05), self.sampler.profile(0.05))
+
+        self.assertIsNotNone(first)
+        self.assertIsNone(second)
+        self.assertIsNotNone(await self.sampler.profile(0.01))
+
+    async def test_collapsed_format(self):
+        profile, _ = await asyncio.gather(self.sampler.profile(0.3), self.stall())
+
+        lines = profile.collapsed().splitlines()
+        self.assertEqual(len(lines), len(profile.stacks))
+        self.assertTrue(all(re.fullmatch(r"[^;]+(;[^;]+)+ \d+", line) for line in lines), lines)
+        counts = [int(line.rsplit(" ", 1)[1]) for line in lines]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+
+    async def test_label_without_qualified_name(self):
+        code = _block_the_loop.__code__
+        legacy = type("Code", (), {"co_name": code.co_name, "co_filename": code.co_filename,
+                                   "co_firstlineno": code.co_firstlineno})()
+
+        self.assertTrue(self.sampler._label(legacy).startswith("_block_the_loop ("))
@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.conf.config import settings
+from src.services.sync import CHANGED, DELETED, decode_sync_token, encode_sync_token, next_sync_key
+
+NOW = datetime(2026, 10, 19, 12, 0, 0)
+
+
+def test_token_round_trip():
+    key = (datetime(2026, 10, 19, 11, 59, 58, 123456), DELETED, 42)
+    token = encode_sync_token(key)
+
+    assert "=" not in token
+    assert decode_sync_token(token) == key
+
+
+@pytest.mark.parametrize("token", ["", "not a token", encode_sync_token((NOW, 7, 1)), "MjAyNi0xMC0xOQ"])
+def test_decode_malformed_token(token):
+    with pytest.raises(ValueError):
+        decode_sync_token(token)
+
+
+def test_next_key_follows_pages():
+    last = (NOW, CHANGED, 5)
+
+    assert next_sync_key(last, has_more=True, now=NOW) == last
+
+
+def test_next_key_holds_back_recent_changes(monkeypatch):
+    monkeypatch.setattr(settings, "sync_commit_lag_seconds", 2.0)
+    cutoff = NOW - timedelta(seconds=2)
+
+    assert next_sync_key((NOW - timedelta(seconds=1), CHANGED, 5), has_more=False, now=NOW)[0] == cutoff
+    assert next_sync_key(None, has_more=False, now=NOW)[0] == cutoff
+    older = (NOW - timedelta(seconds=10), DELETED, 3)
+    assert next_sync_key(older, has_more=False, now=NOW) == older
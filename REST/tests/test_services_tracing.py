@@ -0,0 +1,135 @@
+import json
+import os
+import tempfile
+import unittest
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from sqlalchemy import create_engine, text
+
+from src.repository import contacts as repository_contacts
+from src.services.tracing import (NOOP_SPAN, FileExporter, InMemoryExporter, Span, Tracer, TracingMiddleware,
+                                  instrument_engine, parse_traceparent, traceparent_header, traced, tracer)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@traced("test.work")
+async def work():
+    return traceparent_header()
+
+
+class TestTraceparent(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01"), (TRACE_ID, PARENT_ID, True))
+        self.assertEqual(parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00"), (TRACE_ID, PARENT_ID, False))
+        for value in (None, "", "garbage", f"00-{'0' * 32}-{PARENT_ID}-01", f"00-{TRACE_ID}-{'0' * 16}-01",
+                      f"00-{TRACE_ID[:-1]}-{PARENT_ID}-01"):
+            with self.subTest(value=value):
+                self.assertIsNone(parse_traceparent(value))
+
+
+class TestTracer(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.exporter = InMemoryExporter()
+        tracer.configure(self.exporter)
+
+    def tearDown(self):
+        tracer.configure(None)
+
+    def spans_list(self):
+        tracer.flush()
+        return self.exporter.spans
+
+    def spans(self):
+        return {span["name"]: span for span in self.spans_list()}
+
+    async def test_disabled(self):
+        tracer.configure(None)
+
+        self.assertIs(tracer.start_trace("job"), NOOP_SPAN)
+        self.assertIsNone(await work())
+
+    async def test_spans_nest(self):
+        with tracer.start_trace("job") as root:
+            header = await work()
+            with tracer.span("inner", key="value"):
+                pass
+
+        spans = self.spans()
+        self.assertEqual(spans["test.work"]["parent_id"], root.span_id)
+        self.assertEqual(header, f"00-{root.trace_id}-{spans['test.work']['span_id']}-01")
+        self.assertEqual(spans["inner"]["attributes"], {"key": "value"})
+        self.assertEqual({span["trace_id"] for span in spans.values()}, {root.trace_id})
+        self.assertIsNone(spans["job"]["parent_id"])
+
+    async def test_spans_need_a_trace(self):
+        self.assertIs(tracer.span("orphan"), NOOP_SPAN)
+        self.assertIsNone(await work())
+
+    async def test_error_is_recorded(self):
+        with self.assertRaises(ValueError):
+            with tracer.start_trace("job"):
+                raise ValueError("boom")
+
+        self.assertEqual((self.spans()["job"]["status"], self.spans()["job"]["error"]), ("error", "ValueError: boom"))
+
+    async def test_sampling(self):
+        tracer.configure(self.exporter, sample_rate=0.0)
+
+        self.assertIs(tracer.start_trace("job"), NOOP_SPAN)
+        self.assertIsNot(tracer.start_trace("job", f"00-{TRACE_ID}-{PARENT_ID}-01"), NOOP_SPAN)
+        self.assertIs(tracer.start_trace("job", f"00-{TRACE_ID}-{PARENT_ID}-00"), NOOP_SPAN)
+
+    async def test_sql_statements(self):
+        engine = create_engine("sqlite://")
+        instrument_engine(engine)
+
+        with tracer.start_trace("job") as root, engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            with self.assertRaises(Exception):
+                connection.execute(text("SELECT * FROM missing"))
+
+        queries = [span for span in self.spans_list() if span["name"] == "db.query"]
+        self.assertEqual([(span["parent_id"], span["status"]) for span in queries],
+                         [(root.span_id, "ok"), (root.span_id, "error")])
+
+    async def test_repository_functions_are_traced(self):
+        self.assertTrue(hasattr(repository_contacts.get_contacts_count, "__wrapped__"))
+
+    async def test_middleware_continues_caller_trace(self):
+        app = FastAPI()
+
+        @app.get("/items/{item_id}")
+        async def read_item(item_id: int):
+            if item_id == 0:
+                raise HTTPException(status_code=503)
+            return {"traceparent": await work()}
+
+        app.add_middleware(TracingMiddleware)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/items/1", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+            await client.get("/items/0")
+
+        roots = [span for span in self.spans_list() if span["name"] == "GET /items/{item_id}"]
+        self.assertEqual(len(roots), 2)
+        self.assertEqual((roots[0]["trace_id"], roots[0]["parent_id"]), (TRACE_ID, PARENT_ID))
+        self.assertEqual(roots[0]["attributes"]["http.status_code"], 200)
+        self.assertEqual(roots[1]["status"], "error")
+        self.assertTrue(response.json()["traceparent"].startswith(f"00-{TRACE_ID}-"))
+
+
+class TestFileExporter(unittest.TestCase):
+    def test_writes_json_lines(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "traces.jsonl")
+            exporter = FileExporter(path)
+            span = Span(Tracer(), "job", TRACE_ID, PARENT_ID, {})
+            span.end()
+            exporter.export([span, span])
+
+            with open(path, encoding="utf-8") as file:
+                lines = [json.loads(line) for line in file]
+        self.assertEqual(len(lines), 2)
+        self.assertEqual((lines[0]["name"], lines[0]["trace_id"], lines[0]["parent_id"]), ("job", TRACE_ID, PARENT_ID))
@@ -17,13 +17,15 @@ from src.database.model import Contact, User
 from src.repository.contacts import (
     create_contact,
     get_contacts,
+    get_contacts_rows,
     get_contact,
     update_contact,
     get_contacts_choice,
     get_contacts_birthdays,
     update_contact_status,
     remove_contact,
-    update_avatar
+    update_avatar,
+    get_contacts_count
 )
 from src.repository.users import get_user_by_email
 
@@ -43,6 +45,12 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         result = await get_contacts(skip=0, limit=10, user=self.user, db=self.session)
         self.assertEqual(result, contacts)
 
+    async def test_get_contacts_rows(self):
+        rows = [(1, "Tommy", "Huyng", "tommy.huyng@test.com", 111111111, datetime(2000, 3, 21).date())]
+        self.session.execute.return_value.all.return_value = rows
+        result = await get_contacts_rows(skip=0, limit=10, user=self.user, db=self.session)
+        self.assertEqual(result, rows)
+
     async def test_get_contact_found(self):
         # returns a contact based on its ID
 
@@ -75,6 +83,7 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(result.date_of_birth, body.date_of_birth)
         self.assertEqual(result.user_id, self.user.id)
         self.assertTrue(hasattr(result, "id"))
+        self.assertIn("contacts_count", str(self.session.execute.call_args.args[0]))
 
     # async def test_create_contact_failure(self):
     #     body = ContactModel(
@@ -95,6 +104,18 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         result = await remove_contact(contact_id=1, user=self.user, db=self.session)
         self.assertEqual(result, contact)
 
+    async def test_remove_contact_updates_counter(self):
+        self.session.query().filter().first.return_value = Contact()
+        await remove_contact(contact_id=1, user=self.user, db=self.session)
+        statement = self.session.execute.call_args.args[0]
+        self.assertIn("contacts_count", str(statement))
+        self.assertEqual(statement.compile().params["contacts_count_1"], -1)
+
+    async def test_get_contacts_count(self):
+        self.session.execute.return_value.scalar.return_value = 5
+        result = await get_contacts_count(user=self.user, db=self.session)
+        self.assertEqual(result, 5)
+
     async def test_remove_contact_not_found(self):
         # checks the above function, if it works correctly or not. If that contact is None.
 
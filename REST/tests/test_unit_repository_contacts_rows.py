@@ -0,0 +1,79 @@
+import asyncio
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from src.database.model import Contact, ContactTombstone, User
+from src.repository.contacts import get_contacts_rows, get_contact_row, get_contacts_choice_rows, purge_tombstones
+from src.schemas import ContactResponse
+
+
+@pytest.fixture(scope="module")
+def owner(session):
+    user = User(username="rows_owner", email="rows_owner@example.com", password="secret")
+    session.add(user)
+    session.commit()
+    session.add_all([
+        Contact(name="Tommy", surname="Huyng", email="tommy.rows@test.com", mobile=111111111,
+                date_of_birth=date(1999, 1, 25), user_id=user.id),
+        Contact(name="Jin", surname="Cha", email="jin.rows@test.com", mobile=222222222,
+                date_of_birth=date(1998, 2, 14), user_id=user.id),
+    ])
+    session.commit()
+    session.expunge_all()
+    return session.query(User).filter(User.email == "rows_owner@example.com").first()
+
+
+@pytest.fixture()
+def statements(session):
+    executed = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield executed
+    event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def test_rows_do_not_enter_identity_map(session, owner):
+    session.expunge_all()
+
+    rows = asyncio.run(get_contacts_rows(skip=0, limit=10, user=owner, db=session))
+
+    assert len(rows) == 2
+    assert not isinstance(rows[0], Contact)
+    assert len(session.identity_map) == 0
+
+
+def test_serialization_issues_no_lazy_loads(session, owner, statements):
+    rows = asyncio.run(get_contacts_rows(skip=0, limit=10, user=owner, db=session))
+    row = asyncio.run(get_contact_row(contact_id=rows[0].id, user=owner, db=session))
+    found = asyncio.run(get_contacts_choice_rows(name="Jin", surname=None, email=None, user=owner, db=session))
+    statements.clear()
+
+    payload = [ContactResponse.from_orm(r).dict() for r in [*rows, row, *found]]
+
+    assert statements == []
+    assert payload[0]["name"] == "Tommy"
+    assert payload[0]["mobile"] == "111111111"
+    assert payload[-1]["email"] == "jin.rows@test.com"
+
+
+def test_get_contact_row_not_found(session, owner):
+    assert asyncio.run(get_contact_row(contact_id=10_000, user=owner, db=session)) is None
+
+
+def test_purge_tombstones(session, owner):
+    now = datetime.utcnow()
+    session.add_all([ContactTombstone(contact_id=contact_id, user_id=owner.id, deleted_at=now - timedelta(days=days))
+                     for contact_id, days in ((901, 40), (902, 35), (903, 1))])
+    session.commit()
+
+    purged = asyncio.run(purge_tombstones(now - timedelta(days=30), session, batch_size=1))
+
+    remaining = session.query(ContactTombstone.contact_id).filter(ContactTombstone.user_id == owner.id).all()
+    assert purged == 2
+    assert [row.contact_id for row in remaining] == [903]
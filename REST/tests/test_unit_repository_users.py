@@ -13,8 +13,12 @@ from unittest.mock import MagicMock, patch
 
 from sqlalchemy.orm import Session
 
-from src.repository.users import get_user_by_email, create_user, update_token, confirmed_email, update_avatar
-from src.database.model import User
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.repository.users import (get_user_by_email, create_user, insert_user, update_token, confirmed_email,
+                                  update_avatar)
+from src.database.model import Base, User
 from src.schemas import UserModel
 
 
@@ -88,5 +92,30 @@ class TestUsers(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(updated_user.avatar, new_avatar_url)
 
 
+class TestInsertUser(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.SessionLocal = sessionmaker(bind=self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    async def test_second_insert_with_same_email_returns_none(self):
+        body = UserModel(username="TestTest", email="test@test.com", password="hashed")
+
+        with self.SessionLocal() as db:
+            first = await insert_user(body, db)
+        with self.SessionLocal() as db:
+            second = await insert_user(body.copy(update={"username": "Other"}), db)
+            users = db.query(User).all()
+
+        self.assertIsNotNone(first.id)
+        self.assertEqual((first.username, first.email, first.confirmed), ("TestTest", "test@test.com", False))
+        self.assertIsNotNone(first.created_at)
+        self.assertIsNone(second)
+        self.assertEqual([user.username for user in users], ["TestTest"])
+
+
 if __name__ == '__main__':
     unittest.main()